@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,20 +38,117 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     "detect.apps.DetectConfig",
     "drone.apps.DroneConfig",
+    "api.apps.ApiConfig",
     "rest_framework",
 
 ]
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
-}
+# The in-memory channel layer only reaches consumers in the same process. With several Daphne
+# workers, set CHANNEL_REDIS_URL (e.g. redis://127.0.0.1:6379/0) so they share a Redis, or
+# Redis-compatible, server.
+CHANNEL_REDIS_URL = os.environ.get("CHANNEL_REDIS_URL")
+
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [CHANNEL_REDIS_URL],
+                # Messages a channel may hold before sends to it fail (broadcasts to it are dropped)
+                "capacity": int(os.environ.get("CHANNEL_LAYER_CAPACITY", 1000)),
+                "expiry": 30,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
 
 # Increase timeout and max request size for video uploads
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
 
+# Crop models, loaded and warmed once per process; requests choose one with `crop`
+DETECT_MODELS = {
+    "groundnut": "GroundNutDet.pt",
+    "paddy": "PaddyDet.pt",
+}
+DETECT_DEFAULT_CROP = "groundnut"
+# Side of the blank image used for each model's warm-up inference (and the export size for other backends)
+DETECT_WARMUP_SIZE = 640
+# Inference backend: "pytorch", or "onnx"/"openvino" to run an export of each .pt made on first start
+DETECT_BACKEND = "pytorch"
+# Weight precision: "fp32", "fp16" (openvino backend) or "int8" (onnx backend)
+DETECT_PRECISION = "fp32"
+# Images used to calibrate INT8 activations; without them only the weights are quantized
+DETECT_INT8_CALIBRATION_DIR = None
+
+# Micro-batching of concurrent process_image requests; a request waits at most DETECT_BATCH_TIMEOUT_S for its result
+DETECT_BATCH_MAX_SIZE = 8
+DETECT_BATCH_MAX_WAIT_MS = 10
+DETECT_BATCH_TIMEOUT_S = 60
+
+# Tiled detection (process_image with tiled=1): tile side, overlap fraction, NMS IoU across seams,
+# the share of a box cut at a seam that must lie inside another for the two to be joined,
+# and whether the whole image also goes in the batch to catch objects larger than a tile
+DETECT_TILE_SIZE = 640
+DETECT_TILE_OVERLAP = 0.2
+DETECT_TILE_NMS_IOU = 0.5
+DETECT_TILE_SEAM_IOS = 0.7
+DETECT_TILE_FULL_PASS = True
+
+# Live detection WebSocket (ws/detect/): window in seconds of the per-connection frame rates
+DETECT_STREAM_STATS_WINDOW = 5.0
+
+# process_image result cache: an in-memory LRU of at most DETECT_CACHE_SIZE entries and DETECT_CACHE_MAX_BYTES
+# of annotated JPEGs and detections, plus an optional on-disk tier (None disables it)
+DETECT_CACHE_SIZE = 256
+DETECT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DETECT_CACHE_DIR = None
+
+# Background video jobs: uploaded and processed files live under VIDEO_JOB_ROOT
+VIDEO_JOB_ROOT = BASE_DIR / 'video_jobs'
+VIDEO_JOB_WORKERS = 2
+VIDEO_JOB_STALE_SECONDS = 300
+# Running jobs touch their row at least this often, well inside VIDEO_JOB_STALE_SECONDS
+VIDEO_JOB_HEARTBEAT_SECONDS = 30
+# Server processes rescan for interrupted jobs this often, and delete finished jobs and their files after
+# VIDEO_JOB_RETENTION_SECONDS
+VIDEO_JOB_AUTOSTART = True
+VIDEO_JOB_SCAN_SECONDS = 60
+VIDEO_JOB_RETENTION_SECONDS = 24 * 3600
+# Frames buffered between the decode, inference and encode stages
+VIDEO_PIPELINE_QUEUE_SIZE = 8
+# Worker processes for sharded video processing (1 = in-process); requests may ask for up to the maximum
+VIDEO_SHARD_WORKERS = 1
+VIDEO_SHARD_MAX_WORKERS = os.cpu_count() or 1
+VIDEO_SHARD_MIN_SEGMENT_FRAMES = 60
+
+# Coverage paths for enclosed fields: default spray swath, cruise speed and time per turn
+DRONE_SWATH_M = 5.0
+DRONE_SPEED_MPS = 5.0
+DRONE_TURN_S = 4.0
+# Enclosed regions: GPS points closer than this (metres) count as one before the hull is built
+DRONE_HULL_DEDUPE_M = 0.5
+# Streamed GPS traces (/regions/<trace>) kept in memory per process, least recently used dropped first
+DRONE_TRACE_LIMIT = 64
+# Detection map queries: most detections returned per request, most cells per grid count request and
+# largest radius (metres) of a nearest-detections query
+DRONE_DETECTION_LIMIT = 5000
+DRONE_GRID_MAX_CELLS = 10000
+DRONE_NEAR_MAX_RADIUS_M = 5000.0
+# Rendered detection heatmap tiles (shared by worker processes) and the deepest zoom they are served at
+DRONE_TILE_CACHE_DIR = BASE_DIR / 'tile_cache'
+DRONE_TILE_MAX_ZOOM = 20
+# GeoJSON (NDJSON) detection feeds written by drone/detection/main.py and Disease_detect5.py as they run,
+# and the most features one request returns. The scripts read the DRONE_FEED_DIR environment variable, so
+# set that rather than editing this to move the feeds.
+DRONE_FEED_DIR = Path(os.environ.get('DRONE_FEED_DIR') or BASE_DIR / 'detection_feeds')
+DRONE_FEED_PAGE_SIZE = 1000
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -22,6 +22,11 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
     path('api/process_video/', views.process_video, name='process_video'),
+    path('api/video_jobs/', views.submit_video_job, name='submit_video_job'),
+    path('api/video_jobs/<uuid:job_id>/', views.video_job_status, name='video_job_status'),
+    path('api/video_jobs/<uuid:job_id>/result/', views.video_job_result, name='video_job_result'),
+    path('api/video_jobs/<uuid:job_id>/video/', views.video_job_video, name='video_job_video'),
     path('api/process_image/', views.process_image, name='process_image'),
+    path('api/process_image/metrics/', views.inference_metrics, name='inference_metrics'),
 ]
 
@@ -1,33 +1,107 @@
+import asyncio
 import json
+import time
+from urllib.parse import parse_qs
+
+import cv2
+import numpy as np
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 import logging
 
+from detect.engine import result_arrays, to_detections
+from detect.live import LatestFrameSlot, StreamStats
+from detect.registry import ModelUnavailable, UnknownCrop
+from drone.regions import trace_group
+from drone.views import traces
+
 logger = logging.getLogger(__name__)
 
 
+# Room every client of the legacy ws/signaling/ route shares
+LEGACY_SIGNALING_GROUP = 'webrtc_signaling'
+
+
+def load_detector(crop):
+    """The loaded model for ``crop``; the first call loads and warms every configured model."""
+    # Imported here so processes that only do signaling never load the detection models
+    from detect.views import registry
+
+    return registry.get(crop)
+
+
 class SignalingConsumer(AsyncWebsocketConsumer):
+    """
+    WebRTC signaling relay.
+
+    On ``ws/signaling/<room>/`` each client is a peer of that room only and
+    is identified by its channel name, sent to it in a ``welcome`` message.
+    The room is told when peers join (``peer-joined``) or leave
+    (``peer-left``), and a newcomer gets a ``peer-present`` message for each
+    peer already there. A JSON message with ``"target": <peer>`` is delivered
+    to that peer alone, and only if it is a peer of the room; one with
+    ``"broadcast": true`` goes to the rest of the room. Either way the
+    recipient gets it with ``"from": <sender peer>`` so it can answer
+    directly.
+
+    The legacy ``ws/signaling/`` route keeps its old behaviour: everyone is
+    in one room and every message is broadcast as-is.
+    """
+
     async def connect(self):
-        # In this simple example, all clients join the same room.
-        self.room_group_name = 'webrtc_signaling'
+        self.room = self.scope["url_route"]["kwargs"].get("room")
+        self.room_group_name = f"signaling_{self.room}" if self.room else LEGACY_SIGNALING_GROUP
+        # Peers of the room this one may address, kept up to date from the join and leave notices
+        self.peers = set()
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
-        logger.info("WebSocket signaling connection accepted. Channel: %s", self.channel_name)
+        if self.room:
+            # Announced before the welcome, so the peers already in the room know this one before it can send
+            await self.channel_layer.group_send(self.room_group_name, {"type": "peer_joined", "peer": self.channel_name})
+            await self.send(text_data=json.dumps({"type": "welcome", "peer": self.channel_name, "room": self.room}))
+        logger.info("WebSocket signaling connection accepted. Room: %s, channel: %s",
+                    self.room_group_name, self.channel_name)
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if self.room:
+            await self.channel_layer.group_send(self.room_group_name, {"type": "peer_left", "peer": self.channel_name})
         logger.info("WebSocket signaling connection closed. Channel: %s", self.channel_name)
 
     async def receive(self, text_data):
         logger.debug("Received signaling message: %s", text_data)
-        # Broadcast the signaling message to all other participants in the room.
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
+        if not self.room:
+            # Legacy route: broadcast the signaling message to all other participants in the room.
+            await self._broadcast(text_data, raw=True)
+            return
+
+        try:
+            message = json.loads(text_data)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            await self._error("Signaling messages must be JSON objects")
+            return
+        target = message.pop("target", None)
+        broadcast = message.pop("broadcast", False)
+        message["from"] = self.channel_name
+        if target:
+            if not isinstance(target, str) or target not in self.peers:
+                # Anything else may be no channel at all, or another consumer's that cannot handle the message
+                await self._error(f"Unknown peer {target}")
+                return
+            # Only the addressed peer's consumer sees it, however many peers the room has
+            await self.channel_layer.send(target, {
                 'type': 'signaling_message',
-                'message': text_data,
+                'message': json.dumps(message),
                 'sender_channel': self.channel_name,
-            }
-        )
+                'room': self.room,
+            })
+        elif broadcast is True:
+            await self._broadcast(message)
+        else:
+            await self._error('Set "target" to a peer, or "broadcast": true to send to the whole room')
 
     async def signaling_message(self, event):
         message = event['message']
@@ -35,5 +109,172 @@ class SignalingConsumer(AsyncWebsocketConsumer):
         # Avoid echoing the message back to the sender.
         if self.channel_name == sender_channel:
             return
+        # A direct message addressed from another room is not delivered
+        if event.get('room', self.room) != self.room:
+            return
         logger.debug("Sending signaling message to channel %s: %s", self.channel_name, message)
         await self.send(text_data=message)
+
+    async def peer_joined(self, event):
+        """A peer joined the room: note it, tell the client, and introduce this peer to it."""
+        peer = event['peer']
+        if peer == self.channel_name:
+            return
+        self.peers.add(peer)
+        await self.send(text_data=json.dumps({"type": "peer-joined", "peer": peer}))
+        await self.channel_layer.send(peer, {'type': 'peer_present', 'peer': self.channel_name})
+
+    async def peer_present(self, event):
+        """A peer that was already in the room introduced itself."""
+        self.peers.add(event['peer'])
+        await self.send(text_data=json.dumps({"type": "peer-present", "peer": event['peer']}))
+
+    async def peer_left(self, event):
+        self.peers.discard(event['peer'])
+        await self.send(text_data=json.dumps({"type": "peer-left", "peer": event['peer']}))
+
+    async def _broadcast(self, message, raw=False):
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'signaling_message',
+                'message': message if raw else json.dumps(message),
+                'sender_channel': self.channel_name,
+            }
+        )
+
+    async def _error(self, error):
+        await self.send(text_data=json.dumps({"type": "error", "error": error}))
+
+
+class DetectionStreamConsumer(AsyncWebsocketConsumer):
+    """
+    Live disease detection over a WebSocket (``ws/detect/?crop=<name>``).
+
+    The client sends each video frame as one binary message (JPEG or PNG)
+    and gets a JSON ``detections`` message per processed frame, tagged with
+    the frame's sequence number on this connection. Frames go through a
+    single-frame slot: one arriving while the previous is still waiting
+    replaces it, so when inference falls behind stale frames are dropped and
+    latency stays at about one inference time. Every result carries the
+    connection's receive/process rates and drop count; a text message
+    ``{"type": "stats"}`` asks for them on their own.
+    """
+
+    async def connect(self):
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        await self.accept()
+        try:
+            # Off the event loop: on the first connection this takes seconds, and other sockets must keep going
+            self.detector = await sync_to_async(load_detector, thread_sensitive=False)(query.get("crop", [None])[0])
+        except (UnknownCrop, ModelUnavailable) as e:
+            await self.send(text_data=json.dumps({"type": "error", "error": str(e)}))
+            await self.close(code=4400 if isinstance(e, UnknownCrop) else 4503)
+            return
+        self.stats = StreamStats(window=getattr(settings, "DETECT_STREAM_STATS_WINDOW", 5.0))
+        self.slot = LatestFrameSlot()
+        self.sequence = 0
+        self.worker = asyncio.create_task(self._process_frames())
+        await self.send(text_data=json.dumps({"type": "ready", "crop": self.detector.crop}))
+        logger.info("Detection stream opened (%s model). Channel: %s", self.detector.crop, self.channel_name)
+
+    async def disconnect(self, close_code):
+        worker = getattr(self, "worker", None)
+        if worker is None:
+            return
+        worker.cancel()
+        logger.info("Detection stream closed. Channel: %s, stats: %s", self.channel_name, self.stats.snapshot())
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            self.sequence += 1
+            dropped = self.slot.put((self.sequence, time.perf_counter(), bytes_data))
+            self.stats.frame_received(dropped)
+            return
+        try:
+            message = json.loads(text_data or "{}")
+        except ValueError:
+            message = {}
+        if message.get("type") == "stats":
+            await self.send(text_data=json.dumps({"type": "stats", "stats": self.stats.snapshot()}))
+        else:
+            await self.send(text_data=json.dumps({"type": "error", "error": "Send frames as binary messages"}))
+
+    async def _process_frames(self):
+        """Take the newest frame, detect in a worker thread, send the result; one frame in flight at a time."""
+        while True:
+            sequence, received, data = await self.slot.get()
+            try:
+                detections, inference_ms = await sync_to_async(self._detect, thread_sensitive=False)(data)
+            except Exception as e:
+                self.stats.errors += 1
+                logger.error("Detection stream frame %d failed: %s", sequence, str(e))
+                await self.send(text_data=json.dumps({"type": "error", "frame": sequence, "error": str(e)}))
+                continue
+            latency = time.perf_counter() - received
+            self.stats.frame_processed(latency)
+            await self.send(text_data=json.dumps({
+                "type": "detections",
+                "frame": sequence,
+                "detections": detections,
+                "inference_ms": round(inference_ms, 1),
+                "latency_ms": round(latency * 1000, 1),
+                "stats": self.stats.snapshot(),
+            }))
+
+    def _detect(self, data):
+        from detect.views import detections_payload
+
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Frame is not a decodable image")
+        start = time.perf_counter()
+        # Shares batched model calls with the HTTP endpoint and the other streams
+        boxes, scores, classes = result_arrays(self.detector.batcher.submit(image))
+        inference_ms = (time.perf_counter() - start) * 1000
+        return detections_payload(to_detections(boxes, scores, classes, self.detector.names)), inference_ms
+
+
+class RegionConsumer(AsyncWebsocketConsumer):
+    """
+    Live region of a streamed GPS trace (``ws/regions/<trace>/``).
+
+    The client gets the current region on connect, then a ``region``
+    message whenever the hull changes, whether the points came over this
+    socket, another one or ``POST /regions/<trace>``. A client can send
+    batches itself as ``{"points": [[lat, lng], ...]}``; each is answered
+    with an ``ack`` carrying its per-point update cost, and only batches that
+    move the hull are pushed to the followers.
+    """
+
+    async def connect(self):
+        self.trace = self.scope["url_route"]["kwargs"]["trace"]
+        self.group_name = trace_group(self.trace)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send(text_data=json.dumps({"type": "region", **traces.get(self.trace).snapshot()}))
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            message = json.loads(text_data or "{}")
+            if not isinstance(message, dict) or not isinstance(message.get("points"), list):
+                raise ValueError('Send batches as {"points": [[lat, lng], ...]}')
+            # Off the event loop: a large batch takes milliseconds
+            region = await sync_to_async(traces.get(self.trace).add, thread_sensitive=False)(message["points"])
+        except ValueError as e:
+            await self.send(text_data=json.dumps({"type": "error", "error": str(e)}))
+            return
+        if region["changed"]:
+            await self.channel_layer.group_send(self.group_name, {"type": "region_update", "region": region})
+        await self.send(text_data=json.dumps({
+            "type": "ack",
+            "version": region["version"],
+            "changed": region["changed"],
+            "batch": region["batch"],
+        }))
+
+    async def region_update(self, event):
+        await self.send(text_data=json.dumps({"type": "region", **event["region"]}))
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import multiprocessing
+import time
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ROOM_PATH = "/ws/signaling/bench/"
+
+
+def redis_layer(url):
+    return {"default": {"BACKEND": "channels_redis.core.RedisChannelLayer",
+                        "CONFIG": {"hosts": [url], "capacity": 10000, "expiry": 30}}}
+
+
+def in_memory_layer():
+    return {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer", "CONFIG": {"capacity": 10000}}}
+
+
+def start_standin():
+    """A throwaway local Redis server (the one bundled with redislite); returns it and its URL."""
+    try:
+        from redislite import Redis
+    except ImportError:
+        raise CommandError("No --redis-url given and redislite is not installed (pip install -r requirements-dev.txt) "
+                           "to run a local Redis stand-in")
+    server = Redis()
+    return server, f"unix://{server.socket_file}"
+
+
+class Worker:
+    """
+    One process's share of the peers: connects them to the signaling room,
+    reports their ids, then sends each peer's messages to its counterpart in
+    the next process and records the latency of the messages it receives.
+    """
+
+    def __init__(self, index, peers, messages, timeout, inbox, outbox):
+        self.index = index
+        self.peers = peers
+        self.messages = messages
+        self.timeout = timeout
+        self.inbox = inbox
+        self.outbox = outbox
+
+    def run(self, layers):
+        # A fresh (spawned) process: set Django up with the layer under test
+        django.setup()
+        settings.CHANNEL_LAYERS = layers
+        self.outbox.put(asyncio.run(self._run()))
+
+    async def _run(self):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+
+        from api.routing import websocket_urlpatterns
+
+        application = URLRouter(websocket_urlpatterns)
+        communicators, peer_ids = [], []
+        for _ in range(self.peers):
+            communicator = WebsocketCommunicator(application, ROOM_PATH)
+            await communicator.connect(timeout=self.timeout)
+            peer_ids.append(json.loads(await communicator.receive_from(timeout=self.timeout))["peer"])
+            communicators.append(communicator)
+        self.outbox.put((self.index, peer_ids))
+        # Wait until every process has connected; the parent sends back the peers to address
+        targets = await asyncio.to_thread(self.inbox.get)
+        # A peer may only address peers it has been told are in the room
+        await asyncio.gather(*(self._meet(c, target) for c, target in zip(communicators, targets)))
+
+        latencies = []
+        readers = [asyncio.create_task(self._read(c, latencies)) for c in communicators]
+        start = time.time()
+        for number in range(self.messages):
+            for communicator, target in zip(communicators, targets):
+                await communicator.send_to(text_data=json.dumps(
+                    {"type": "offer", "target": target, "sdp": "x" * 200, "number": number, "sent": time.time()}))
+        received = sum(await asyncio.gather(*readers))
+        end = time.time()
+        for communicator in communicators:
+            if not communicator.future.done():
+                await communicator.disconnect()
+        return {"start": start, "end": end, "received": received, "latencies": latencies}
+
+    async def _meet(self, communicator, peer):
+        """Read join and presence notices until one is about ``peer``."""
+        while True:
+            message = json.loads(await communicator.receive_from(timeout=self.timeout))
+            if message.get("type") in ("peer-joined", "peer-present") and message.get("peer") == peer:
+                return
+
+    async def _read(self, communicator, latencies):
+        """Collect this peer's offers, skipping join/leave notices; stops early after ``timeout`` of silence."""
+        received = 0
+        try:
+            while received < self.messages:
+                message = json.loads(await communicator.receive_from(timeout=self.timeout))
+                if message.get("type") == "offer":
+                    latencies.append(time.time() - message["sent"])
+                    received += 1
+        except asyncio.TimeoutError:
+            pass
+        return received
+
+
+class Command(BaseCommand):
+    help = ("Signaling latency and throughput with peers spread over several worker processes on a Redis "
+            "channel layer, against all peers in one process on the in-memory layer")
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                            help="Process counts to run on the Redis layer")
+        parser.add_argument("--peers", type=int, default=50, help="Peers in total, split over the processes")
+        parser.add_argument("--messages", type=int, default=20, help="Messages each peer sends")
+        parser.add_argument("--redis-url", help="Redis server to use (default: a throwaway local one)")
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        redis_url = options["redis_url"]
+        if not redis_url:
+            # Kept referenced: the stand-in shuts down when this object goes away
+            self.standin, redis_url = start_standin()
+        self.stdout.write(f"{options['peers']} peers, {options['messages']} direct messages each, "
+                          f"Redis layer at {redis_url}")
+        self.stdout.write(f"{'layer':>9} {'procs':>5} {'delivered':>11} {'msg/s':>8} {'p50 ms':>7} {'p95 ms':>7} "
+                          f"{'max ms':>7}")
+        runs = [("in-memory", 1, in_memory_layer())]
+        runs += [("redis", workers, redis_layer(redis_url)) for workers in options["workers"]]
+        for name, workers, layers in runs:
+            if options["peers"] < 2 * workers:
+                raise CommandError("Need at least 2 peers per process")
+            self._report(name, workers, self._run(workers, layers, options))
+
+    def _run(self, workers, layers, options):
+        # Spawned rather than forked: the stand-in server's threads live in this process
+        context = multiprocessing.get_context("spawn")
+        outbox = context.Queue()
+        inboxes = [context.Queue() for _ in range(workers)]
+        # The same number of peers in every process, so peer i of one process has a counterpart in the next
+        per_worker = options["peers"] // workers
+        processes = [context.Process(target=Worker(index, per_worker, options["messages"], options["timeout"],
+                                                   inboxes[index], outbox).run, args=(layers,))
+                     for index in range(workers)]
+        for process in processes:
+            process.start()
+        try:
+            peer_ids = dict(outbox.get(timeout=options["timeout"] * 4) for _ in processes)
+            for index, inbox in enumerate(inboxes):
+                # A single process talks to itself: each peer addresses its neighbour
+                targets = peer_ids[(index + 1) % workers]
+                inbox.put(targets[1:] + targets[:1] if workers == 1 else targets)
+            results = [outbox.get(timeout=options["timeout"] * 4) for _ in processes]
+        finally:
+            for process in processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+        return results, per_worker * workers * options["messages"]
+
+    def _report(self, name, workers, run):
+        results, expected = run
+        received = sum(r["received"] for r in results)
+        elapsed = max(r["end"] for r in results) - min(r["start"] for r in results)
+        latencies = np.array([latency for r in results for latency in r["latencies"]]) * 1000
+        p50, p95, worst = np.percentile(latencies, [50, 95, 100]) if latencies.size else (0.0, 0.0, 0.0)
+        self.stdout.write(f"{name:>9} {workers:>5} {f'{received}/{expected}':>11} {received / elapsed:>8.0f} "
+                          f"{p50:>7.1f} {p95:>7.1f} {worst:>7.1f}")
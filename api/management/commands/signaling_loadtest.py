@@ -0,0 +1,96 @@
+import asyncio
+import json
+import time
+
+from channels.routing import URLRouter
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import re_path
+
+from api.consumers import SignalingConsumer
+
+
+class CountingSignalingConsumer(SignalingConsumer):
+    """SignalingConsumer that counts the channel-layer messages it has to handle, echoes included."""
+    handled = 0
+
+    async def signaling_message(self, event):
+        CountingSignalingConsumer.handled += 1
+        await super().signaling_message(event)
+
+
+application = URLRouter([
+    re_path(r'ws/signaling/$', CountingSignalingConsumer.as_asgi()),
+    re_path(r'ws/signaling/(?P<room>[A-Za-z0-9_-]{1,64})/$', CountingSignalingConsumer.as_asgi()),
+])
+
+
+class Command(BaseCommand):
+    help = "Fan-out of signaling messages with N peers: legacy broadcast vs. room-scoped direct delivery"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--peers", type=int, nargs="+", default=[10, 50, 100, 150])
+        parser.add_argument("--messages", type=int, default=1, help="Messages each peer sends")
+        parser.add_argument("--timeout", type=float, default=60)
+
+    def handle(self, *args, **options):
+        if min(options["peers"]) < 2:
+            raise CommandError("Need at least 2 peers")
+        self.stdout.write(f"{options['messages']} message(s) sent per peer")
+        self.stdout.write(f"{'peers':>6} {'mode':>7} {'sent':>6} {'layer msgs':>10} {'delivered':>10} "
+                          f"{'expected':>9} {'ms':>8} {'layer msgs/sent':>15}")
+        for peers in options["peers"]:
+            for mode in ("legacy", "direct"):
+                sent, handled, delivered, expected, elapsed = asyncio.run(
+                    self._run(mode, peers, options["messages"], options["timeout"]))
+                self.stdout.write(f"{peers:>6} {mode:>7} {sent:>6} {handled:>10} {delivered:>10} {expected:>9} "
+                                  f"{elapsed * 1000:>8.0f} {handled / sent:>15.1f}")
+
+    async def _run(self, mode, peers, messages, timeout):
+        from channels.testing import WebsocketCommunicator
+
+        path = "/ws/signaling/" if mode == "legacy" else f"/ws/signaling/loadtest-{peers}/"
+        communicators = []
+        peer_ids = []
+        for index in range(peers):
+            communicator = WebsocketCommunicator(application, path)
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise CommandError(f"Peer {index} could not connect")
+            if mode == "direct":
+                peer_ids.append(json.loads(await communicator.receive_from())["peer"])
+            communicators.append(communicator)
+        if mode == "direct":
+            # Each peer is told about every other one (joined before or after it) before it may address them
+            await asyncio.gather(*(self._receive(c, peers - 1, timeout) for c in communicators))
+
+        CountingSignalingConsumer.handled = 0
+        start = time.perf_counter()
+        for index, communicator in enumerate(communicators):
+            for number in range(messages):
+                message = {"type": "offer", "sdp": "x" * 200, "number": number}
+                if mode == "direct":
+                    # Each peer negotiates with its neighbour, as a viewer would with one drone
+                    message["target"] = peer_ids[(index + 1) % peers]
+                await communicator.send_to(text_data=json.dumps(message))
+        expected = messages * (peers - 1) if mode == "legacy" else messages
+        received = await asyncio.gather(*(self._receive(c, expected, timeout) for c in communicators))
+        elapsed = time.perf_counter() - start
+        handled = CountingSignalingConsumer.handled
+
+        for communicator in communicators:
+            # A receive timeout has already stopped that peer's consumer
+            if not communicator.future.done():
+                await communicator.disconnect()
+        return peers * messages, handled, sum(received), expected * peers, elapsed
+
+    async def _receive(self, communicator, count, timeout):
+        """Read up to ``count`` messages; fewer if the peer stays silent for ``timeout`` seconds (which stops it)."""
+        received = 0
+        try:
+            while received < count:
+                await communicator.receive_from(timeout=timeout)
+                received += 1
+        except asyncio.TimeoutError:
+            pass
+        return received
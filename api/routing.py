@@ -1,6 +1,9 @@
 from django.urls import re_path
-from api.consumers import SignalingConsumer
+from api.consumers import DetectionStreamConsumer, RegionConsumer, SignalingConsumer
 
 websocket_urlpatterns = [
     re_path(r'ws/signaling/$', SignalingConsumer.as_asgi()),
+    re_path(r'ws/signaling/(?P<room>[A-Za-z0-9_-]{1,64})/$', SignalingConsumer.as_asgi()),
+    re_path(r'ws/detect/$', DetectionStreamConsumer.as_asgi()),
+    re_path(r'ws/regions/(?P<trace>[A-Za-z0-9_-]{1,64})/$', RegionConsumer.as_asgi()),
 ]
@@ -1,3 +1,287 @@
-from django.test import TestCase
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import threading
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cv2
+import django
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from detect.live import LatestFrameSlot
+from detect.registry import UnknownCrop
+
+ROOM_PATH = "/ws/signaling/tests/"
+TIMEOUT = 10
+
+
+def redis_layers(url):
+    return {"default": {"BACKEND": "channels_redis.core.RedisChannelLayer", "CONFIG": {"hosts": [url]}}}
+
+
+def application():
+    # Imported late: a spawned process sets Django up first
+    from channels.routing import URLRouter
+
+    from api.routing import websocket_urlpatterns
+    return URLRouter(websocket_urlpatterns)
+
+
+async def join(path=ROOM_PATH):
+    """A connected peer of the room and its id, from the welcome message."""
+    from channels.testing import WebsocketCommunicator
+
+    communicator = WebsocketCommunicator(application(), path)
+    connected, _ = await communicator.connect(timeout=TIMEOUT)
+    assert connected
+    welcome = json.loads(await communicator.receive_from(timeout=TIMEOUT))
+    return communicator, welcome["peer"]
+
+
+async def join_legacy():
+    """A connected client of the legacy route, which has no welcome message."""
+    from channels.testing import WebsocketCommunicator
+
+    communicator = WebsocketCommunicator(application(), "/ws/signaling/")
+    connected, _ = await communicator.connect(timeout=TIMEOUT)
+    assert connected
+    return communicator
+
+
+async def receive_type(communicator, message_type):
+    """The next message of ``message_type``, skipping join/leave notices."""
+    while True:
+        message = json.loads(await communicator.receive_from(timeout=TIMEOUT))
+        if message["type"] == message_type:
+            return message
+
+
+async def meet(communicator, peer):
+    """Wait until ``communicator``'s peer has been told ``peer`` is in the room, so it may address it."""
+    while True:
+        message = json.loads(await communicator.receive_from(timeout=TIMEOUT))
+        if message["type"] in ("peer-joined", "peer-present") and message["peer"] == peer:
+            return
+
+
+def remote_peer(layers, outbox):
+    """
+    Runs in its own process: joins the room, reports its peer id, answers
+    the first offer it gets to whoever sent it, and reports that offer.
+    """
+    django.setup()
+    settings.CHANNEL_LAYERS = layers
+
+    async def run():
+        communicator, peer = await join()
+        outbox.put(peer)
+        offer = await receive_type(communicator, "offer")
+        await communicator.send_to(text_data=json.dumps({"type": "answer", "target": offer["from"], "sdp": "a"}))
+        # Give the layer time to deliver before the connection goes away
+        await asyncio.sleep(0.5)
+        await communicator.disconnect()
+        return offer
+
+    outbox.put(asyncio.run(run()))
+
+
+@skipUnless(importlib.util.find_spec("redislite"), "needs redislite (requirements-dev.txt)")
+class SharedChannelLayerTests(SimpleTestCase):
+    """Signaling over the Redis channel layer that several Daphne processes share (CHANNEL_REDIS_URL)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from redislite import Redis
+
+        # A throwaway local Redis server, shut down when the class is done
+        cls.redis = Redis()
+        cls.addClassCleanup(cls.redis.shutdown)
+        cls.layers = redis_layers(f"unix://{cls.redis.socket_file}")
+
+    async def test_direct_message_reaches_only_its_target(self):
+        with self.settings(CHANNEL_LAYERS=self.layers):
+            sender, sender_id = await join()
+            target, target_id = await join()
+            await meet(sender, target_id)
+            bystander, _ = await join()
+            for peer in (sender_id, target_id):
+                await meet(bystander, peer)
+            await sender.send_to(text_data=json.dumps({"type": "offer", "target": target_id, "sdp": "o"}))
+            self.assertEqual((await receive_type(target, "offer"))["sdp"], "o")
+            self.assertTrue(await bystander.receive_nothing(timeout=0.5))
+            for communicator in (sender, target, bystander):
+                await communicator.disconnect()
+
+    async def test_delivery_across_processes(self):
+        # Spawned rather than forked: the Redis server's threads live in this process
+        context = multiprocessing.get_context("spawn")
+        outbox = context.Queue()
+        process = context.Process(target=remote_peer, args=(self.layers, outbox))
+        process.start()
+        self.addCleanup(process.join, 10)
+        remote_id = await asyncio.to_thread(outbox.get, timeout=60)
+
+        with self.settings(CHANNEL_LAYERS=self.layers):
+            local, local_id = await join()
+            await meet(local, remote_id)
+            await local.send_to(text_data=json.dumps({"type": "offer", "target": remote_id, "sdp": "o"}))
+            answer = await receive_type(local, "answer")
+            await local.disconnect()
+
+        offer = await asyncio.to_thread(outbox.get, timeout=TIMEOUT)
+        self.assertEqual((offer["from"], offer["sdp"]), (local_id, "o"))
+        self.assertEqual(answer["from"], remote_id)
+
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class SignalingTests(SimpleTestCase):
+    """Rooms, broadcasts and direct messages on the in-memory channel layer of a single process."""
+
+    async def join_room(self, count):
+        """``count`` peers of the room, each told about all the others."""
+        peers = [await join() for _ in range(count)]
+        for communicator, peer in peers:
+            for _, other in peers:
+                if other != peer:
+                    await meet(communicator, other)
+        return peers
+
+    async def leave(self, *communicators):
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    async def test_peers_are_told_who_is_in_the_room(self):
+        (first, first_id), = await self.join_room(1)
+        second, second_id = await join()
+        self.assertEqual(json.loads(await first.receive_from(TIMEOUT)), {"type": "peer-joined", "peer": second_id})
+        self.assertEqual(json.loads(await second.receive_from(TIMEOUT)), {"type": "peer-present", "peer": first_id})
+        await second.disconnect()
+        self.assertEqual(json.loads(await first.receive_from(TIMEOUT)), {"type": "peer-left", "peer": second_id})
+        await first.disconnect()
+
+    async def test_other_rooms_are_not_told(self):
+        (peer, _), = await self.join_room(1)
+        other, _ = await join("/ws/signaling/elsewhere/")
+        self.assertTrue(await peer.receive_nothing(timeout=0.2))
+        await self.leave(peer, other)
+
+    async def test_broadcast_reaches_the_rest_of_the_room(self):
+        (sender, sender_id), (first, _), (second, _) = await self.join_room(3)
+        outsider, _ = await join("/ws/signaling/elsewhere/")
+        await sender.send_to(text_data=json.dumps({"type": "candidate", "broadcast": True, "candidate": "c"}))
+        for communicator in (first, second):
+            self.assertEqual(await receive_type(communicator, "candidate"),
+                             {"type": "candidate", "candidate": "c", "from": sender_id})
+        self.assertTrue(await sender.receive_nothing(timeout=0.2))
+        self.assertTrue(await outsider.receive_nothing(timeout=0.2))
+        await self.leave(sender, first, second, outsider)
+
+    async def test_direct_message_reaches_only_its_target(self):
+        (sender, sender_id), (target, target_id), (bystander, _) = await self.join_room(3)
+        await sender.send_to(text_data=json.dumps({"type": "offer", "target": target_id, "sdp": "o"}))
+        self.assertEqual(await receive_type(target, "offer"), {"type": "offer", "sdp": "o", "from": sender_id})
+        self.assertTrue(await bystander.receive_nothing(timeout=0.2))
+        await self.leave(sender, target, bystander)
+
+    async def test_only_peers_of_the_room_can_be_addressed(self):
+        (sender, _), (departed, departed_id) = await self.join_room(2)
+        outsider, outsider_id = await join("/ws/signaling/elsewhere/")
+        await departed.disconnect()
+        await receive_type(sender, "peer-left")
+        # A peer that left, one of another room, a channel that does not exist and one that is not a string
+        for target in (departed_id, outsider_id, "specific..inmemory!missing", ["list"]):
+            await sender.send_to(text_data=json.dumps({"type": "offer", "target": target}))
+            self.assertEqual(await receive_type(sender, "error"), {"type": "error", "error": f"Unknown peer {target}"})
+        self.assertTrue(await outsider.receive_nothing(timeout=0.2))
+        await self.leave(sender, outsider)
+
+    async def test_legacy_route_broadcasts_as_is(self):
+        sender, receiver = [await join_legacy() for _ in range(2)]
+        await sender.send_to(text_data="not even json")
+        self.assertEqual(await receiver.receive_from(TIMEOUT), "not even json")
+        self.assertTrue(await sender.receive_nothing(timeout=0.2))
+        await self.leave(sender, receiver)
+
+
+class LatestFrameSlotTests(SimpleTestCase):
+    async def test_newest_frame_replaces_an_untaken_one(self):
+        slot = LatestFrameSlot()
+        self.assertFalse(slot.put(1))
+        self.assertTrue(slot.put(2))
+        self.assertEqual(await slot.get(), 2)
+        self.assertFalse(slot.put(3))
+        self.assertEqual(await slot.get(), 3)
+
+    async def test_get_waits_for_a_frame(self):
+        slot = LatestFrameSlot()
+        waiting = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        slot.put(1)
+        self.assertEqual(await asyncio.wait_for(waiting, TIMEOUT), 1)
+
+
+class DetectionStreamTests(SimpleTestCase):
+    """The live detection socket with a stub model: one box of class 0 on every frame."""
+
+    def setUp(self):
+        self.loaded_in = []
+        detector = SimpleNamespace(crop="groundnut", names={0: "Rust-Leaf"}, batcher=SimpleNamespace(submit=str))
+
+        def load_detector(crop):
+            self.loaded_in.append(threading.get_ident())
+            if crop == "rice":
+                raise UnknownCrop("Unknown crop rice; expected one of groundnut")
+            return detector
+
+        arrays = (np.array([[1, 2, 3, 4]], dtype=np.float32), np.array([0.9], dtype=np.float32), np.array([0]))
+        for target, patch in (("api.consumers.load_detector", {"side_effect": load_detector}),
+                              ("api.consumers.result_arrays", {"return_value": arrays})):
+            patcher = mock.patch(target, **patch)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def connect(self, path="/ws/detect/"):
+        from channels.testing import WebsocketCommunicator
+
+        communicator = WebsocketCommunicator(application(), path)
+        connected, _ = await communicator.connect(timeout=TIMEOUT)
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_models_are_loaded_off_the_event_loop(self):
+        communicator = await self.connect()
+        self.assertEqual(await communicator.receive_json_from(TIMEOUT), {"type": "ready", "crop": "groundnut"})
+        self.assertNotEqual(self.loaded_in, [threading.get_ident()])
+        await communicator.disconnect()
+
+    async def test_unknown_crop_closes_the_socket(self):
+        communicator = await self.connect("/ws/detect/?crop=rice")
+        message = await communicator.receive_json_from(TIMEOUT)
+        self.assertEqual(message["type"], "error")
+        self.assertEqual((await communicator.receive_output(TIMEOUT))["code"], 4400)
+
+    async def test_frames_get_detections(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from(TIMEOUT)
+        ok, png = cv2.imencode(".png", np.zeros((8, 8, 3), dtype=np.uint8))
+        await communicator.send_to(bytes_data=png.tobytes())
+        message = await communicator.receive_json_from(TIMEOUT)
+        self.assertEqual((message["type"], message["frame"]), ("detections", 1))
+        self.assertEqual([box["label"] for box in message["detections"]], ["Rust-Leaf"])
+        self.assertEqual(message["stats"]["processed"], 1)
+
+        await communicator.send_to(bytes_data=b"not an image")
+        message = await communicator.receive_json_from(TIMEOUT)
+        self.assertEqual((message["type"], message["frame"]), ("error", 2))
+
+        await communicator.send_to(text_data=json.dumps({"type": "stats"}))
+        stats = (await communicator.receive_json_from(TIMEOUT))["stats"]
+        self.assertEqual((stats["received"], stats["processed"], stats["errors"]), (2, 1, 1))
+        await communicator.disconnect()
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from detect.models import VideoJob
+
+
+@admin.register(VideoJob)
+class VideoJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "frame_count", "total_frames", "created_at", "updated_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "updated_at")
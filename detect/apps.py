@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class DetectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'detect'
+
+    def ready(self):
+        from detect.jobs import serves_requests, start_job_monitor
+
+        # Queued and interrupted video jobs run without waiting for the next upload
+        if getattr(settings, "VIDEO_JOB_AUTOSTART", True) and serves_requests():
+            start_job_monitor()
@@ -0,0 +1,137 @@
+import logging
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from detect.evaluation import load_images
+
+logger = logging.getLogger(__name__)
+
+# Inference backend -> ultralytics export format (None: run the .pt weights directly)
+BACKENDS = {
+    "pytorch": None,
+    "onnx": "onnx",
+    "openvino": "openvino",
+}
+
+# Weight precisions and the backends that can run them on CPU
+PRECISIONS = {
+    "fp32": ("pytorch", "onnx", "openvino"),
+    "fp16": ("openvino",),
+    "int8": ("onnx",),
+}
+
+
+def exported_path(weights, backend, precision="fp32"):
+    """Where the export of ``weights`` for ``backend`` and ``precision`` is kept."""
+    stem = os.path.splitext(weights)[0]
+    if precision != "fp32":
+        stem += f"_{precision}"
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    return weights
+
+
+def takes_any_batch(export):
+    """
+    Whether an OpenVINO export was made with a dynamic batch. ultralytics
+    records its export arguments in ``metadata.yaml``; older static exports
+    here only take one image per call.
+    """
+    import yaml
+
+    try:
+        with open(os.path.join(export, "metadata.yaml")) as f:
+            metadata = yaml.safe_load(f) or {}
+    except OSError:
+        return False
+    return bool((metadata.get("args") or {}).get("dynamic"))
+
+
+def letterbox(image, size):
+    """Resize keeping the aspect ratio and pad to ``size`` x ``size``, as ultralytics does for exports."""
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top = (size - resized.shape[0]) // 2
+    left = (size - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return canvas
+
+
+def quantize_onnx(source, target, imgsz=640, calibration_dir=None, max_images=64):
+    """
+    INT8 copy of an ONNX model. With calibration images the activations are
+    quantized too (static QDQ), which is what makes it faster on CPU;
+    without them only the weights are (dynamic), which mostly saves memory.
+    """
+    import onnxruntime
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic,
+                                          quantize_static)
+
+    images = load_images(calibration_dir, max_images) if calibration_dir else []
+    if not images:
+        logger.warning("No INT8 calibration images; quantizing %s weights only", source)
+        quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+        return target
+
+    input_name = onnxruntime.InferenceSession(source, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._images = iter(images)
+
+        def get_next(self):
+            item = next(self._images, None)
+            if item is None:
+                return None
+            rgb = cv2.cvtColor(letterbox(item[1], imgsz), cv2.COLOR_BGR2RGB)
+            return {input_name: (rgb.transpose(2, 0, 1)[None] / 255.0).astype(np.float32)}
+
+    logger.info("Calibrating INT8 %s on %d images", target, len(images))
+    quantize_static(source, target, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    weight_type=QuantType.QInt8, activation_type=QuantType.QUInt8)
+    return target
+
+
+def prepare_weights(weights, backend="pytorch", imgsz=640, precision="fp32", calibration_dir=None):
+    """
+    Path of the weights to load for ``backend`` and ``precision``. Anything
+    but fp32 PyTorch uses an export next to the ``.pt`` file, which is
+    (re)built when it is missing, older than the ``.pt`` or, for OpenVINO,
+    limited to a batch of one. Every backend is loaded through ultralytics,
+    so the results keep the same schema whichever one runs.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend}; expected one of {', '.join(BACKENDS)}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision}; expected one of {', '.join(PRECISIONS)}")
+    if backend not in PRECISIONS[precision]:
+        raise ValueError(f"{precision} needs the {' or '.join(PRECISIONS[precision])} backend")
+    if BACKENDS[backend] is None:
+        return weights
+
+    target = exported_path(weights, backend, precision)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights) \
+            and (backend != "openvino" or takes_any_batch(target)):
+        return target
+
+    if backend == "onnx" and precision == "int8":
+        return quantize_onnx(prepare_weights(weights, "onnx", imgsz), target, imgsz, calibration_dir)
+
+    from ultralytics import YOLO
+
+    logger.info("Exporting %s for the %s backend (%s)", weights, backend, precision)
+    # Dynamic batch so the batcher and tiled detection can still send several images per call
+    exported = str(YOLO(weights).export(format=BACKENDS[backend], imgsz=imgsz, dynamic=True,
+                                        half=precision == "fp16"))
+    if os.path.normpath(exported) != os.path.normpath(target):
+        # ultralytics names OpenVINO exports the same whatever the precision
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.move(exported, target)
+    return target
@@ -0,0 +1,127 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBatcher:
+    """
+    Collects concurrent single-image inference requests into one model call.
+
+    Callers block in :meth:`submit` while a background thread gathers up to
+    ``max_batch_size`` images, waiting at most ``max_wait_ms`` after the first
+    one arrives, runs them through the model together and hands each caller
+    its own ``Results`` object. Callers wait at most ``timeout_s`` seconds,
+    so a wedged model or a stopped thread surfaces as an error, not a hang.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=10, history=200, timeout_s=60.0):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.timeout = timeout_s
+        self._queue = queue.Queue()
+        self._metrics = deque(maxlen=history)
+        self._metrics_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, timeout=None):
+        """Queue one BGR image and wait for its detection result."""
+        return self.submit_many([image], timeout)[0]
+
+    def submit_many(self, images, timeout=None):
+        """
+        Queue several images together (e.g. the tiles of one photo) and wait
+        for all results, at most ``timeout`` seconds (default: the batcher's);
+        raises TimeoutError after that.
+        """
+        if not self._thread.is_alive():
+            raise RuntimeError("Inference batcher thread has stopped")
+        enqueued = time.perf_counter()
+        futures = []
+        for image in images:
+            future = Future()
+            self._queue.put((image, enqueued, future))
+            futures.append(future)
+        deadline = enqueued + (self.timeout if timeout is None else timeout)
+        return [future.result(max(0.0, deadline - time.perf_counter())) for future in futures]
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires."""
+        batch = [self._queue.get()]
+        deadline = batch[0][1] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Requests that piled up during the previous batch are taken without waiting
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._infer(batch)
+            except Exception as e:
+                # The callers get the error; the thread goes on to the next batch
+                logger.error("Batched inference failed for %d images: %s", len(batch), str(e))
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _infer(self, batch):
+        images = [image for image, _, _ in batch]
+        start = time.perf_counter()
+        waits = [start - enqueued for _, enqueued, _ in batch]
+        results = self.model(images)
+        inference_time = time.perf_counter() - start
+        if len(results) != len(batch):
+            raise RuntimeError(f"Model returned {len(results)} results for {len(batch)} images")
+
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+        self._record(len(batch), waits, inference_time)
+
+    def _record(self, size, waits, inference_time):
+        entry = {
+            "batch_size": size,
+            "queue_wait_ms_max": max(waits) * 1000,
+            "queue_wait_ms_mean": sum(waits) / size * 1000,
+            "inference_ms": inference_time * 1000,
+            "timestamp": time.time(),
+        }
+        with self._metrics_lock:
+            self._metrics.append(entry)
+        logger.info("Inference batch of %d: queue wait %.1f ms (max), inference %.1f ms",
+                    size, entry["queue_wait_ms_max"], entry["inference_ms"])
+
+    def metrics(self):
+        """Recent per-batch metrics plus a summary over them."""
+        with self._metrics_lock:
+            batches = list(self._metrics)
+        summary = {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize(),
+            "batches": len(batches),
+        }
+        if batches:
+            images = sum(b["batch_size"] for b in batches)
+            summary.update({
+                "images": images,
+                "mean_batch_size": images / len(batches),
+                "mean_queue_wait_ms": sum(b["queue_wait_ms_mean"] * b["batch_size"] for b in batches) / images,
+                "mean_inference_ms_per_image": sum(b["inference_ms"] for b in batches) / images,
+            })
+        return {"summary": summary, "recent_batches": batches}
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def image_key(image, model_identity, params):
+    """
+    Cache key for a decoded image: a hash of its pixel bytes and shape plus the
+    model identity and detection parameters, so a change of weights or
+    thresholds never serves stale detections.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps([model_identity, params, image.shape, str(image.dtype)], sort_keys=True).encode())
+    digest.update(memoryview(image if image.flags.c_contiguous else image.copy()).cast("B"))
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """
+    Two-tier cache of ``(detections, annotated_jpeg)`` by image key (the JPEG
+    is None when only the detections were needed): an in-memory LRU bounded
+    by ``max_entries`` and by ``max_bytes`` of JPEG and detections JSON and,
+    when ``directory`` is given, an on-disk tier that survives restarts and is
+    shared between worker processes. Disk hits are promoted into memory; an
+    entry larger than ``max_bytes`` on its own is only kept on disk.
+    """
+
+    def __init__(self, max_entries=256, directory=None, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = str(directory) if directory else None
+        self._entries = OrderedDict()
+        # Size of each in-memory entry and their total
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".json", base + ".jpg"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return self._entries[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, detections, jpeg_bytes):
+        entry = (detections, jpeg_bytes)
+        with self._lock:
+            self._counters["stores"] += 1
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def _remember(self, key, entry):
+        detections, jpeg_bytes = entry
+        size = len(json.dumps(detections)) + (len(jpeg_bytes) if jpeg_bytes is not None else 0)
+        self._forget(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._sizes[key] = size
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._forget(next(iter(self._entries)))
+            self._counters["evictions"] += 1
+
+    def _forget(self, key):
+        if key in self._entries:
+            del self._entries[key]
+            self._bytes -= self._sizes.pop(key)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        json_path, jpeg_path = self._paths(key)
+        try:
+            with open(json_path) as f:
+                detections = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            with open(jpeg_path, "rb") as f:
+                return detections, f.read()
+        except OSError:
+            return detections, None
+
+    def _write_disk(self, key, entry):
+        if not self.directory:
+            return
+        detections, jpeg_bytes = entry
+        json_path, jpeg_path = self._paths(key)
+        try:
+            os.makedirs(os.path.dirname(json_path), exist_ok=True)
+            # JPEG first and JSON last, each renamed into place, so readers never see half an entry
+            files = [(json_path, json.dumps(detections), "w")]
+            if jpeg_bytes is not None:
+                files.insert(0, (jpeg_path, jpeg_bytes, "wb"))
+            for path, data, mode in files:
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+                with os.fdopen(fd, mode) as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to write detection cache entry %s: %s", key, str(e))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._entries)
+            counters["bytes"] = self._bytes
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        counters["hit_rate"] = (counters["memory_hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+        counters["max_entries"] = self.max_entries
+        counters["max_bytes"] = self.max_bytes
+        counters["disk_tier"] = bool(self.directory)
+        return counters
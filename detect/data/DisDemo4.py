@@ -1,8 +1,17 @@
+import sys
+from pathlib import Path
+
 import cv2
 from ultralytics import YOLO
 import folium
 import random
 
+if __package__ in (None, ""):
+    # Run as a plain script: make the repository root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from detect.engine import DISEASE_INFO, SURVEY_THRESHOLD, annotate_frame, postprocess  # noqa: E402
+
 # Constants for VIT-AP University coordinates
 VIT_AP_LAT = 16.4419
 VIT_AP_LON = 80.6220
@@ -11,20 +20,6 @@ VIT_AP_LON = 80.6220
 LAT_OFFSET = 0.005  # ~555 meters
 LON_OFFSET = 0.005  # ~555 meters
 
-# Disease information dictionary
-DISEASE_INFO = {
-    "Black Fungus Pod": {"color": "black", "medicine": "Mancozeb or Carbendazim"},
-    "Early and Late leaf spot": {"color": "blue", "medicine": "Chlorothalonil or Propiconazole"},
-    "Fungus leaf": {"color": "green", "medicine": "Copper Oxychloride"},
-    "Rust-Leaf": {"color": "orange", "medicine": "Hexaconazole or Sulphur"},
-    "black fungus-groundnut": {"color": "gray", "medicine": "Carbendazim or Thiophanate-methyl"},
-    "brown Fungus Pod": {"color": "brown", "medicine": "Mancozeb or Chlorothalonil"},
-    "bakteri_daun_bergaris": {"color": "yellow", "medicine": "Streptomycin or Copper Hydroxide"},
-    "bercak_coklat": {"color": "red", "medicine": "Propiconazole or Mancozeb"},
-    "bercak_coklat_sempit": {"color": "purple", "medicine": "Carbendazim or Propiconazole"},
-    "hawar_daun_bakteri": {"color": "cyan", "medicine": "Copper Oxychloride or Streptomycin"},
-    "tungro": {"color": "pink", "medicine": "Buprofezin or Imidacloprid"}
-}
 
 def generate_random_coordinates():
     """Generate random coordinates within offset range of VIT-AP"""
@@ -47,74 +42,27 @@ def create_marker(map_obj, lat, lon, disease):
 def process_detection(results, frame):
     """Process YOLO detection results"""
     detected_diseases = []
-    current_disease = None
-    current_medicine = None
-    
+
     try:
-        # Create a copy of the frame for annotations
-        annotated_frame = frame.copy()
-        height, width = annotated_frame.shape[:2]
-        
-        # Get all detections
-        for result in results[0].boxes:
-            # Extract class ID and confidence
-            class_id = int(result.cls.item())
-            confidence = float(result.conf.item())
-            
-            # Get disease name from model's names dictionary
-            disease = results[0].names[class_id]
-            
-            # Only process detections with confidence > 0.7 (70%)
-            if disease in DISEASE_INFO and confidence > 0.2:
-                # Store the current disease and medicine for display
-                current_disease = disease
-                current_medicine = DISEASE_INFO[disease]["medicine"]
-                
-                # Generate random location for the detection
-                lat, lon = generate_random_coordinates()
-                detected_diseases.append({
-                    "disease": disease,
-                    "confidence": confidence,
-                    "coordinates": (lat, lon)
-                })
-                
-                # Draw detection box and confidence
-                box = result.xyxy[0].cpu().numpy()  # Get box coordinates
-                x1, y1, x2, y2 = map(int, box[:4])
-                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(annotated_frame, f"{disease} {confidence:.2f}", 
-                           (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
-        # Add disease name at top left
-        if current_disease:
-            # Create semi-transparent background for text
-            overlay = annotated_frame.copy()
-            cv2.rectangle(overlay, (10, 10), (width//2, 40), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.3, annotated_frame, 0.7, 0, annotated_frame)
-            cv2.putText(annotated_frame, f"Disease: {current_disease}", 
-                       (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-        # Add medicine at bottom right
-        if current_medicine:
-            text_size = cv2.getTextSize(f"Medicine: {current_medicine}", 
-                                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-            # Create semi-transparent background for text
-            overlay = annotated_frame.copy()
-            cv2.rectangle(overlay, 
-                         (width - text_size[0] - 30, height - 40),
-                         (width - 10, height - 10),
-                         (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.3, annotated_frame, 0.7, 0, annotated_frame)
-            cv2.putText(annotated_frame, f"Medicine: {current_medicine}",
-                       (width - text_size[0] - 20, height - 20),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-        return detected_diseases, annotated_frame
-    
+        # Known diseases above the survey threshold, post-processed for the whole frame at once
+        detections = postprocess(results[0], min_confidence=SURVEY_THRESHOLD, known_only=True)
+        for disease, confidence in zip(detections.labels.tolist(), detections.scores.tolist()):
+            # Generate random location for the detection
+            lat, lon = generate_random_coordinates()
+            detected_diseases.append({
+                "disease": disease,
+                "confidence": confidence,
+                "coordinates": (lat, lon)
+            })
+
+        # Boxes plus the last disease at top left and its medicine at bottom right
+        return detected_diseases, annotate_frame(frame, detections, summary=True)
+
     except Exception as e:
         print(f"Error processing detection: {e}")
         return [], frame
 
+
 def main():
     # Initialize the map centered at VIT-AP
     map_obj = folium.Map(location=[VIT_AP_LAT, VIT_AP_LON], zoom_start=15)
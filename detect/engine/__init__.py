@@ -0,0 +1,14 @@
+"""
+Detection core shared by the web views and the standalone drone scripts:
+the disease class table and thresholds, post-processing of YOLO results
+into arrays, and frame annotation.
+"""
+from detect.engine.annotate import annotate_frame, draw_boxes, draw_detections, draw_summary
+from detect.engine.classes import DISEASE_INFO, LIVE_THRESHOLD, SURVEY_THRESHOLD
+from detect.engine.postprocess import Detections, class_table, postprocess, result_arrays, to_detections
+
+__all__ = [
+    "DISEASE_INFO", "LIVE_THRESHOLD", "SURVEY_THRESHOLD",
+    "Detections", "class_table", "postprocess", "result_arrays", "to_detections",
+    "annotate_frame", "draw_boxes", "draw_detections", "draw_summary",
+]
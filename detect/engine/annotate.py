@@ -0,0 +1,53 @@
+import cv2
+
+BOX_COLOR = (0, 255, 0)
+TEXT_COLOR = (255, 255, 255)
+
+
+def draw_boxes(frame, boxes, labels, color=BOX_COLOR):
+    """Draw ``(x1, y1, x2, y2)`` boxes with a text label above each, in place."""
+    for (x1, y1, x2, y2), label in zip(boxes, labels):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return frame
+
+
+def draw_detections(frame, detections):
+    """Draw every box of a Detections with its ``"<disease> <confidence>"`` label, in place."""
+    labels = [f"{label} {score:.2f}" for label, score in zip(detections.labels.tolist(), detections.scores.tolist())]
+    return draw_boxes(frame, detections.boxes.astype(int).tolist(), labels)
+
+
+def _shade(frame, x1, y1, x2, y2):
+    # Same pixels as blending a filled black rectangle at 30% over the whole frame, but only the rectangle is touched
+    x1, y1 = max(x1, 0), max(y1, 0)
+    region = frame[y1:y2 + 1, x1:x2 + 1]
+    if region.size:
+        cv2.convertScaleAbs(region, dst=region, alpha=0.7)
+
+
+def draw_summary(frame, disease, medicine):
+    """Disease banner at the top left and recommended medicine at the bottom right, in place."""
+    height, width = frame.shape[:2]
+    if disease:
+        _shade(frame, 10, 10, width // 2, 40)
+        cv2.putText(frame, f"Disease: {disease}", (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, TEXT_COLOR, 2)
+    if medicine:
+        text = f"Medicine: {medicine}"
+        text_width = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0][0]
+        _shade(frame, width - text_width - 30, height - 40, width - 10, height - 10)
+        cv2.putText(frame, text, (width - text_width - 20, height - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, TEXT_COLOR, 2)
+    return frame
+
+
+def annotate_frame(frame, detections, summary=False):
+    """
+    Annotated copy of ``frame``: every detection box and, with ``summary``,
+    the disease and medicine of the last detection as banners.
+    """
+    annotated = frame.copy()
+    draw_detections(annotated, detections)
+    if summary and len(detections.labels):
+        draw_summary(annotated, detections.labels[-1], detections.medicines[-1])
+    return annotated
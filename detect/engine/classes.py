@@ -0,0 +1,19 @@
+# Disease classes of the crop models, with the map colour and recommended treatment of each
+DISEASE_INFO = {
+    "Black Fungus Pod": {"color": "black", "medicine": "Mancozeb or Carbendazim"},
+    "Early and Late leaf spot": {"color": "blue", "medicine": "Chlorothalonil or Propiconazole"},
+    "Fungus leaf": {"color": "green", "medicine": "Copper Oxychloride"},
+    "Rust-Leaf": {"color": "orange", "medicine": "Hexaconazole or Sulphur"},
+    "black fungus-groundnut": {"color": "gray", "medicine": "Carbendazim or Thiophanate-methyl"},
+    "brown Fungus Pod": {"color": "brown", "medicine": "Mancozeb or Chlorothalonil"},
+    "bakteri_daun_bergaris": {"color": "yellow", "medicine": "Streptomycin or Copper Hydroxide"},
+    "bercak_coklat": {"color": "red", "medicine": "Propiconazole or Mancozeb"},
+    "bercak_coklat_sempit": {"color": "purple", "medicine": "Carbendazim or Propiconazole"},
+    "hawar_daun_bakteri": {"color": "cyan", "medicine": "Copper Oxychloride or Streptomycin"},
+    "tungro": {"color": "pink", "medicine": "Buprofezin or Imidacloprid"}
+}
+
+# Minimum confidence for a detection to be reported by the survey tools (single images mapped to locations)
+SURVEY_THRESHOLD = 0.2
+# Minimum confidence for live camera streams, where a false positive costs a wrong treatment marker
+LIVE_THRESHOLD = 0.7
@@ -0,0 +1,74 @@
+import functools
+from typing import NamedTuple
+
+import numpy as np
+
+from detect.engine.classes import DISEASE_INFO
+
+
+class Detections(NamedTuple):
+    """Detections of one image as parallel arrays, one row per box."""
+    boxes: np.ndarray      # (N, 4) float32 xyxy pixels
+    scores: np.ndarray     # (N,) float32
+    class_ids: np.ndarray  # (N,) int64
+    labels: np.ndarray     # (N,) class names
+    medicines: np.ndarray  # (N,) DISEASE_INFO medicine, "" for classes it does not list
+    known: np.ndarray      # (N,) True where the class is in DISEASE_INFO
+
+    def rows(self):
+        """``((x1, y1, x2, y2), score, class_id, label, medicine)`` per box, as plain Python values."""
+        return zip(self.boxes.astype(int).tolist(), self.scores.tolist(), self.class_ids.tolist(),
+                   self.labels.tolist(), self.medicines.tolist())
+
+
+def result_arrays(result):
+    """``(boxes xyxy, scores, class_ids)`` of one ultralytics Results, one device-to-host copy per tensor."""
+    boxes = result.boxes
+    return (boxes.xyxy.cpu().numpy().astype(np.float32),
+            boxes.conf.cpu().numpy().astype(np.float32),
+            boxes.cls.cpu().numpy().astype(np.int64))
+
+
+@functools.lru_cache(maxsize=32)
+def _class_table(names):
+    size = max((class_id for class_id, _ in names), default=-1) + 1
+    lookup = dict(names)
+    labels = np.array([lookup.get(class_id, f"Class {class_id}") for class_id in range(size)], dtype=object)
+    medicines = np.array([DISEASE_INFO.get(label, {}).get("medicine", "") for label in labels], dtype=object)
+    known = np.array([label in DISEASE_INFO for label in labels], dtype=bool)
+    return labels, medicines, known
+
+
+def class_table(names):
+    """``(labels, medicines, known)`` arrays indexed by class ID, built once per model's names."""
+    return _class_table(tuple(sorted(names.items())))
+
+
+def to_detections(boxes, scores, class_ids, names, min_confidence=None, known_only=False):
+    """
+    Filter and label box arrays in one pass. Keeps boxes scoring above
+    ``min_confidence`` and, with ``known_only``, only DISEASE_INFO classes.
+    """
+    labels, medicines, known = class_table(names)
+    class_ids = np.asarray(class_ids, dtype=np.int64)
+    if len(class_ids) and class_ids.max() >= len(labels):
+        # IDs the model's names do not cover
+        extra = np.arange(len(labels), class_ids.max() + 1)
+        labels = np.concatenate([labels, np.array([f"Class {class_id}" for class_id in extra], dtype=object)])
+        medicines = np.concatenate([medicines, np.full(len(extra), "", dtype=object)])
+        known = np.concatenate([known, np.zeros(len(extra), dtype=bool)])
+
+    keep = np.ones(len(class_ids), dtype=bool)
+    if min_confidence is not None:
+        keep &= scores > min_confidence
+    if known_only:
+        keep &= known[class_ids]
+    class_ids = class_ids[keep]
+    return Detections(boxes[keep], scores[keep], class_ids, labels[class_ids], medicines[class_ids], known[class_ids])
+
+
+def postprocess(result, names=None, min_confidence=None, known_only=False):
+    """Detections of one ultralytics Results; ``names`` defaults to the result's own class names."""
+    boxes, scores, class_ids = result_arrays(result)
+    return to_detections(boxes, scores, class_ids, result.names if names is None else names,
+                         min_confidence=min_confidence, known_only=known_only)
@@ -0,0 +1,124 @@
+import os
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_images(directory, limit=None):
+    """``(path, bgr_image)`` for the images in a folder, sorted by name."""
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+    images = []
+    for name in names[:limit]:
+        path = os.path.join(directory, name)
+        image = cv2.imread(path)
+        if image is not None:
+            images.append((path, image))
+    return images
+
+
+def box_iou(a, b):
+    """Pairwise IoU of two ``(N, 4)`` / ``(M, 4)`` xyxy box arrays, shape ``(N, M)``."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def match_boxes(pred_boxes, pred_classes, ref_boxes, ref_classes, iou_threshold=0.5, pred_scores=None):
+    """
+    Greedy one-to-one matching of predictions to reference boxes of the same
+    class, highest-scoring prediction first. Returns ``(pairs, ious)``:
+    ``(pred_index, ref_index)`` pairs and the IoU of each.
+    """
+    pred_classes = np.asarray(pred_classes)
+    ref_classes = np.asarray(ref_classes)
+    ious = box_iou(pred_boxes, ref_boxes)
+    # Boxes of different classes never match
+    ious[pred_classes[:, None] != ref_classes[None, :]] = 0.0
+    order = np.argsort(-np.asarray(pred_scores)) if pred_scores is not None else np.arange(len(pred_classes))
+
+    pairs, matched_ious = [], []
+    taken = np.zeros(len(ref_classes), dtype=bool)
+    for i in order:
+        if not len(ref_classes):
+            break
+        candidates = np.where(taken, -1.0, ious[i])
+        j = int(np.argmax(candidates))
+        if candidates[j] >= iou_threshold:
+            taken[j] = True
+            pairs.append((int(i), j))
+            matched_ious.append(float(candidates[j]))
+    return pairs, matched_ious
+
+
+def sample_video_frames(path, count):
+    """Up to ``count`` frames spread evenly over a video."""
+    cap = cv2.VideoCapture(path)
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frames = []
+        for index in np.linspace(0, max(total - 1, 0), num=count, dtype=int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            success, frame = cap.read()
+            if success:
+                frames.append((f"{path}#{index}", frame))
+        return frames
+    finally:
+        cap.release()
+
+
+def label_path_for(image_path):
+    """YOLO label file of an image: ``labels/<stem>.txt`` beside ``images/``, or ``<stem>.txt`` next to it."""
+    directory, name = os.path.split(image_path)
+    stem = os.path.splitext(name)[0] + ".txt"
+    parent, folder = os.path.split(directory)
+    if folder == "images":
+        return os.path.join(parent, "labels", stem)
+    return os.path.join(directory, stem)
+
+
+def load_yolo_labels(path, width, height):
+    """``(boxes xyxy in pixels, classes)`` from a YOLO label file (``cls cx cy w h``, normalised)."""
+    try:
+        rows = np.loadtxt(path, ndmin=2, dtype=np.float32)
+    except (OSError, ValueError):
+        rows = np.zeros((0, 5), dtype=np.float32)
+    if not rows.size:
+        rows = np.zeros((0, 5), dtype=np.float32)
+    rows = rows[:, :5]
+    centres = rows[:, 1:3] * (width, height)
+    sizes = rows[:, 3:5] * (width, height)
+    boxes = np.concatenate([centres - sizes / 2, centres + sizes / 2], axis=1)
+    return boxes, rows[:, 0].astype(np.int64)
+
+
+def precision_recall(predictions, ground_truths, iou_threshold=0.5):
+    """
+    Per-class detection counts and precision/recall over a set of images.
+    ``predictions`` holds ``(boxes, scores, classes)`` and ``ground_truths``
+    ``(boxes, classes)`` per image, in the same order.
+    """
+    counts = {}
+    for (boxes, scores, classes), (true_boxes, true_classes) in zip(predictions, ground_truths):
+        pairs, _ = match_boxes(boxes, classes, true_boxes, true_classes, iou_threshold, pred_scores=scores)
+        matched_pred = {i for i, _ in pairs}
+        matched_true = {j for _, j in pairs}
+        for i, cls in enumerate(classes):
+            counts.setdefault(int(cls), {"tp": 0, "fp": 0, "fn": 0})["tp" if i in matched_pred else "fp"] += 1
+        for j, cls in enumerate(true_classes):
+            if j not in matched_true:
+                counts.setdefault(int(cls), {"tp": 0, "fp": 0, "fn": 0})["fn"] += 1
+
+    for entry in counts.values():
+        found = entry["tp"] + entry["fp"]
+        actual = entry["tp"] + entry["fn"]
+        entry["precision"] = entry["tp"] / found if found else 0.0
+        entry["recall"] = entry["tp"] / actual if actual else 0.0
+    return counts
@@ -0,0 +1,209 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from detect.models import VideoJob
+from detect.streaming import OUTPUT_FORMAT
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Jobs queued or running in this process's pool, so rescans do not queue them twice
+_queued = set()
+_queued_lock = threading.Lock()
+_monitor = None
+
+
+def job_root():
+    return getattr(settings, "VIDEO_JOB_ROOT", os.path.join(settings.BASE_DIR, "video_jobs"))
+
+
+def job_dir(job_id, create=True):
+    path = os.path.join(job_root(), str(job_id))
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_executor():
+    """The video worker pool of this process, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "VIDEO_JOB_WORKERS", 2),
+                thread_name_prefix="video-job",
+            )
+    return _executor
+
+
+def submit_job(job_id):
+    """Queue a job on this process's pool unless it is already queued or running here."""
+    with _queued_lock:
+        if job_id in _queued:
+            return False
+        _queued.add(job_id)
+    get_executor().submit(run_video_job, job_id)
+    return True
+
+
+def resume_interrupted_jobs():
+    """
+    Re-queue pending jobs and running jobs whose progress has not moved for
+    ``VIDEO_JOB_STALE_SECONDS``; those belonged to a worker that was
+    restarted. Jobs running in this process are left alone. Returns the
+    number of jobs queued.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, "VIDEO_JOB_STALE_SECONDS", 300))
+    with _queued_lock:
+        active = list(_queued)
+    VideoJob.objects.filter(status=VideoJob.STATUS_RUNNING, updated_at__lt=stale_before).exclude(
+        pk__in=active).update(status=VideoJob.STATUS_PENDING, frame_count=0, updated_at=now)
+    queued = 0
+    for job_id in VideoJob.objects.filter(status=VideoJob.STATUS_PENDING).values_list("id", flat=True):
+        if submit_job(job_id):
+            logger.info("Resuming video job %s", job_id)
+            queued += 1
+    return queued
+
+
+def cleanup_expired_jobs():
+    """
+    Delete finished and failed jobs, and their files, once they are older
+    than ``VIDEO_JOB_RETENTION_SECONDS``. Returns the number deleted.
+    """
+    retention = getattr(settings, "VIDEO_JOB_RETENTION_SECONDS", 24 * 3600)
+    expired = VideoJob.objects.filter(status__in=[VideoJob.STATUS_DONE, VideoJob.STATUS_FAILED],
+                                      updated_at__lt=timezone.now() - timedelta(seconds=retention))
+    job_ids = list(expired.values_list("id", flat=True))
+    for job_id in job_ids:
+        shutil.rmtree(job_dir(job_id, create=False), ignore_errors=True)
+    VideoJob.objects.filter(pk__in=job_ids).delete()
+    if job_ids:
+        logger.info("Deleted %d expired video jobs", len(job_ids))
+    return len(job_ids)
+
+
+def _monitor_jobs(interval):
+    while True:
+        try:
+            resume_interrupted_jobs()
+            cleanup_expired_jobs()
+        except Exception as e:
+            # e.g. the tables do not exist yet before the first migrate
+            logger.warning("Video job scan failed: %s", str(e))
+        finally:
+            close_old_connections()
+        time.sleep(interval)
+
+
+def start_job_monitor():
+    """
+    Start the worker pool and a daemon thread that, every
+    ``VIDEO_JOB_SCAN_SECONDS``, re-queues interrupted jobs and deletes
+    expired ones. Only the first call starts anything.
+    """
+    global _monitor
+    get_executor()
+    with _executor_lock:
+        if _monitor is None:
+            _monitor = threading.Thread(target=_monitor_jobs, args=(getattr(settings, "VIDEO_JOB_SCAN_SECONDS", 60),),
+                                        name="video-job-monitor", daemon=True)
+            _monitor.start()
+    return _monitor
+
+
+def serves_requests(argv=None):
+    """
+    Whether this process is a server that should run video jobs: not a
+    sharding worker process, and not a management command other than the
+    (reloaded) runserver.
+    """
+    if multiprocessing.parent_process() is not None:
+        return False
+    argv = sys.argv if argv is None else argv
+    if len(argv) < 2 or os.path.basename(argv[0]) != "manage.py":
+        # daphne, uvicorn, gunicorn ...
+        return True
+    if argv[1] != "runserver":
+        return False
+    # The autoreloader's parent process only watches files
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in argv
+
+
+def create_video_job(write_input, video_format="mp4", options=None):
+    """
+    Create a job, let ``write_input(path)`` store the uploaded video in the
+    job's directory, and queue it for processing. ``options`` are stored with
+    the job so a resumed job is processed the same way.
+    """
+    job = VideoJob(video_format=video_format, options=options or {})
+    directory = job_dir(job.id)
+    job.input_path = os.path.join(directory, f"input.{video_format}")
+    job.output_path = os.path.join(directory, f"output.{OUTPUT_FORMAT}")
+    try:
+        write_input(job.input_path)
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    job.save()
+    submit_job(job.id)
+    logger.info("Queued video job %s", job.id)
+    return job
+
+
+def run_video_job(job_id):
+    # Imported here because detect.views imports this module
+    from detect.views import run_video_detection
+
+    close_old_connections()
+    try:
+        # Claim the job; another worker may already have picked it up
+        claimed = VideoJob.objects.filter(pk=job_id, status=VideoJob.STATUS_PENDING).update(
+            status=VideoJob.STATUS_RUNNING, updated_at=timezone.now())
+        if not claimed:
+            return
+        job = VideoJob.objects.get(pk=job_id)
+
+        def report_progress(frame_count, total_frames, stats):
+            VideoJob.objects.filter(pk=job_id).update(
+                frame_count=frame_count, total_frames=total_frames, stats=stats, updated_at=timezone.now())
+
+        try:
+            detections = run_video_detection(job.input_path, job.output_path, job.options,
+                                             progress_callback=report_progress)
+        except Exception as e:
+            logger.error("Video job %s failed: %s", job_id, str(e))
+            VideoJob.objects.filter(pk=job_id).update(status=VideoJob.STATUS_FAILED, error=str(e),
+                                                      updated_at=timezone.now())
+            return
+        finally:
+            # Only the output is served from here on; it goes with the job after VIDEO_JOB_RETENTION_SECONDS
+            _remove(job.input_path)
+
+        VideoJob.objects.filter(pk=job_id).update(status=VideoJob.STATUS_DONE, detections=detections,
+                                                  updated_at=timezone.now())
+        logger.info("Video job %s finished with %d detections", job_id, len(detections))
+    finally:
+        with _queued_lock:
+            _queued.discard(job_id)
+        close_old_connections()
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError as e:
+        logger.warning("Failed to clean up %s: %s", path, str(e))
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from collections import deque
+
+
+class LatestFrameSlot:
+    """
+    Single-frame mailbox between a WebSocket reader and its inference loop.
+    :meth:`put` replaces a frame nobody has taken yet, so at most one frame
+    ever waits and a slow model skips frames instead of queueing them.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._ready = asyncio.Event()
+
+    def put(self, item):
+        """Store ``item``; returns True if it replaced (dropped) an unprocessed frame."""
+        dropped = self._item is not None
+        self._item = item
+        self._ready.set()
+        return dropped
+
+    async def get(self):
+        """Wait for a frame and take it."""
+        await self._ready.wait()
+        self._ready.clear()
+        item, self._item = self._item, None
+        return item
+
+
+class RateMeter:
+    """Events per second over the last ``window`` seconds."""
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self._times = deque()
+
+    def tick(self, now=None):
+        now = time.perf_counter() if now is None else now
+        self._times.append(now)
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    def rate(self, now=None):
+        now = time.perf_counter() if now is None else now
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+        if len(self._times) < 2:
+            return 0.0
+        # Measured up to now rather than the last event, so a stalled stream decays towards 0
+        return (len(self._times) - 1) / max(now - self._times[0], 1e-9)
+
+
+class StreamStats:
+    """Per-connection counters of a live detection stream."""
+
+    def __init__(self, window=5.0):
+        self.started = time.perf_counter()
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.receive_rate = RateMeter(window)
+        self.process_rate = RateMeter(window)
+        self._latencies = deque(maxlen=100)
+
+    def frame_received(self, dropped):
+        self.received += 1
+        self.dropped += int(dropped)
+        self.receive_rate.tick()
+
+    def frame_processed(self, latency):
+        self.processed += 1
+        self.process_rate.tick()
+        self._latencies.append(latency)
+
+    def snapshot(self):
+        latencies = sorted(self._latencies)
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "receive_fps": round(self.receive_rate.rate(), 2),
+            "process_fps": round(self.process_rate.rate(), 2),
+            "drop_rate": round(self.dropped / self.received, 3) if self.received else 0.0,
+            "latency_ms_mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "latency_ms_max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            "uptime_s": round(time.perf_counter() - self.started, 1),
+        }
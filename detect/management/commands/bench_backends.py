@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detect.backends import BACKENDS
+from detect.evaluation import load_images, sample_video_frames
+from detect.management.commands.bench_ingest import synthetic_image
+from detect.registry import ModelRegistry
+
+
+class Command(BaseCommand):
+    help = "Report load time and images/sec of one crop model on each inference backend"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=["pytorch", "onnx"])
+        parser.add_argument("--crop", help="Crop model to run (default: DETECT_DEFAULT_CROP)")
+        parser.add_argument("--images", help="Folder of images (default: synthetic 1080p frames)")
+        parser.add_argument("--video", help="Video to sample frames from")
+        parser.add_argument("--count", type=int, default=20, help="Images or frames per run")
+        parser.add_argument("--runs", type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options["images"]:
+            images = [image for _, image in load_images(options["images"], options["count"])]
+        elif options["video"]:
+            images = [frame for _, frame in sample_video_frames(options["video"], options["count"])]
+        else:
+            images = [synthetic_image(1920, 1080)] * options["count"]
+        if not images:
+            raise CommandError("No images to run")
+
+        model_paths = getattr(settings, "DETECT_MODELS", {})
+        crop = options["crop"] or getattr(settings, "DETECT_DEFAULT_CROP", None) or next(iter(model_paths))
+        if crop not in model_paths:
+            raise CommandError(f"Unknown crop {crop}")
+
+        self.stdout.write(f"{crop} model, {len(images)} images x {options['runs']} runs")
+        self.stdout.write(f"{'backend':>9} {'load ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'images/s':>9}")
+        for backend in options["backends"]:
+            registry = ModelRegistry({crop: model_paths[crop]}, backend=backend).load_all()
+            try:
+                detector = registry.get(crop)
+            except Exception as e:
+                self.stdout.write(f"{backend:>9} unavailable: {e}")
+                continue
+
+            latencies = []
+            for _ in range(options["runs"]):
+                for image in images:
+                    start = time.perf_counter()
+                    detector.model(image, verbose=False)
+                    latencies.append(time.perf_counter() - start)
+            latencies_ms = np.array(latencies) * 1000
+            self.stdout.write(
+                f"{backend:>9} {detector.load_ms + detector.warmup_ms:>8.0f} "
+                f"{np.median(latencies_ms):>7.1f} {np.percentile(latencies_ms, 95):>7.1f} "
+                f"{1000 / latencies_ms.mean():>9.1f}"
+            )
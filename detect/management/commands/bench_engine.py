@@ -0,0 +1,96 @@
+import time
+
+import cv2
+import numpy as np
+import torch
+from django.core.management.base import BaseCommand
+from ultralytics.engine.results import Results
+
+from detect.engine import DISEASE_INFO, SURVEY_THRESHOLD, annotate_frame, postprocess
+from detect.management.commands.bench_ingest import synthetic_image
+
+# Class names of the groundnut model; the last one is not in DISEASE_INFO
+NAMES = {0: "Black Fungus Pod", 1: "Early and Late leaf spot", 2: "Fungus leaf", 3: "Rust-Leaf",
+         4: "black fungus-groundnut", 5: "brown Fungus Pod", 6: "Healthy"}
+
+
+def synthetic_result(frame, count, rng):
+    """ultralytics Results for ``frame`` holding ``count`` random boxes, as a model would return them."""
+    height, width = frame.shape[:2]
+    corners = rng.uniform(0, 1, (count, 2)) * (width - 60, height - 60)
+    sizes = rng.uniform(20, 60, (count, 2))
+    data = np.column_stack([corners, corners + sizes, rng.uniform(0.05, 1.0, count),
+                            rng.integers(0, len(NAMES), count)])
+    return Results(frame, path="synthetic", names=NAMES, boxes=torch.from_numpy(data.astype(np.float32)))
+
+
+def legacy_process_detection(results, frame, min_confidence):
+    """The per-box loop the drone scripts used to carry, kept here as the baseline."""
+    current_disease = current_medicine = None
+    annotated_frame = frame.copy()
+    height, width = annotated_frame.shape[:2]
+    for box in results[0].boxes:
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        confidence = float(box.conf)
+        disease = results[0].names[int(box.cls)]
+        if confidence > min_confidence and disease in DISEASE_INFO:
+            current_disease = disease
+            current_medicine = DISEASE_INFO[disease]["medicine"]
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(annotated_frame, f"{disease} {confidence:.2f}",
+                        (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    if current_disease:
+        overlay = annotated_frame.copy()
+        cv2.rectangle(overlay, (10, 10), (width // 2, 40), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.3, annotated_frame, 0.7, 0, annotated_frame)
+        cv2.putText(annotated_frame, f"Disease: {current_disease}",
+                    (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    if current_medicine:
+        text = f"Medicine: {current_medicine}"
+        text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+        overlay = annotated_frame.copy()
+        cv2.rectangle(overlay, (width - text_size[0] - 30, height - 40), (width - 10, height - 10), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.3, annotated_frame, 0.7, 0, annotated_frame)
+        cv2.putText(annotated_frame, text, (width - text_size[0] - 20, height - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return annotated_frame
+
+
+def engine_process_detection(results, frame, min_confidence):
+    return annotate_frame(frame, postprocess(results[0], min_confidence=min_confidence, known_only=True),
+                          summary=True)
+
+
+class Command(BaseCommand):
+    help = "Per-frame cost of post-processing and annotation outside inference, shared engine vs. the old loop"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--width", type=int, default=1280)
+        parser.add_argument("--height", type=int, default=720)
+        parser.add_argument("--boxes", type=int, nargs="+", default=[0, 10, 50, 200])
+        parser.add_argument("--frames", type=int, default=100)
+        parser.add_argument("--conf", type=float, default=SURVEY_THRESHOLD)
+
+    def _time(self, process, results, frame):
+        start = time.perf_counter()
+        for result in results:
+            process([result], frame, self.conf)
+        return (time.perf_counter() - start) * 1000 / len(results)
+
+    def handle(self, *args, **options):
+        self.conf = options["conf"]
+        rng = np.random.default_rng(0)
+        frame = synthetic_image(options["width"], options["height"])
+        self.stdout.write(f"{options['width']}x{options['height']} frames, confidence > {self.conf}, "
+                          f"{options['frames']} frames per row")
+        self.stdout.write(f"{'boxes':>6} {'legacy ms':>10} {'engine ms':>10} {'speed-up':>9} {'same pixels':>12}")
+        for count in options["boxes"]:
+            results = [synthetic_result(frame, count, rng) for _ in range(options["frames"])]
+            same = all(np.array_equal(legacy_process_detection([result], frame, self.conf),
+                                      engine_process_detection([result], frame, self.conf))
+                       for result in results[:5])
+            legacy = self._time(legacy_process_detection, results, frame)
+            engine = self._time(engine_process_detection, results, frame)
+            self.stdout.write(f"{count:>6} {legacy:>10.2f} {engine:>10.2f} {legacy / engine:>8.1f}x "
+                              f"{'yes' if same else 'no':>12}")
@@ -0,0 +1,97 @@
+import base64
+import json
+import multiprocessing
+import resource
+import time
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from detect.ingest import read_request_image
+
+
+def synthetic_image(width, height):
+    """Gradient plus noise, so the JPEG is about as large as a real field photo."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    noise = rng.normal(0, 6, size=(height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def build_request(mode, jpeg_bytes):
+    factory = RequestFactory()
+    if mode == "raw":
+        return factory.post("/api/process_image/", data=jpeg_bytes, content_type="image/jpeg")
+    if mode == "multipart":
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        upload = SimpleUploadedFile("frame.jpg", jpeg_bytes, content_type="image/jpeg")
+        return factory.post("/api/process_image/", data={"image": upload})
+    payload = json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(jpeg_bytes).decode("utf-8")})
+    return factory.post("/api/process_image/", data=payload, content_type="application/json")
+
+
+def measure(mode, jpeg_bytes, runs, queue):
+    """Runs in a fresh process so ru_maxrss only reflects this ingest path."""
+    # Already done in a forked process, needed in a spawned one
+    import django
+    django.setup()
+
+    # Warm up lazy imports and allocator pools with a tiny image first
+    ok, tiny = cv2.imencode(".jpg", np.zeros((8, 8, 3), dtype=np.uint8))
+    read_request_image(build_request(mode, tiny.tobytes()))
+
+    # The request is built before the baseline; only server-side decoding counts
+    request = build_request(mode, jpeg_bytes)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    image, _ = read_request_image(request)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del request, image
+
+    latencies = []
+    for _ in range(runs):
+        request = build_request(mode, jpeg_bytes)
+        start = time.perf_counter()
+        read_request_image(request)
+        latencies.append(time.perf_counter() - start)
+    queue.put((mode, latencies, (peak - baseline) / 1024))
+
+
+class Command(BaseCommand):
+    help = "Compare latency and peak RSS of the raw, multipart and base64-JSON image ingest paths"
+    # Skip the URLconf check, which would load the YOLO weights
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--image", help="JPEG to use instead of a synthetic 4K frame")
+        parser.add_argument("--runs", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options["image"]:
+            with open(options["image"], "rb") as f:
+                jpeg_bytes = f.read()
+        else:
+            ok, encoded = cv2.imencode(".jpg", synthetic_image(3840, 2160))
+            if not ok:
+                raise CommandError("Could not encode synthetic image")
+            jpeg_bytes = encoded.tobytes()
+
+        self.stdout.write(f"Image: {len(jpeg_bytes) / 1e6:.2f} MB, {options['runs']} runs per path")
+        # fork where the platform has it: a spawned child's start-up already peaks above the decode and hides
+        # its growth. Windows only has spawn.
+        start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(start_method)
+        for mode in ("raw", "multipart", "json"):
+            queue = context.Queue()
+            proc = context.Process(target=measure, args=(mode, jpeg_bytes, options["runs"], queue))
+            proc.start()
+            mode, latencies, peak_mb = queue.get()
+            proc.join()
+            latencies_ms = np.array(latencies) * 1000
+            self.stdout.write(
+                f"{mode:>9}: median {np.median(latencies_ms):6.1f} ms, "
+                f"p95 {np.percentile(latencies_ms, 95):6.1f} ms, peak RSS growth {peak_mb:6.1f} MB"
+            )
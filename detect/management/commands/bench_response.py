@@ -0,0 +1,65 @@
+import json
+import time
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from detect.cache import DetectionCache
+from detect.management.commands.bench_ingest import synthetic_image
+
+
+class Command(BaseCommand):
+    help = "Compare latency and response size of the annotated and detections-only process_image responses"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--image", help="JPEG to use instead of a synthetic 1080p frame")
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--thumbnail", type=int, default=160,
+                            help="Thumbnail size for the detections+thumbnail run")
+
+    def handle(self, *args, **options):
+        # Loads the YOLO weights
+        from detect import views
+
+        if views.registry.default_crop not in views.registry.available():
+            raise CommandError("YOLO model not loaded")
+        if options["image"]:
+            with open(options["image"], "rb") as f:
+                jpeg_bytes = f.read()
+        else:
+            ok, encoded = cv2.imencode(".jpg", synthetic_image(1920, 1080))
+            if not ok:
+                raise CommandError("Could not encode synthetic image")
+            jpeg_bytes = encoded.tobytes()
+
+        # Every request must pay for inference, so the cache is switched off
+        views.detection_cache = DetectionCache(max_entries=0)
+        factory = RequestFactory()
+        variants = {
+            "annotated": "response=annotated",
+            "detections": "response=detections",
+            "thumbnail": f"response=detections&thumbnail={options['thumbnail']}",
+        }
+
+        self.stdout.write(f"Image: {len(jpeg_bytes) / 1e6:.2f} MB, {options['runs']} runs per mode")
+        self.stdout.write(f"{'mode':>10} {'median ms':>10} {'p95 ms':>8} {'response KB':>12}")
+        for name, query in variants.items():
+            latencies = []
+            size = 0
+            # One untimed request warms up the batcher thread and lazy imports
+            for run in range(options["runs"] + 1):
+                request = factory.post(f"/api/process_image/?{query}", data=jpeg_bytes, content_type="image/jpeg")
+                start = time.perf_counter()
+                response = views.process_image(request)
+                elapsed = time.perf_counter() - start
+                if response.status_code != 200:
+                    raise CommandError(f"{name}: {json.loads(response.content).get('error')}")
+                if run:
+                    latencies.append(elapsed * 1000)
+                    size = len(response.content)
+            self.stdout.write(
+                f"{name:>10} {np.median(latencies):>10.1f} {np.percentile(latencies, 95):>8.1f} {size / 1024:>12.1f}"
+            )
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Report process_with_yolo throughput (frames/sec) for each frame sampling mode"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("video", help="Video file to process")
+        parser.add_argument("--stride", type=int, default=3)
+        parser.add_argument("--target-fps", type=float, default=5.0)
+        parser.add_argument("--threshold", type=float, default=0.08)
+        parser.add_argument("--metric", choices=["diff", "hist"], default="diff")
+
+    def handle(self, *args, **options):
+        # Loads the YOLO weights
+        from detect.views import process_with_yolo
+
+        if not os.path.exists(options["video"]):
+            raise CommandError(f"No such file: {options['video']}")
+
+        modes = {
+            "all": {"mode": "all"},
+            "stride": {"mode": "stride", "stride": options["stride"]},
+            "fps": {"mode": "fps", "target_fps": options["target_fps"]},
+            "adaptive": {"mode": "adaptive", "threshold": options["threshold"], "metric": options["metric"]},
+        }
+        self.stdout.write(f"{'mode':>9} {'frames':>7} {'detections':>11} {'seconds':>8} {'frames/s':>9} {'bottleneck':>10}")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, sampling in modes.items():
+                progress = {}
+
+                def record(frame_count, total_frames, stats):
+                    progress["frames"] = frame_count
+                    progress["bottleneck"] = stats["bottleneck"]
+
+                start = time.perf_counter()
+                detections = process_with_yolo(options["video"], os.path.join(directory, f"{name}.mp4"),
+                                               progress_callback=record, sampling=sampling)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{name:>9} {progress.get('frames', 0):>7} "
+                    f"{len(detections):>11} {elapsed:>8.2f} {progress.get('frames', 0) / elapsed:>9.1f} "
+                    f"{progress.get('bottleneck', '-'):>10}"
+                )
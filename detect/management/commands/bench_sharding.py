@@ -0,0 +1,38 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Compare wall-clock time of serial process_with_yolo against sharded multi-process processing"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("video", help="Video file to process")
+        parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+
+    def handle(self, *args, **options):
+        # Loads the YOLO weights for the serial baseline
+        from detect.sharding import process_video_sharded, warm_pool
+        from detect.views import process_with_yolo
+
+        if not os.path.exists(options["video"]):
+            raise CommandError(f"No such file: {options['video']}")
+
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            serial_detections = process_with_yolo(options["video"], os.path.join(directory, "serial.mp4"))
+            serial = time.perf_counter() - start
+            self.stdout.write(f"{'workers':>8} {'seconds':>8} {'speedup':>8} {'detections':>11}")
+            self.stdout.write(f"{'serial':>8} {serial:>8.2f} {1.0:>8.2f} {len(serial_detections):>11}")
+
+            for workers in options["workers"]:
+                # Model loading is amortised across jobs, so it is kept out of the timing
+                warm_pool(workers)
+                start = time.perf_counter()
+                detections = process_video_sharded(options["video"], os.path.join(directory, f"{workers}.mp4"),
+                                                   workers=workers)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{workers:>8} {elapsed:>8.2f} {serial / elapsed:>8.2f} {len(detections):>11}")
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import time
+
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from detect.management.commands.bench_ingest import synthetic_image
+
+
+class Command(BaseCommand):
+    help = "Stream frames over the live detection WebSocket at a fixed rate and report latency and drops"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fps", type=float, nargs="+", default=[2, 5, 15, 30],
+                            help="Frame rates to send at")
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--width", type=int, default=1280)
+        parser.add_argument("--height", type=int, default=720)
+        parser.add_argument("--crop", help="Crop model to stream to (default: DETECT_DEFAULT_CROP)")
+
+    def handle(self, *args, **options):
+        ok, encoded = cv2.imencode(".jpg", synthetic_image(options["width"], options["height"]))
+        self.frame = encoded.tobytes()
+        self.stdout.write(f"{options['width']}x{options['height']} JPEG frames ({len(self.frame) / 1024:.0f} KB), "
+                          f"{options['seconds']:.0f} s per rate")
+        self.stdout.write(f"{'send fps':>8} {'process fps':>11} {'dropped':>8} {'p50 ms':>7} {'p95 ms':>7} "
+                          f"{'max ms':>7}")
+        for fps in options["fps"]:
+            stats, latencies = asyncio.run(self._stream(fps, options["seconds"], options["crop"]))
+            p50, p95 = np.percentile(latencies, [50, 95]) if latencies else (0.0, 0.0)
+            self.stdout.write(f"{fps:>8.1f} {stats['processed'] / options['seconds']:>11.1f} "
+                              f"{stats['dropped']:>4}/{stats['received']:<3} {p50:>7.0f} {p95:>7.0f} "
+                              f"{max(latencies, default=0.0):>7.0f}")
+
+    async def _stream(self, fps, seconds, crop):
+        # Imported here: loading the consumer loads every detection model
+        from channels.testing import WebsocketCommunicator
+
+        from api.consumers import DetectionStreamConsumer
+
+        path = "/ws/detect/" + (f"?crop={crop}" if crop else "")
+        communicator = WebsocketCommunicator(DetectionStreamConsumer.as_asgi(), path)
+        await communicator.connect()
+        ready = json.loads(await communicator.receive_from(timeout=10))
+        if ready.get("type") != "ready":
+            await communicator.disconnect()
+            raise CommandError(ready.get("error", "Detection stream refused the connection"))
+
+        latencies = []
+
+        async def read_results():
+            while True:
+                message = json.loads(await communicator.receive_from(timeout=60))
+                if message["type"] == "detections":
+                    latencies.append(message["latency_ms"])
+                elif message["type"] == "stats":
+                    return message["stats"]
+
+        reader = asyncio.create_task(read_results())
+        start = time.perf_counter()
+        for index in range(int(fps * seconds)):
+            await asyncio.sleep(max(0.0, start + index / fps - time.perf_counter()))
+            await communicator.send_to(bytes_data=self.frame)
+        # Let the last frame finish, then collect the connection's own counters
+        await asyncio.sleep(1.0)
+        await communicator.send_to(text_data=json.dumps({"type": "stats"}))
+        stats = await reader
+        await communicator.disconnect()
+        return stats, latencies
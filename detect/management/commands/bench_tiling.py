@@ -0,0 +1,76 @@
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detect.engine import result_arrays
+from detect.evaluation import label_path_for, load_images, load_yolo_labels, precision_recall
+from detect.management.commands.bench_ingest import synthetic_image
+from detect.registry import ModelRegistry
+from detect.tiling import detect_tiled
+
+
+class Command(BaseCommand):
+    help = "Report how recall and latency of tiled detection change with tile size (tile count)"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", help="Labelled YOLO-format image folder (default: synthetic 4000x3000)")
+        parser.add_argument("--crop", help="Crop model to run (default: DETECT_DEFAULT_CROP)")
+        parser.add_argument("--tile-sizes", type=int, nargs="+", default=[0, 1280, 960, 640, 480],
+                            help="Tile sides to try; 0 runs the whole image untiled")
+        parser.add_argument("--overlap", type=float, default=0.2)
+        parser.add_argument("--conf", type=float, default=0.25)
+        parser.add_argument("--iou", type=float, default=0.5, help="IoU for a detection to match a label")
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options["images"]:
+            images = load_images(options["images"], options["limit"])
+            if not images:
+                raise CommandError(f"No images in {options['images']}")
+            ground_truths = [load_yolo_labels(label_path_for(path), image.shape[1], image.shape[0])
+                             for path, image in images]
+            labelled = any(os.path.exists(label_path_for(path)) for path, _ in images)
+        else:
+            images = [("synthetic", synthetic_image(4000, 3000))]
+            ground_truths, labelled = [], False
+
+        model_paths = getattr(settings, "DETECT_MODELS", {})
+        crop = options["crop"] or getattr(settings, "DETECT_DEFAULT_CROP", None) or next(iter(model_paths))
+        if crop not in model_paths:
+            raise CommandError(f"Unknown crop {crop}")
+        detector = ModelRegistry({crop: model_paths[crop]}).load_all().get(crop)
+
+        def predict(crops):
+            return detector.model(crops, conf=options["conf"], verbose=False)
+
+        self.stdout.write(f"{crop} model, {len(images)} images, overlap {options['overlap']}")
+        self.stdout.write(f"{'tile':>6} {'tiles/img':>9} {'ms/img':>8} {'boxes/img':>9} {'precision':>9} {'recall':>7}")
+        for tile_size in options["tile_sizes"]:
+            predictions, latencies, tiles = [], [], 0
+            for _, image in images:
+                start = time.perf_counter()
+                if tile_size:
+                    boxes, scores, classes, count = detect_tiled(predict, image, tile_size, options["overlap"],
+                                                                 getattr(settings, "DETECT_TILE_NMS_IOU", 0.5),
+                                                                 getattr(settings, "DETECT_TILE_FULL_PASS", True))
+                else:
+                    (boxes, scores, classes), count = result_arrays(predict(image)[0]), 1
+                latencies.append(time.perf_counter() - start)
+                predictions.append((boxes, scores, classes))
+                tiles += count
+
+            precision = recall = "-"
+            if labelled:
+                counts = precision_recall(predictions, ground_truths, options["iou"])
+                tp, fp, fn = (sum(entry[key] for entry in counts.values()) for key in ("tp", "fp", "fn"))
+                precision = f"{tp / (tp + fp) if tp + fp else 0.0:.3f}"
+                recall = f"{tp / (tp + fn) if tp + fn else 0.0:.3f}"
+            boxes_per_image = sum(len(p[0]) for p in predictions) / len(images)
+            self.stdout.write(
+                f"{tile_size or 'whole':>6} {tiles / len(images):>9.1f} {np.mean(latencies) * 1000:>8.0f} "
+                f"{boxes_per_image:>9.1f} {precision:>9} {recall:>7}"
+            )
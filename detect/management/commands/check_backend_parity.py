@@ -0,0 +1,71 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detect.backends import BACKENDS
+from detect.engine import result_arrays
+from detect.evaluation import load_images, match_boxes, sample_video_frames
+from detect.registry import ModelRegistry
+
+
+class Command(BaseCommand):
+    help = "Check that an exported backend finds the same boxes as the PyTorch weights"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=[name for name in BACKENDS if name != "pytorch"], default="onnx")
+        parser.add_argument("--crop", help="Crop model to check (default: every configured crop)")
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument("--images", help="Folder of images")
+        source.add_argument("--video", help="Video to sample frames from")
+        parser.add_argument("--count", type=int, default=50, help="Images or frames to compare")
+        parser.add_argument("--conf", type=float, default=0.25)
+        parser.add_argument("--iou", type=float, default=0.9, help="IoU a box must reach to count as the same box")
+        parser.add_argument("--min-match", type=float, default=0.95,
+                            help="Fail when fewer than this fraction of boxes match")
+
+    def handle(self, *args, **options):
+        images = load_images(options["images"], options["count"]) if options["images"] \
+            else sample_video_frames(options["video"], options["count"])
+        if not images:
+            raise CommandError("No images to compare")
+
+        model_paths = getattr(settings, "DETECT_MODELS", {})
+        crops = [options["crop"]] if options["crop"] else list(model_paths)
+        failed = []
+        for crop in crops:
+            if crop not in model_paths:
+                raise CommandError(f"Unknown crop {crop}")
+            reference = ModelRegistry({crop: model_paths[crop]}).load_all().get(crop)
+            candidate = ModelRegistry({crop: model_paths[crop]}, backend=options["backend"]).load_all().get(crop)
+
+            ref_total = cand_total = 0
+            ious, conf_diffs = [], []
+            for _, image in images:
+                ref_boxes, ref_scores, ref_classes = result_arrays(
+                    reference.model(image, conf=options["conf"], verbose=False)[0])
+                boxes, scores, classes = result_arrays(
+                    candidate.model(image, conf=options["conf"], verbose=False)[0])
+                pairs, pair_ious = match_boxes(boxes, classes, ref_boxes, ref_classes,
+                                               iou_threshold=options["iou"], pred_scores=scores)
+                ref_total += len(ref_boxes)
+                cand_total += len(boxes)
+                ious.extend(pair_ious)
+                conf_diffs.extend(abs(scores[i] - ref_scores[j]) for i, j in pairs)
+
+            boxes_total = max(ref_total, cand_total)
+            match_rate = len(ious) / boxes_total if boxes_total else 1.0
+            self.stdout.write(
+                f"{crop}: pytorch {ref_total} boxes, {options['backend']} {cand_total} boxes, "
+                f"matched {len(ious)} ({match_rate:.1%}), "
+                f"mean IoU {np.mean(ious) if ious else 0:.3f}, "
+                f"max conf diff {max(conf_diffs) if conf_diffs else 0:.3f} over {len(images)} images"
+            )
+            if not boxes_total:
+                self.stdout.write(self.style.WARNING(f"{crop}: no boxes found; use images with detections"))
+            if match_rate < options["min_match"]:
+                failed.append(crop)
+
+        if failed:
+            raise CommandError(f"Backend {options['backend']} does not match PyTorch for: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS(f"{options['backend']} matches PyTorch"))
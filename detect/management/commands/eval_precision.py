@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import time
+from queue import Empty
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detect.backends import BACKENDS, PRECISIONS
+from detect.engine import DISEASE_INFO, result_arrays
+from detect.evaluation import label_path_for, load_images, load_yolo_labels, precision_recall
+from detect.registry import ModelRegistry
+
+
+def run_variant(weights, crop, backend, precision, calibration_dir, image_paths, conf, queue):
+    """
+    Runs in a fresh process so the RSS growth belongs to this model alone.
+    Always puts one report on ``queue``, an ``error`` if anything fails.
+    """
+    try:
+        # A spawned process starts without Django set up
+        import django
+        django.setup()
+
+        registry = ModelRegistry({crop: weights}, backend=backend, precision=precision,
+                                 calibration_dir=calibration_dir).load_all()
+        detector = registry.get(crop)
+
+        import cv2
+        predictions, latencies = [], []
+        for path in image_paths:
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError(f"Could not read {path}")
+            start = time.perf_counter()
+            result = detector.model(image, conf=conf, verbose=False)[0]
+            latencies.append(time.perf_counter() - start)
+            predictions.append(result_arrays(result))
+        report = {"names": dict(detector.names), "predictions": predictions, "latencies": latencies,
+                  "stats": detector.stats()}
+    except Exception as e:
+        report = {"error": str(e)}
+    queue.put(report)
+
+
+def wait_for_report(proc, queue, poll_seconds=5):
+    """The report ``proc`` puts on ``queue``; an ``error`` report if it exits (e.g. is killed) without one."""
+    while True:
+        try:
+            return queue.get(timeout=poll_seconds)
+        except Empty:
+            if not proc.is_alive():
+                break
+    # It may have put the report just before exiting
+    try:
+        return queue.get(timeout=1)
+    except Empty:
+        return {"error": f"evaluation process exited with code {proc.exitcode} without a result"}
+
+
+class Command(BaseCommand):
+    help = ("Compare model precisions on a labelled YOLO-format image folder: "
+            "per-class precision/recall for the DISEASE_INFO classes, latency and memory")
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("images", help="Image folder; labels in a sibling labels/ folder or next to each image")
+        parser.add_argument("--crop", help="Crop model to evaluate (default: DETECT_DEFAULT_CROP)")
+        parser.add_argument("--variants", nargs="+", default=["pytorch:fp32", "onnx:int8"],
+                            help="backend:precision pairs to compare")
+        parser.add_argument("--calibration", help="INT8 calibration images (default: DETECT_INT8_CALIBRATION_DIR)")
+        parser.add_argument("--conf", type=float, default=0.25)
+        parser.add_argument("--iou", type=float, default=0.5)
+        parser.add_argument("--limit", type=int, help="Evaluate at most this many images")
+
+    def handle(self, *args, **options):
+        model_paths = getattr(settings, "DETECT_MODELS", {})
+        crop = options["crop"] or getattr(settings, "DETECT_DEFAULT_CROP", None) or next(iter(model_paths))
+        if crop not in model_paths:
+            raise CommandError(f"Unknown crop {crop}")
+        variants = []
+        for variant in options["variants"]:
+            backend, _, precision = variant.partition(":")
+            if backend not in BACKENDS or (precision or "fp32") not in PRECISIONS:
+                raise CommandError(f"Bad variant {variant}; expected backend:precision, e.g. onnx:int8")
+            variants.append((variant, backend, precision or "fp32"))
+
+        images = load_images(options["images"], options["limit"])
+        if not images:
+            raise CommandError(f"No images in {options['images']}")
+        ground_truths = [load_yolo_labels(label_path_for(path), image.shape[1], image.shape[0])
+                         for path, image in images]
+        image_paths = [path for path, _ in images]
+        del images
+        calibration_dir = options["calibration"] or getattr(settings, "DETECT_INT8_CALIBRATION_DIR", None)
+
+        reports = {}
+        # spawn rather than fork, which Windows does not have
+        context = multiprocessing.get_context("spawn")
+        for name, backend, precision in variants:
+            queue = context.Queue()
+            proc = context.Process(target=run_variant, args=(
+                model_paths[crop], crop, backend, precision, calibration_dir, image_paths, options["conf"], queue))
+            proc.start()
+            report = wait_for_report(proc, queue)
+            proc.join()
+            if "error" in report:
+                raise CommandError(f"{name}: {report['error']}")
+            report["counts"] = precision_recall(report["predictions"], ground_truths, options["iou"])
+            reports[name] = report
+
+        self.stdout.write(f"{crop} model, {len(image_paths)} images, IoU {options['iou']}, conf {options['conf']}")
+        names = next(iter(reports.values()))["names"]
+        header = "".join(f" {name + ' P':>14} {name + ' R':>14}" for name in reports)
+        self.stdout.write(f"{'class':>26}{header} {'labels':>7}")
+        for cls, label in sorted(names.items()):
+            if label not in DISEASE_INFO:
+                continue
+            cells, labelled = "", 0
+            for report in reports.values():
+                entry = report["counts"].get(int(cls), {"tp": 0, "fn": 0, "precision": 0.0, "recall": 0.0})
+                labelled = entry["tp"] + entry["fn"]
+                cells += f" {entry['precision']:>14.3f} {entry['recall']:>14.3f}"
+            self.stdout.write(f"{label:>26}{cells} {labelled:>7}")
+
+        # Micro-average over every class the model predicts or the labels contain
+        cells = ""
+        for report in reports.values():
+            tp, fp, fn = (sum(entry[key] for entry in report["counts"].values()) for key in ("tp", "fp", "fn"))
+            cells += f" {tp / (tp + fp) if tp + fp else 0.0:>14.3f} {tp / (tp + fn) if tp + fn else 0.0:>14.3f}"
+        self.stdout.write(f"{'(all classes)':>26}{cells} {tp + fn:>7}")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'variant':>14} {'p50 ms':>7} {'images/s':>9} {'RSS MB':>7} {'weights MB':>11}")
+        for name, report in reports.items():
+            latencies_ms = np.array(report["latencies"]) * 1000
+            self.stdout.write(
+                f"{name:>14} {np.median(latencies_ms):>7.1f} {1000 / latencies_ms.mean():>9.1f} "
+                f"{report['stats']['rss_mb']:>7.1f} {report['stats']['weights_mb']:>11.1f}"
+            )
+        if not any(os.path.exists(label_path_for(path)) for path in image_paths):
+            self.stdout.write(self.style.WARNING("No label files found; precision/recall are not meaningful"))
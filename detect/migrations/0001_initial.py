@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:07
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=16)),
+                ('video_format', models.CharField(default='mp4', max_length=10)),
+                ('input_path', models.CharField(max_length=500)),
+                ('output_path', models.CharField(blank=True, max_length=500)),
+                ('frame_count', models.PositiveIntegerField(default=0)),
+                ('total_frames', models.PositiveIntegerField(default=0)),
+                ('detections', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detect', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='options',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
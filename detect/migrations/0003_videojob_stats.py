@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detect', '0002_videojob_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
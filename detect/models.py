@@ -1,3 +1,44 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class VideoJob(models.Model):
+    """A video submitted for background YOLO processing."""
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    video_format = models.CharField(max_length=10, default="mp4")
+    input_path = models.CharField(max_length=500)
+    output_path = models.CharField(max_length=500, blank=True)
+    options = models.JSONField(default=dict, blank=True)
+    frame_count = models.PositiveIntegerField(default=0)
+    total_frames = models.PositiveIntegerField(default=0)
+    detections = models.JSONField(default=list, blank=True)
+    # Queue depths and per-stage timings of the video pipeline
+    stats = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"VideoJob {self.id} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total_frames:
+            return 1.0 if self.status == self.STATUS_DONE else 0.0
+        return min(1.0, self.frame_count / self.total_frames)
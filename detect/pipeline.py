@@ -0,0 +1,199 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream in both queues
+_END = object()
+
+
+class VideoPipeline:
+    """
+    Decode -> infer -> encode pipeline for one video.
+
+    A decode thread reads frames from ``cap`` into a bounded queue, the caller
+    (the inference stage) iterates :meth:`frames` and hands annotated frames to
+    :meth:`write`, and an encode thread drains a second bounded queue into
+    ``out``. Both queues are FIFO with a single producer and consumer, so the
+    output frame order is the input order. Use it as a context manager; leaving
+    the block flushes the encoder and re-raises errors from either thread.
+
+    ``start_index`` is the index of the first frame ``cap`` will return (after
+    a seek) and ``max_frames`` stops decoding early, for processing a segment.
+    """
+
+    def __init__(self, cap, out, queue_size=8, start_index=0, max_frames=None):
+        self.cap = cap
+        self.out = out
+        self.start_index = start_index
+        self.max_frames = max_frames
+        self._decoded = queue.Queue(maxsize=queue_size)
+        self._to_encode = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._errors = []
+        self._lock = threading.Lock()
+        self._timings = {
+            "decode": 0.0, "decode_blocked": 0.0,
+            "infer": 0.0, "infer_starved": 0.0, "infer_blocked": 0.0,
+            "encode": 0.0, "encode_starved": 0.0,
+        }
+        self._counts = {"decoded": 0, "inferred": 0, "encoded": 0}
+        self._depth_max = {"decode": 0, "encode": 0}
+        self._depth_sum = {"decode": 0, "encode": 0}
+        self._samples = 0
+        self._infer_started = None
+        self._decoder = threading.Thread(target=self._decode, name="video-decode", daemon=True)
+        self._encoder = threading.Thread(target=self._encode, name="video-encode", daemon=True)
+
+    def __enter__(self):
+        self._decoder.start()
+        self._encoder.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._stop.set()
+        self._put(self._to_encode, _END)
+        self._encoder.join()
+        self._stop.set()
+        self._decoder.join()
+        if self._errors and exc_type is None:
+            raise self._errors[0]
+        return False
+
+    def _put(self, target, item):
+        """Blocking put that gives up once the pipeline is stopping."""
+        while True:
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if self._stop.is_set():
+                    return False
+
+    def _get(self, source):
+        """Blocking get that returns the end marker once the pipeline is stopping."""
+        while True:
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _END
+
+    def _add_time(self, key, seconds):
+        with self._lock:
+            self._timings[key] += seconds
+
+    def _decode(self):
+        try:
+            index = self.start_index
+            while not self._stop.is_set():
+                if self.max_frames is not None and index - self.start_index >= self.max_frames:
+                    break
+                start = time.perf_counter()
+                success, frame = self.cap.read()
+                self._add_time("decode", time.perf_counter() - start)
+                if not success:
+                    break
+                start = time.perf_counter()
+                if not self._put(self._decoded, (index, frame)):
+                    return
+                self._add_time("decode_blocked", time.perf_counter() - start)
+                with self._lock:
+                    self._counts["decoded"] += 1
+                index += 1
+        except Exception as e:
+            logger.error("Video decode stage failed: %s", str(e))
+            self._errors.append(e)
+        finally:
+            self._put(self._decoded, _END)
+
+    def _encode(self):
+        try:
+            while True:
+                start = time.perf_counter()
+                frame = self._get(self._to_encode)
+                self._add_time("encode_starved", time.perf_counter() - start)
+                if frame is _END:
+                    break
+                start = time.perf_counter()
+                self.out.write(frame)
+                self._add_time("encode", time.perf_counter() - start)
+                with self._lock:
+                    self._counts["encoded"] += 1
+        except Exception as e:
+            logger.error("Video encode stage failed: %s", str(e))
+            self._errors.append(e)
+            self._stop.set()
+
+    def frames(self):
+        """Yield ``(index, frame)`` in decode order for the inference stage."""
+        while True:
+            start = time.perf_counter()
+            item = self._get(self._decoded)
+            self._add_time("infer_starved", time.perf_counter() - start)
+            if item is _END or self._errors:
+                return
+            self._sample_depths()
+            self._infer_started = time.perf_counter()
+            yield item
+
+    def write(self, frame):
+        """Queue an annotated frame for encoding."""
+        now = time.perf_counter()
+        if self._infer_started is not None:
+            self._add_time("infer", now - self._infer_started)
+        with self._lock:
+            self._counts["inferred"] += 1
+        if not self._put(self._to_encode, frame):
+            raise self._errors[0] if self._errors else RuntimeError("Video pipeline stopped")
+        self._add_time("infer_blocked", time.perf_counter() - now)
+
+    def _sample_depths(self):
+        depths = {"decode": self._decoded.qsize(), "encode": self._to_encode.qsize()}
+        with self._lock:
+            self._samples += 1
+            for stage, depth in depths.items():
+                self._depth_sum[stage] += depth
+                self._depth_max[stage] = max(self._depth_max[stage], depth)
+
+    def stats(self):
+        """
+        Queue depths and per-stage timings so far. ``*_ms_per_frame`` is time
+        spent doing the stage's own work; ``starved``/``blocked`` is time spent
+        waiting on an empty input or a full output queue. The stage with the
+        most work time per frame is reported as the bottleneck.
+        """
+        with self._lock:
+            timings = dict(self._timings)
+            counts = dict(self._counts)
+            samples = max(self._samples, 1)
+            depth_mean = {stage: total / samples for stage, total in self._depth_sum.items()}
+            depth_max = dict(self._depth_max)
+
+        def per_frame(key, count):
+            return timings[key] * 1000 / count if count else 0.0
+
+        work = {
+            "decode": per_frame("decode", counts["decoded"]),
+            "infer": per_frame("infer", counts["inferred"]),
+            "encode": per_frame("encode", counts["encoded"]),
+        }
+        return {
+            "frames": counts,
+            "queues": {
+                "decode_depth": self._decoded.qsize(),
+                "encode_depth": self._to_encode.qsize(),
+                "decode_depth_mean": depth_mean["decode"],
+                "encode_depth_mean": depth_mean["encode"],
+                "decode_depth_max": depth_max["decode"],
+                "encode_depth_max": depth_max["encode"],
+                "capacity": self._decoded.maxsize,
+            },
+            "stages_ms_per_frame": work,
+            "waits_ms": {key: value * 1000 for key, value in timings.items()
+                         if key.endswith(("_starved", "_blocked"))},
+            "bottleneck": max(work, key=work.get),
+        }
@@ -0,0 +1,194 @@
+import logging
+import os
+import time
+
+import numpy as np
+
+from detect.backends import prepare_weights
+from detect.batching import InferenceBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownCrop(ValueError):
+    pass
+
+
+class ModelUnavailable(Exception):
+    pass
+
+
+def model_identity(path):
+    """Weights file and its size/mtime, so retrained weights never hit old cache entries."""
+    try:
+        stat = os.stat(path)
+        return f"{path}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return path
+
+
+def _rss_mb():
+    """
+    Current resident set size; falls back to the peak where /proc is missing,
+    and to 0 where ``resource`` is too (Windows).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _size_mb(path):
+    """Size of a weights file, or of an export directory."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names) / 2 ** 20
+    return os.path.getsize(path) / 2 ** 20 if os.path.exists(path) else 0.0
+
+
+class LoadedModel:
+    """One crop's model plus its load report. ``model`` is None if loading failed."""
+
+    def __init__(self, crop, path, backend="pytorch", precision="fp32"):
+        self.crop = crop
+        self.path = path
+        self.backend = backend
+        self.precision = precision
+        # Weights actually loaded (an export for non-PyTorch backends)
+        self.weights = path
+        self.identity = model_identity(path)
+        self.model = None
+        self.batcher = None
+        self.error = None
+        self.load_ms = 0.0
+        self.warmup_ms = 0.0
+        self.rss_mb = 0.0
+
+    @property
+    def names(self):
+        return getattr(self.model, "names", None) or {}
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "backend": self.backend,
+            "precision": self.precision,
+            "weights": self.weights,
+            "weights_mb": _size_mb(self.weights) if self.model is not None else 0.0,
+            "loaded": self.model is not None,
+            "error": self.error,
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "rss_mb": self.rss_mb,
+            "classes": len(self.names),
+        }
+
+
+class ModelRegistry:
+    """
+    The YOLO model of every configured crop, loaded and warmed once per
+    process. ``model_paths`` maps crop name to weights file; requests pick a
+    crop by name and get the default crop otherwise.
+
+    A model that fails to load stays registered with its error, so requests
+    for it get a clear :class:`ModelUnavailable` instead of a crash, while the
+    other crops keep working. When ``batch_options`` is given, each loaded
+    model gets its own :class:`InferenceBatcher` built with those options.
+    ``backend`` and ``precision`` are one of :data:`detect.backends.BACKENDS`
+    and :data:`detect.backends.PRECISIONS`; ``calibration_dir`` holds images
+    for INT8 calibration.
+    """
+
+    def __init__(self, model_paths, default_crop=None, batch_options=None, warmup_size=640, backend="pytorch",
+                 precision="fp32", calibration_dir=None):
+        if not model_paths:
+            raise ValueError("No detection models configured")
+        self.default_crop = default_crop or next(iter(model_paths))
+        if self.default_crop not in model_paths:
+            raise ValueError(f"Default crop {self.default_crop} is not a configured model")
+        self.batch_options = batch_options
+        self.warmup_size = warmup_size
+        self.backend = backend
+        self.precision = precision
+        self.calibration_dir = calibration_dir
+        self.cold_start_ms = 0.0
+        self._entries = {crop: LoadedModel(crop, path, backend, precision) for crop, path in model_paths.items()}
+
+    def load_all(self):
+        """Load and warm every model; failures are logged and recorded, not raised."""
+        start = time.perf_counter()
+        for entry in self._entries.values():
+            self._load(entry)
+        self.cold_start_ms = (time.perf_counter() - start) * 1000
+        logger.info("Loaded %d/%d detection models in %.0f ms",
+                    len(self.available()), len(self._entries), self.cold_start_ms)
+        return self
+
+    def _load(self, entry):
+        # Imported here so the registry can be imported without pulling in torch
+        from ultralytics import YOLO
+
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        try:
+            # A missing file would otherwise make ultralytics try to download it
+            if not os.path.exists(entry.path):
+                raise FileNotFoundError(f"Weights file {entry.path} not found")
+            entry.weights = prepare_weights(entry.path, self.backend, imgsz=self.warmup_size,
+                                            precision=self.precision, calibration_dir=self.calibration_dir)
+            entry.identity = model_identity(entry.weights)
+            model = YOLO(entry.weights, task="detect")
+            loaded = time.perf_counter()
+            # The first inference builds the fused graph and allocates buffers; pay for it now, not on a request
+            model(np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8), verbose=False)
+        except Exception as e:
+            entry.error = str(e)
+            logger.error("Failed to load %s model from %s: %s", entry.crop, entry.path, str(e))
+            return
+        entry.load_ms = (loaded - start) * 1000
+        entry.warmup_ms = (time.perf_counter() - loaded) * 1000
+        entry.rss_mb = _rss_mb() - rss_before
+        entry.model = model
+        if self.batch_options is not None:
+            entry.batcher = InferenceBatcher(model, **self.batch_options)
+        logger.info("Loaded %s model %s (%s, %s): load %.0f ms, warm-up %.0f ms, +%.1f MB RSS",
+                    entry.crop, entry.weights, self.backend, self.precision, entry.load_ms, entry.warmup_ms, entry.rss_mb)
+
+    def crops(self):
+        return list(self._entries)
+
+    def available(self):
+        return [crop for crop, entry in self._entries.items() if entry.model is not None]
+
+    def resolve(self, crop=None):
+        """Crop name for a request value; raises UnknownCrop for names not configured."""
+        crop = crop or self.default_crop
+        if crop not in self._entries:
+            raise UnknownCrop(f"Unknown crop {crop}; expected one of {', '.join(self._entries)}")
+        return crop
+
+    def get(self, crop=None):
+        """The loaded model for ``crop`` (default crop if empty)."""
+        entry = self._entries[self.resolve(crop)]
+        if entry.model is None:
+            raise ModelUnavailable(f"{entry.crop} model not available: {entry.error}")
+        return entry
+
+    def stats(self):
+        """
+        Cold-start time and per-model load/warm-up time and RSS growth. The
+        first model loaded also carries the one-off torch runtime start-up.
+        """
+        return {
+            "backend": self.backend,
+            "precision": self.precision,
+            "default_crop": self.default_crop,
+            "cold_start_ms": self.cold_start_ms,
+            "models": {crop: entry.stats() for crop, entry in self._entries.items()},
+        }
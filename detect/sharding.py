@@ -0,0 +1,170 @@
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _init_worker(threads_per_worker):
+    """Runs once in each worker process: set up Django and load the model."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "RockPaperServer.settings")
+    import django
+    django.setup()
+
+    import torch
+    torch.set_num_threads(threads_per_worker)
+
+    # Importing the views loads this worker's own YOLO models; they stay loaded for later jobs
+    from detect import views
+    if not views.registry.available():
+        raise RuntimeError("No YOLO model loaded in worker process")
+
+
+def _worker_ready(delay):
+    # Keeps each worker busy long enough that every process gets started
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _process_segment(input_path, segment_path, start_frame, end_frame, sampling, crop):
+    from detect.views import process_with_yolo
+    return process_with_yolo(input_path, segment_path, sampling=sampling,
+                             start_frame=start_frame, end_frame=end_frame, crop=crop)
+
+
+def get_pool(workers):
+    """
+    Worker processes are kept between calls so each loads its model only once.
+    The pool is rebuilt if a different worker count is requested.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # spawn, not fork: torch and the parent's threads do not survive a fork reliably
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(threads,))
+            _pool_workers = workers
+            logger.info("Started %d video worker processes with %d torch threads each", workers, threads)
+        return _pool
+
+
+def warm_pool(workers):
+    """Start every worker process (and load its model) ahead of the first video."""
+    pool = get_pool(workers)
+    return len(set(pool.map(_worker_ready, [0.5] * workers)))
+
+
+def split_frames(total_frames, workers, min_segment_frames):
+    """Contiguous ``(start, end)`` frame ranges, at most one per worker."""
+    segments = max(1, min(workers, total_frames // max(1, min_segment_frames)))
+    size = math.ceil(total_frames / segments)
+    return [(start, min(start + size, total_frames)) for start in range(0, total_frames, size)]
+
+
+def concatenate_segments(segment_paths, output_path, fps, size):
+    """Append the annotated segments, in order, into one video."""
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    if not out.isOpened():
+        raise RuntimeError(f"Could not create output video {output_path}")
+    try:
+        for path in segment_paths:
+            cap = cv2.VideoCapture(path)
+            try:
+                while True:
+                    success, frame = cap.read()
+                    if not success:
+                        break
+                    out.write(frame)
+            finally:
+                cap.release()
+    finally:
+        out.release()
+
+
+def process_video_sharded(input_path, output_path, workers=None, sampling=None, progress_callback=None,
+                          crop=None):
+    """
+    Same result as process_with_yolo, but the video is cut into frame-range
+    segments that run in separate worker processes, each with its own model.
+    The annotated segments are joined in order and the per-frame detections
+    are returned sorted by frame.
+
+    ``progress_callback(frame_count, total_frames, stats)`` is called as
+    segments finish, and every ``VIDEO_JOB_HEARTBEAT_SECONDS`` while they
+    run so a long segment does not leave the job looking stale; ``stats``
+    reports segment progress.
+    """
+    workers = workers or getattr(settings, "VIDEO_SHARD_WORKERS", 1)
+
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ValueError("Could not read the uploaded video")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total_frames <= 0:
+        # Frame count unknown (some containers); segments cannot be cut
+        from detect.views import process_with_yolo
+        return process_with_yolo(input_path, output_path, progress_callback=progress_callback, sampling=sampling,
+                                 crop=crop)
+
+    segments = split_frames(total_frames, workers,
+                            getattr(settings, "VIDEO_SHARD_MIN_SEGMENT_FRAMES", 60))
+    logger.info("Processing %d frames in %d segments on %d workers", total_frames, len(segments), workers)
+
+    start_time = time.perf_counter()
+    segment_dir = tempfile.mkdtemp(prefix="video_segments_")
+    try:
+        pool = get_pool(workers)
+        segment_paths = [os.path.join(segment_dir, f"segment_{i:04d}.mp4") for i in range(len(segments))]
+        futures = {
+            pool.submit(_process_segment, input_path, path, start, end, sampling, crop): (start, end)
+            for path, (start, end) in zip(segment_paths, segments)
+        }
+
+        heartbeat = getattr(settings, "VIDEO_JOB_HEARTBEAT_SECONDS", 30)
+        detections_info = []
+        frames_done = 0
+        pending = set(futures)
+        try:
+            while pending:
+                finished, pending = wait(pending, timeout=heartbeat, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, end = futures[future]
+                    detections_info.extend(future.result())
+                    frames_done += end - start
+                # Called on timeouts too, with unchanged counts, as the job's heartbeat
+                if progress_callback is not None:
+                    progress_callback(frames_done, total_frames, {
+                        "workers": workers, "segments": len(segments),
+                        "segments_done": len(segments) - len(pending)})
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+        concatenate_segments(segment_paths, output_path, fps, size)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    detections_info.sort(key=lambda detection: detection["frame"])
+    logger.info("Sharded video processing complete: %d frames on %d workers in %.1fs",
+                total_frames, workers, time.perf_counter() - start_time)
+    return detections_info
@@ -0,0 +1,173 @@
+import io
+import logging
+import os
+import re
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Content types whose body is the video file itself
+RAW_VIDEO_CONTENT_TYPES = ("video/", "application/octet-stream")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# File extension an upload of each video content type is saved with; the subtype is often not one
+VIDEO_CONTENT_TYPES = {
+    "video/mp4": "mp4",
+    "video/x-m4v": "m4v",
+    "video/quicktime": "mov",
+    "video/x-msvideo": "avi",
+    "video/avi": "avi",
+    "video/webm": "webm",
+    "video/x-matroska": "mkv",
+    "video/mpeg": "mpg",
+    "video/3gpp": "3gp",
+    "video/x-flv": "flv",
+}
+# Processed videos are always written as MP4 (the mp4v codec), whatever the upload was
+OUTPUT_FORMAT = "mp4"
+
+
+def is_streamed_upload(request):
+    content_type = (request.content_type or "").lower()
+    return content_type == "multipart/form-data" or content_type.startswith(RAW_VIDEO_CONTENT_TYPES)
+
+
+def upload_format(request, default="mp4"):
+    """
+    Container format (file extension) of a streamed upload, from
+    ``?format=``, the content type or the extension of the ``X-File-Name``
+    header. Raises ValueError for a video content type that is not in
+    :data:`VIDEO_CONTENT_TYPES` or a malformed format.
+    """
+    video_format = request.GET.get("format")
+    if not video_format and request.content_type.startswith("video/"):
+        video_format = VIDEO_CONTENT_TYPES.get(request.content_type.lower())
+        if not video_format:
+            raise ValueError(f"Unsupported video type {request.content_type}")
+    if not video_format:
+        name = request.headers.get("X-File-Name", "")
+        video_format = os.path.splitext(name)[1].lstrip(".")
+    video_format = (video_format or default).lower()
+    if not video_format.isalnum():
+        raise ValueError("Invalid video format")
+    return video_format
+
+
+def save_streamed_upload(request, path, field="video"):
+    """
+    Write a raw or multipart video upload to ``path`` in fixed-size chunks and
+    return the number of bytes written. Neither mode reads the whole body into
+    memory, so ``DATA_UPLOAD_MAX_MEMORY_SIZE`` does not apply.
+    """
+    written = 0
+    with open(path, "wb") as destination:
+        if request.content_type == "multipart/form-data":
+            # Spool the file part to disk however small it is
+            request.upload_handlers = [TemporaryFileUploadHandler(request)]
+            upload = request.FILES.get(field)
+            if upload is None:
+                raise ValueError(f"No {field} file provided in form data")
+            for chunk in upload.chunks(CHUNK_SIZE):
+                destination.write(chunk)
+                written += len(chunk)
+        else:
+            while True:
+                chunk = request.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                destination.write(chunk)
+                written += len(chunk)
+    if not written:
+        raise ValueError("No video data provided")
+    logger.info("Streamed %d byte upload to %s", written, path)
+    return written
+
+
+class DeleteOnCloseFile(io.FileIO):
+    """File that removes itself from disk once the response has been sent."""
+
+    def close(self):
+        closed = self.closed
+        super().close()
+        if not closed:
+            try:
+                os.unlink(self.name)
+            except OSError as e:
+                logger.warning("Failed to clean up %s: %s", self.name, str(e))
+
+
+class FileRangeIterator:
+    """Yields ``length`` bytes of an open file from ``start`` in chunks."""
+
+    def __init__(self, filelike, start, length, chunk_size=CHUNK_SIZE):
+        self.filelike = filelike
+        self.start = start
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        self.filelike.seek(self.start)
+        remaining = self.length
+        while remaining > 0:
+            chunk = self.filelike.read(min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        # Called by StreamingHttpResponse.close(), even if iteration never started
+        self.filelike.close()
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` for a single ``bytes=`` range, or None if it is unsatisfiable."""
+    match = RANGE_RE.match(header.strip())
+    if not match or size == 0:
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def ranged_file_response(request, path, content_type, filename=None, delete=False):
+    """
+    Serve ``path`` as a streamed download, honouring a single ``Range`` header
+    with ``206 Partial Content`` so players can seek and clients can resume.
+    With ``delete=True`` the file is removed once the response is closed.
+    """
+    filelike = DeleteOnCloseFile(path, "rb") if delete else open(path, "rb")
+    size = os.fstat(filelike.fileno()).st_size
+    range_header = request.headers.get("Range")
+
+    if range_header:
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            filelike.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        start, end = byte_range
+        response = StreamingHttpResponse(FileRangeIterator(filelike, start, end - start + 1),
+                                         status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    else:
+        response = FileResponse(filelike, content_type=content_type)
+        response["Content-Length"] = str(size)
+
+    response["Accept-Ranges"] = "bytes"
+    if filename:
+        response["Content-Disposition"] = f'inline; filename="{filename}"'
+    return response
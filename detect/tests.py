@@ -1,3 +1,630 @@
-from django.test import TestCase
+import importlib.util
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from detect.batching import InferenceBatcher
+from detect.cache import DetectionCache, image_key
+from detect.engine import result_arrays
+from detect.evaluation import match_boxes
+from detect.jobs import cleanup_expired_jobs, job_dir, resume_interrupted_jobs, run_video_job
+from detect.management.commands.eval_precision import wait_for_report
+from detect.models import VideoJob
+from detect.pipeline import VideoPipeline
+from detect.registry import ModelRegistry, ModelUnavailable, _rss_mb
+from detect.sampling import FrameSampler
+from detect.sharding import process_video_sharded
+from detect.streaming import parse_range, upload_format
+from detect.tiling import detect_tiled, nms, tile_grid
+
+
+class FakeModel:
+    """Stands in for YOLO: each image is a number and its result is ten times it. Records batch sizes."""
+
+    def __init__(self):
+        self.batches = []
+        self.called = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, images):
+        self.called.set()
+        self.release.wait()
+        self.batches.append(len(images))
+        if any(image < 0 for image in images):
+            raise ValueError("negative image")
+        return [image * 10 for image in images]
+
+
+class InferenceBatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.model = FakeModel()
+
+    def pile_up(self, batcher, images):
+        """Submit ``images`` from threads while the model is held, so they queue behind one call."""
+        self.model.release.clear()
+        self.model.called.clear()
+        pool = ThreadPoolExecutor(len(images) + 1)
+        self.addCleanup(pool.shutdown)
+        first = pool.submit(batcher.submit, 0)
+        self.model.called.wait(5)
+        futures = [pool.submit(batcher.submit, image) for image in images]
+        while batcher.metrics()["summary"]["queued"] < len(images):
+            time.sleep(0.001)
+        self.model.release.set()
+        return first.result(5), [future.result(5) for future in futures]
+
+    def test_waiting_requests_form_batches_up_to_the_maximum(self):
+        batcher = InferenceBatcher(self.model, max_batch_size=3, max_wait_ms=0)
+        first, results = self.pile_up(batcher, [1, 2, 3, 4, 5])
+        self.assertEqual(self.model.batches, [1, 3, 2])
+        # Each caller gets the result of its own image
+        self.assertEqual((first, results), (0, [10, 20, 30, 40, 50]))
+
+    def test_submit_many_keeps_the_order(self):
+        batcher = InferenceBatcher(self.model, max_batch_size=8)
+        self.assertEqual(batcher.submit_many([3, 1, 2]), [30, 10, 20])
+        self.assertEqual(self.model.batches, [3])
+
+    def test_errors_reach_every_caller_of_the_batch_and_the_thread_goes_on(self):
+        batcher = InferenceBatcher(self.model, max_batch_size=8)
+        with self.assertRaises(ValueError):
+            batcher.submit_many([1, -1])
+        with mock.patch.object(FakeModel, "__call__", return_value=[]):
+            with self.assertRaises(RuntimeError):
+                batcher.submit(1)
+        self.assertEqual(batcher.submit(2), 20)
+
+    def test_wait_is_bounded(self):
+        batcher = InferenceBatcher(self.model, timeout_s=0.05)
+        self.model.release.clear()
+        self.addCleanup(self.model.release.set)
+        with self.assertRaises(TimeoutError):
+            batcher.submit(1)
+
+    def test_stopped_thread_is_reported(self):
+        batcher = InferenceBatcher(self.model)
+        batcher._thread = threading.Thread(target=lambda: None)
+        batcher._thread.start()
+        batcher._thread.join()
+        with self.assertRaises(RuntimeError):
+            batcher.submit(1)
+
+    def test_metrics(self):
+        batcher = InferenceBatcher(self.model, max_batch_size=4, max_wait_ms=0)
+        self.pile_up(batcher, [1, 2, 3])
+        metrics = batcher.metrics()
+        summary = metrics["summary"]
+        self.assertEqual((summary["batches"], summary["images"], summary["queued"]), (2, 4, 0))
+        self.assertEqual(summary["mean_batch_size"], 2.0)
+        self.assertEqual([batch["batch_size"] for batch in metrics["recent_batches"]], [1, 3])
+        self.assertGreaterEqual(metrics["recent_batches"][1]["queue_wait_ms_max"], 0)
+
+
+class FakeCapture:
+    """Returns the numbers 0..frames-1 as frames, or raises when it reaches ``fail_at``."""
+
+    def __init__(self, frames, fail_at=None):
+        self.frames = frames
+        self.fail_at = fail_at
+        self.position = 0
+
+    def read(self):
+        if self.position == self.fail_at:
+            raise OSError("corrupt frame")
+        if self.position >= self.frames:
+            return False, None
+        self.position += 1
+        return True, self.position - 1
+
+
+class FakeWriter:
+    """Records written frames; raises on ``fail_at``, and can be slowed down to fill the queues."""
+
+    def __init__(self, fail_at=None, delay=0.0):
+        self.written = []
+        self.fail_at = fail_at
+        self.delay = delay
+
+    def write(self, frame):
+        if len(self.written) == self.fail_at:
+            raise OSError("disk full")
+        time.sleep(self.delay)
+        self.written.append(frame)
+
+
+class VideoPipelineTests(SimpleTestCase):
+    def run_pipeline(self, cap, out, infer=None, **kwargs):
+        model = FakeModel()
+        with VideoPipeline(cap, out, queue_size=2, **kwargs) as pipeline:
+            for index, frame in pipeline.frames():
+                if infer is not None:
+                    infer(index)
+                pipeline.write(model([frame])[0])
+        return pipeline
+
+    def assert_stopped(self, pipeline):
+        self.assertFalse(pipeline._decoder.is_alive())
+        self.assertFalse(pipeline._encoder.is_alive())
+
+    def test_frames_come_out_in_input_order(self):
+        out = FakeWriter(delay=0.001)
+        self.run_pipeline(FakeCapture(50), out, infer=lambda index: time.sleep(0.001 * (index % 3)))
+        self.assertEqual(out.written, [frame * 10 for frame in range(50)])
+
+    def test_segment_keeps_the_video_frame_numbers(self):
+        cap = FakeCapture(50)
+        cap.position = 10
+        indexes = []
+        self.run_pipeline(cap, FakeWriter(), infer=indexes.append, start_index=10, max_frames=5)
+        self.assertEqual(indexes, [10, 11, 12, 13, 14])
+
+    def test_decode_error_is_raised(self):
+        out = FakeWriter()
+        with self.assertRaisesMessage(OSError, "corrupt frame"):
+            self.run_pipeline(FakeCapture(20, fail_at=5), out)
+        # Inference stops at the error, so only some of the frames decoded before it are encoded, in order
+        self.assertEqual(out.written, [frame * 10 for frame in range(len(out.written))])
+        self.assertLessEqual(len(out.written), 5)
+
+    def test_infer_error_is_raised_and_stops_the_threads(self):
+        pipeline = VideoPipeline(FakeCapture(100), FakeWriter(), queue_size=2)
+        with self.assertRaisesMessage(ValueError, "bad frame"):
+            with pipeline:
+                for index, frame in pipeline.frames():
+                    if index == 3:
+                        raise ValueError("bad frame")
+                    pipeline.write(frame)
+        self.assert_stopped(pipeline)
+
+    def test_encode_error_is_raised(self):
+        out = FakeWriter(fail_at=3)
+        with self.assertRaisesMessage(OSError, "disk full"):
+            self.run_pipeline(FakeCapture(100), out)
+        self.assertEqual(out.written, [0, 10, 20])
+
+    def test_stats(self):
+        pipeline = self.run_pipeline(FakeCapture(20), FakeWriter(), infer=lambda index: time.sleep(0.005))
+        self.assert_stopped(pipeline)
+        stats = pipeline.stats()
+        self.assertEqual(stats["frames"], {"decoded": 20, "inferred": 20, "encoded": 20})
+        self.assertEqual(stats["queues"]["capacity"], 2)
+        self.assertLessEqual(stats["queues"]["decode_depth_max"], 2)
+        self.assertEqual(stats["bottleneck"], "infer")
+        self.assertGreaterEqual(stats["stages_ms_per_frame"]["infer"], 5)
+        self.assertEqual(set(stats["waits_ms"]), {"decode_blocked", "infer_starved", "infer_blocked", "encode_starved"})
+
+
+class TileGridTests(SimpleTestCase):
+    def test_small_image_is_one_tile(self):
+        self.assertEqual(tile_grid(300, 200, tile_size=640), [(0, 0, 300, 200)])
+
+    def test_tiles_cover_the_image_with_overlap(self):
+        windows = tile_grid(1500, 1000, tile_size=640, overlap=0.2)
+        covered = np.zeros((1000, 1500), dtype=bool)
+        for x1, y1, x2, y2 in windows:
+            self.assertLessEqual(x2 - x1, 640)
+            self.assertLessEqual(y2 - y1, 640)
+            covered[y1:y2, x1:x2] = True
+        self.assertTrue(covered.all())
+        # Neighbouring tiles overlap by at least the requested fraction
+        xs = sorted({x1 for x1, _, _, _ in windows})
+        self.assertTrue(all(b - a <= 640 * 0.8 for a, b in zip(xs, xs[1:])))
+
+    def test_last_tile_is_aligned_to_the_far_edge(self):
+        windows = tile_grid(1500, 640, tile_size=640, overlap=0.0)
+        self.assertEqual(windows[-1], (860, 0, 1500, 640))
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            tile_grid(1000, 1000, overlap=1.0)
+        with self.assertRaises(ValueError):
+            tile_grid(1000, 1000, tile_size=16)
+
+
+class NmsTests(SimpleTestCase):
+    def test_overlapping_boxes_of_one_class_keep_the_best(self):
+        boxes = np.array([[0, 0, 100, 100], [5, 5, 105, 105], [300, 300, 400, 400]], dtype=np.float32)
+        scores = np.array([0.6, 0.9, 0.5], dtype=np.float32)
+        classes = np.zeros(3)
+        self.assertEqual(nms(boxes, scores, classes).tolist(), [1, 2])
+
+    def test_other_classes_are_not_suppressed(self):
+        boxes = np.array([[0, 0, 100, 100], [5, 5, 105, 105]], dtype=np.float32)
+        scores = np.array([0.6, 0.9], dtype=np.float32)
+        self.assertEqual(nms(boxes, scores, np.array([0, 1])).tolist(), [1, 0])
+
+    def test_threshold(self):
+        boxes = np.array([[0, 0, 100, 100], [50, 0, 150, 100]], dtype=np.float32)  # IoU 1/3
+        scores = np.array([0.9, 0.8], dtype=np.float32)
+        self.assertEqual(len(nms(boxes, scores, np.zeros(2), iou_threshold=0.5)), 2)
+        self.assertEqual(len(nms(boxes, scores, np.zeros(2), iou_threshold=0.3)), 1)
+
+    def test_no_boxes(self):
+        self.assertEqual(len(nms(np.zeros((0, 4), dtype=np.float32), np.zeros(0), np.zeros(0))), 0)
+
+
+class DetectTiledTests(SimpleTestCase):
+    """A fake model that sees the part of each object inside a tile, with ``result_arrays`` passing its arrays through."""
+
+    def setUp(self):
+        patcher = mock.patch("detect.tiling.result_arrays", side_effect=lambda result: result)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def detect(self, objects, width, height, partial_score=0.8, **kwargs):
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        windows = []
+
+        def predict(crops):
+            results = []
+            for x1, y1, x2, y2 in windows[:len(crops)]:
+                boxes, scores = [], []
+                for box in objects:
+                    seen = [max(box[0], x1), max(box[1], y1), min(box[2], x2), min(box[3], y2)]
+                    if seen[2] - seen[0] >= 10 and seen[3] - seen[1] >= 10:
+                        boxes.append([seen[0] - x1, seen[1] - y1, seen[2] - x1, seen[3] - y1])
+                        scores.append(0.9 if seen == list(box) else partial_score)
+                results.append((np.array(boxes, dtype=np.float32).reshape(-1, 4),
+                                np.array(scores, dtype=np.float32), np.zeros(len(boxes), dtype=np.int64)))
+            return results
+
+        grid = tile_grid(width, height, kwargs.get("tile_size", 640), kwargs.get("overlap", 0.2))
+        windows.extend(grid + [(0, 0, width, height)])
+        boxes, scores, classes, _ = detect_tiled(predict, image, **kwargs)
+        return sorted(boxes.tolist())
+
+    def test_object_on_a_seam_is_reported_once(self):
+        # Tiles start at x 0, 512 and 560; the object is cut by the first tile's right edge at 640
+        lesion = [600, 100, 700, 160]
+        for partial_score in (0.8, 0.95):
+            for full_pass in (True, False):
+                with self.subTest(partial_score=partial_score, full_pass=full_pass):
+                    self.assertEqual(self.detect([lesion], 1200, 640, partial_score, full_pass=full_pass), [lesion])
+
+    def test_object_wider_than_the_overlap_is_joined(self):
+        # No tile holds it whole and there is no full pass: the halves on either side of the seam are joined
+        lesion = [400, 200, 900, 300]
+        self.assertEqual(self.detect([lesion], 1152, 640, overlap=0.2, full_pass=False), [lesion])
+
+    def test_object_on_a_corner_of_four_tiles(self):
+        lesion = [450, 450, 750, 750]
+        self.assertEqual(self.detect([lesion], 1152, 1152, full_pass=False), [lesion])
+
+    def test_neighbouring_objects_stay_apart(self):
+        # One on the seam and one inside a tile, a few pixels apart
+        lesions = [[600, 100, 700, 160], [705, 100, 760, 160]]
+        self.assertEqual(self.detect(lesions, 1200, 640, full_pass=False), lesions)
+
+    def test_no_detections(self):
+        self.assertEqual(self.detect([], 1200, 640), [])
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=500-", 1000), (500, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        # The end is clipped to the file
+        self.assertEqual(parse_range("bytes=900-5000", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+
+    def test_unsatisfiable(self):
+        for header in ("bytes=1000-", "bytes=50-10", "bytes=-", "bytes=0-1,5-6", "items=0-1", ""):
+            self.assertIsNone(parse_range(header, 1000), header)
+        self.assertIsNone(parse_range("bytes=0-", 0))
+
+
+class UploadFormatTests(SimpleTestCase):
+    def upload_format(self, content_type, path="/", **headers):
+        return upload_format(RequestFactory().post(path, b"video", content_type=content_type, **headers))
+
+    def test_content_types_map_to_extensions(self):
+        self.assertEqual(self.upload_format("video/quicktime"), "mov")
+        self.assertEqual(self.upload_format("video/x-msvideo"), "avi")
+        self.assertEqual(self.upload_format("video/mp4"), "mp4")
+
+    def test_query_and_file_name(self):
+        self.assertEqual(self.upload_format("video/quicktime", "/?format=MKV"), "mkv")
+        self.assertEqual(self.upload_format("application/octet-stream", HTTP_X_FILE_NAME="field.MOV"), "mov")
+        self.assertEqual(self.upload_format("application/octet-stream"), "mp4")
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            self.upload_format("video/x-unknown")
+        with self.assertRaises(ValueError):
+            self.upload_format("video/mp4", "/?format=../mp4")
+
+
+class FrameSamplerTests(SimpleTestCase):
+    def frame(self, value):
+        return np.full((72, 128, 3), value, dtype=np.uint8)
+
+    def inferred(self, sampler, frames):
+        return [index for index, frame in enumerate(frames) if sampler.should_infer(index, frame)]
+
+    def test_all_and_stride(self):
+        frames = [self.frame(0)] * 10
+        self.assertEqual(self.inferred(FrameSampler("all"), frames), list(range(10)))
+        self.assertEqual(self.inferred(FrameSampler("stride", stride=3), frames), [0, 3, 6, 9])
+
+    def test_fps(self):
+        sampler = FrameSampler("fps", target_fps=5, source_fps=30)
+        self.assertEqual(self.inferred(sampler, [self.frame(0)] * 30), [0, 6, 12, 18, 24])
+
+    def test_adaptive_infers_on_scene_changes_and_after_max_gap(self):
+        frames = [self.frame(0)] * 5 + [self.frame(200)] * 10
+        sampler = FrameSampler("adaptive", threshold=0.1, max_gap=4)
+        self.assertEqual(self.inferred(sampler, frames), [0, 4, 5, 9, 13])
+
+    def test_adaptive_histogram_metric(self):
+        blue = self.frame(0)
+        blue[..., 0] = 255
+        frames = [self.frame(0)] * 3 + [blue]
+        sampler = FrameSampler("adaptive", metric="hist", threshold=0.2, max_gap=100)
+        self.assertEqual(self.inferred(sampler, frames), [0, 3])
+
+    def test_invalid_options(self):
+        for options in ({"mode": "sometimes"}, {"metric": "ssim"}, {"mode": "stride", "stride": 0},
+                        {"target_fps": 0}, {"threshold": -1}):
+            with self.assertRaises(ValueError):
+                FrameSampler(**options)
+
+
+class DetectionCacheTests(SimpleTestCase):
+    detections = [{"label": "rust 0.90", "confidence": 0.9}]
+
+    def test_key_depends_on_pixels_model_and_params(self):
+        image = np.zeros((4, 4, 3), dtype=np.uint8)
+        key = image_key(image, "model.pt:1:2", {"conf": 0.25})
+        self.assertEqual(key, image_key(image.copy(), "model.pt:1:2", {"conf": 0.25}))
+        changed = image.copy()
+        changed[0, 0, 0] = 1
+        self.assertNotEqual(key, image_key(changed, "model.pt:1:2", {"conf": 0.25}))
+        self.assertNotEqual(key, image_key(image, "model.pt:1:3", {"conf": 0.25}))
+        self.assertNotEqual(key, image_key(image, "model.pt:1:2", {"conf": 0.5}))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = DetectionCache(max_entries=2)
+        cache.put("a", self.detections, None)
+        cache.put("b", [], b"jpeg")
+        cache.get("a")
+        cache.put("c", [], None)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), (self.detections, None))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["evictions"], stats["misses"]), (2, 1, 1))
+
+    def test_memory_tier_is_bounded_by_bytes(self):
+        # Each entry is 2 bytes of JSON ("[]") plus its JPEG
+        cache = DetectionCache(max_entries=10, max_bytes=100)
+        cache.put("a", [], b"x" * 38)
+        cache.put("b", [], b"x" * 38)
+        self.assertEqual(cache.stats()["bytes"], 80)
+        cache.get("a")
+        cache.put("c", [], b"x" * 38)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["bytes"], 80)
+        # Replacing an entry counts its new size only
+        cache.put("c", [], b"x" * 8)
+        self.assertEqual(cache.stats()["bytes"], 50)
+        # Too large to keep in memory at all, and nothing else is evicted for it
+        cache.put("d", [], b"x" * 200)
+        self.assertIsNone(cache.get("d"))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["bytes"], stats["evictions"], stats["max_bytes"]), (2, 50, 1, 100))
+
+    def test_disk_tier_is_shared_and_promoted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            DetectionCache(max_entries=1, directory=directory).put("ab" * 20, self.detections, b"jpeg")
+            other = DetectionCache(max_entries=1, directory=directory)
+            self.assertEqual(other.get("ab" * 20), (self.detections, b"jpeg"))
+            self.assertEqual(other.get("ab" * 20), (self.detections, b"jpeg"))
+            stats = other.stats()
+            self.assertEqual((stats["disk_hits"], stats["memory_hits"]), (1, 1))
+            self.assertIsNone(other.get("cd" * 20))
+
+
+class ShardedProgressTests(SimpleTestCase):
+    @override_settings(VIDEO_JOB_HEARTBEAT_SECONDS=0.05, VIDEO_SHARD_MIN_SEGMENT_FRAMES=1)
+    def test_progress_is_reported_while_a_segment_runs(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "input.mp4")
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+        for _ in range(4):
+            out.write(np.zeros((48, 64, 3), dtype=np.uint8))
+        out.release()
+
+        def slow_segment(*args):
+            time.sleep(0.5)
+            return []
+
+        pool = ThreadPoolExecutor(2)
+        self.addCleanup(pool.shutdown)
+        calls = []
+        with mock.patch("detect.sharding.get_pool", return_value=pool), \
+                mock.patch("detect.sharding._process_segment", slow_segment), \
+                mock.patch("detect.sharding.concatenate_segments"):
+            process_video_sharded(path, os.path.join(directory.name, "output.mp4"), workers=2,
+                                  progress_callback=lambda *args: calls.append(args))
+        # Heartbeats with nothing finished yet, then the final count
+        self.assertGreater(sum(1 for frames, _, _ in calls if frames == 0), 3)
+        self.assertEqual(calls[-1][:2], (4, 4))
+        self.assertEqual(calls[-1][2]["segments_done"], 2)
+
+
+class ModelUnavailableTests(SimpleTestCase):
+    unavailable = ModelUnavailable("groundnut model not available")
+
+    def test_video_processing_answers_503(self):
+        with mock.patch("detect.views.run_video_detection", side_effect=self.unavailable):
+            response = self.client.post(reverse("process_video"), b"video", content_type="video/mp4")
+        self.assertEqual(response.status_code, 503)
+
+    def test_no_job_is_queued(self):
+        with mock.patch("detect.views.registry.get", side_effect=self.unavailable), \
+                mock.patch("detect.views.create_video_job") as create_video_job:
+            response = self.client.post(reverse("submit_video_job"), b"video", content_type="video/mp4")
+        self.assertEqual(response.status_code, 503)
+        create_video_job.assert_not_called()
+
+
+class RssTests(SimpleTestCase):
+    def test_platforms_without_proc_or_resource(self):
+        self.assertGreater(_rss_mb(), 0)
+        # As on Windows: no /proc, and importing resource fails
+        with mock.patch("builtins.open", side_effect=OSError), mock.patch.dict(sys.modules, {"resource": None}):
+            self.assertEqual(_rss_mb(), 0.0)
+
+
+DEFAULT_WEIGHTS = getattr(settings, "DETECT_MODELS", {}).get(getattr(settings, "DETECT_DEFAULT_CROP", None), "")
+
+
+class MatchBoxesTests(SimpleTestCase):
+    def test_one_to_one_matching_within_a_class(self):
+        ref = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32)
+        pred = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [20, 20, 30, 30]], dtype=np.float32)
+        pairs, ious = match_boxes(pred, [0, 0, 1], ref, [0, 0], iou_threshold=0.5, pred_scores=[0.5, 0.9, 0.8])
+        # The better-scoring duplicate takes the first box; the other class never matches
+        self.assertEqual(pairs, [(1, 0)])
+        self.assertAlmostEqual(ious[0], 9 / 11, places=5)
+
+
+class ImmediateExecutor:
+    """Runs submitted jobs right away, in the test's thread and transaction."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+def stub_detection(input_path, output_path, options=None, progress_callback=None):
+    """Stands in for run_video_detection: reports progress and writes a fake output video."""
+    progress_callback(5, 10, {"decode_queue": 0})
+    with open(output_path, "wb") as f:
+        f.write(b"processed " + open(input_path, "rb").read())
+    return [{"frame": 3, "label": "Rust-Leaf 0.90"}]
+
+
+class VideoJobTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overridden = override_settings(VIDEO_JOB_ROOT=directory.name, VIDEO_JOB_STALE_SECONDS=300,
+                                       VIDEO_JOB_RETENTION_SECONDS=3600)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        for patcher in (mock.patch("detect.jobs.get_executor", return_value=ImmediateExecutor()),
+                        # Closing the connection would end the test's transaction
+                        mock.patch("detect.jobs.close_old_connections"),
+                        mock.patch("detect.views.registry.get")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.runner = mock.patch("detect.views.run_video_detection", side_effect=stub_detection)
+        self.run_video_detection = self.runner.start()
+        self.addCleanup(self.runner.stop)
+
+    def submit(self):
+        response = self.client.post(reverse("submit_video_job"), b"video", content_type="video/mp4")
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def make_job(self, status, age_s=0):
+        job = VideoJob.objects.create(status=status, input_path=os.path.join(job_dir("x"), "input.mp4"))
+        # updated_at is auto_now, so only an update can age it
+        VideoJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=age_s))
+        return job
+
+    def test_submit_status_result_and_video(self):
+        submitted = self.submit()
+        status = self.client.get(submitted["status_url"]).json()
+        self.assertEqual((status["status"], status["frame_count"], status["total_frames"]), ("done", 5, 10))
+        self.assertEqual(status["pipeline"], {"decode_queue": 0})
+        result = self.client.get(submitted["result_url"]).json()
+        self.assertEqual(result["detections"], [{"frame": 3, "label": "Rust-Leaf 0.90"}])
+        self.assertEqual(result["video_url"], submitted["video_url"])
+        video = self.client.get(submitted["video_url"])
+        self.assertEqual(b"".join(video.streaming_content), b"processed video")
+        # Only the output is kept
+        job = VideoJob.objects.get(pk=submitted["job_id"])
+        self.assertFalse(os.path.exists(job.input_path))
+
+    def test_failed_job(self):
+        self.run_video_detection.side_effect = ValueError("Could not read the uploaded video")
+        submitted = self.submit()
+        status = self.client.get(submitted["status_url"]).json()
+        self.assertEqual((status["status"], status["error"]), ("failed", "Could not read the uploaded video"))
+        self.assertEqual(self.client.get(submitted["result_url"]).status_code, 500)
+
+    def test_unfinished_job_has_no_result_yet(self):
+        job = self.make_job(VideoJob.STATUS_PENDING)
+        self.assertEqual(self.client.get(reverse("video_job_result", args=[job.id])).status_code, 409)
+        self.assertEqual(self.client.get(reverse("video_job_video", args=[job.id])).status_code, 409)
+
+    def test_a_claimed_job_is_not_run_again(self):
+        job = self.make_job(VideoJob.STATUS_RUNNING)
+        run_video_job(job.id)
+        self.run_video_detection.assert_not_called()
+        self.assertEqual(VideoJob.objects.get(pk=job.pk).status, VideoJob.STATUS_RUNNING)
+
+    def test_resume_requeues_pending_and_stale_jobs_only(self):
+        pending = self.make_job(VideoJob.STATUS_PENDING)
+        stale = self.make_job(VideoJob.STATUS_RUNNING, age_s=600)
+        active = self.make_job(VideoJob.STATUS_RUNNING, age_s=60)
+        self.run_video_detection.side_effect = lambda *args, **kwargs: []
+        self.assertEqual(resume_interrupted_jobs(), 2)
+        statuses = dict(VideoJob.objects.values_list("id", "status"))
+        self.assertEqual((statuses[pending.id], statuses[stale.id], statuses[active.id]),
+                         ("done", "done", "running"))
+
+    def test_cleanup_deletes_expired_finished_jobs_and_their_files(self):
+        expired = self.make_job(VideoJob.STATUS_DONE, age_s=7200)
+        recent = self.make_job(VideoJob.STATUS_DONE, age_s=60)
+        old_pending = self.make_job(VideoJob.STATUS_PENDING, age_s=7200)
+        directory = job_dir(expired.id)
+        self.assertEqual(cleanup_expired_jobs(), 1)
+        self.assertFalse(os.path.exists(directory))
+        self.assertEqual(set(VideoJob.objects.values_list("id", flat=True)), {recent.id, old_pending.id})
+
+class WaitForReportTests(SimpleTestCase):
+    def test_child_that_dies_without_a_report(self):
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        proc = context.Process(target=os._exit, args=(3,))
+        proc.start()
+        self.addCleanup(proc.join)
+        self.assertIn("code 3", wait_for_report(proc, queue, poll_seconds=0.1)["error"])
+
+
+@skipUnless(os.path.exists(DEFAULT_WEIGHTS) and importlib.util.find_spec("onnxruntime"),
+            "needs the default crop's weights and onnxruntime")
+class BackendParityTests(SimpleTestCase):
+    """The ONNX export finds the same boxes as the PyTorch weights (see also check_backend_parity)."""
+
+    def test_onnx_matches_pytorch(self):
+        reference = ModelRegistry({"crop": DEFAULT_WEIGHTS}).load_all().get("crop")
+        candidate = ModelRegistry({"crop": DEFAULT_WEIGHTS}, backend="onnx").load_all().get("crop")
+        rng = np.random.default_rng(0)
+        # Smooth noise with a near-zero threshold gives boxes whatever the model was trained on
+        image = cv2.normalize(cv2.GaussianBlur(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8), (0, 0), 3),
+                              None, 0, 255, cv2.NORM_MINMAX)
+        ref_boxes, ref_scores, ref_classes = result_arrays(reference.model(image, conf=0.0001, verbose=False)[0])
+        boxes, scores, classes = result_arrays(candidate.model(image, conf=0.0001, verbose=False)[0])
+        self.assertGreater(len(ref_boxes), 0)
+        pairs, _ = match_boxes(boxes, classes, ref_boxes, ref_classes, iou_threshold=0.9, pred_scores=scores)
+        self.assertGreaterEqual(len(pairs), 0.95 * max(len(boxes), len(ref_boxes)))
+        for i, j in pairs:
+            self.assertAlmostEqual(float(scores[i]), float(ref_scores[j]), delta=0.01)
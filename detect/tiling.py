@@ -0,0 +1,157 @@
+import numpy as np
+
+from detect.engine import result_arrays
+from detect.evaluation import box_iou
+
+
+def tile_origins(length, tile_size, overlap):
+    """Start offsets along one axis; the last tile is aligned to the far edge."""
+    if length <= tile_size:
+        return [0]
+    step = max(1, int(tile_size * (1 - overlap)))
+    return list(range(0, length - tile_size, step)) + [length - tile_size]
+
+
+def tile_grid(width, height, tile_size=640, overlap=0.2):
+    """``(x1, y1, x2, y2)`` windows of at most ``tile_size`` pixels covering the image with ``overlap``."""
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be at least 0 and below 1")
+    if tile_size < 32:
+        raise ValueError("tile_size must be at least 32 pixels")
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in tile_origins(height, tile_size, overlap)
+            for x in tile_origins(width, tile_size, overlap)]
+
+
+def nms(boxes, scores, classes, iou_threshold=0.5):
+    """Class-aware greedy non-maximum suppression; indices of the kept boxes, best first."""
+    if not len(boxes):
+        return np.zeros(0, dtype=np.int64)
+    # Shift each class into its own coordinate range so boxes of different classes never overlap
+    shifted = boxes + (classes.astype(np.float32) * (float(boxes.max()) + 1))[:, None]
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        if not rest.size:
+            break
+        order = rest[box_iou(shifted[best], shifted[rest])[0] < iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def seam_cuts(boxes, window, width, height, margin=2.0):
+    """
+    Which sides (left, top, right, bottom) of ``boxes``, in image coordinates,
+    touch an edge of their tile ``window`` that lies inside the image: the
+    object may go on past it and be cut there.
+    """
+    edges = np.array(window, dtype=np.float32)
+    inner = np.array([window[0] > 0, window[1] > 0, window[2] < width, window[3] < height])
+    return (np.abs(boxes - edges) <= margin) & inner
+
+
+def _interval_overlap(start, end, starts, ends):
+    """Overlap of ``[start, end]`` with each ``[starts, ends]`` as a fraction of their union."""
+    inter = np.clip(np.minimum(end, ends) - np.maximum(start, starts), 0, None)
+    union = np.maximum(end, ends) - np.minimum(start, starts)
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def _halves(box, cut, others, other_cuts, min_overlap=0.5):
+    """
+    Which ``others`` are the rest of an object ``box`` shares a seam with: one
+    is cut on the side facing the other, they meet across the tile overlap,
+    and they line up along the seam.
+    """
+    joined = np.zeros(len(others), dtype=bool)
+    for axis in (0, 1):
+        start, end = axis, axis + 2
+        across = 1 - axis
+        aligned = _interval_overlap(box[across], box[across + 2], others[:, across], others[:, across + 2]) >= min_overlap
+        # ``box`` cut at its far side and the other at its near side, or the other way round
+        after = cut[end] & other_cuts[:, start] & (others[:, start] > box[start]) & (others[:, start] < box[end])
+        before = cut[start] & other_cuts[:, end] & (others[:, end] > box[start]) & (others[:, end] < box[end])
+        joined |= aligned & (after | before)
+    return joined
+
+
+def merge_tiled(boxes, scores, classes, cuts, iou_threshold=0.5, ios_threshold=0.7):
+    """
+    Merge the boxes of overlapping tiles; returns ``(boxes, scores, classes)``,
+    best first. As in :func:`nms`, the best box drops same-class boxes with
+    IoU of ``iou_threshold`` or more. Where either box is cut at a seam
+    (``cuts`` from :func:`seam_cuts`), a pair is also one object when the
+    intersection covers ``ios_threshold`` of the smaller box, or when they
+    are the two halves of an object cut at the same seam; those are joined
+    into one box covering both. Otherwise a partial box next to the full one
+    survives IoU-based NMS and the seam reports the lesion twice.
+    """
+    order = list(np.argsort(-scores))
+    kept_boxes, kept = [], []
+    while order:
+        best = order.pop(0)
+        box, cut = boxes[best].copy(), cuts[best].copy()
+        while order:
+            rest = np.array(order)
+            others, other_cuts = boxes[rest], cuts[rest]
+            same = classes[rest] == classes[best]
+            top_left = np.maximum(box[:2], others[:, :2])
+            bottom_right = np.minimum(box[2:], others[:, 2:])
+            intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+            smaller = np.minimum(np.prod(box[2:] - box[:2]), np.prod(others[:, 2:] - others[:, :2], axis=1))
+            ios = np.where(smaller > 0, intersection / np.maximum(smaller, 1e-9), 0.0)
+            seam = cut.any() | other_cuts.any(axis=1)
+            joined = same & seam & ((ios >= ios_threshold) | _halves(box, cut, others, other_cuts))
+            dropped = same & ~joined & (box_iou(box, others)[0] >= iou_threshold)
+            if not (joined | dropped).any():
+                break
+            for index in rest[joined]:
+                # Each side of the joined box, and whether it is still cut, comes from the box reaching furthest
+                stacked, stacked_cuts = np.stack([box, boxes[index]]), np.stack([cut, cuts[index]])
+                for side, pick in ((0, np.argmin), (1, np.argmin), (2, np.argmax), (3, np.argmax)):
+                    source = pick(stacked[:, side])
+                    box[side], cut[side] = stacked[source, side], stacked_cuts[source, side]
+            order = [index for index, merged in zip(order, joined | dropped) if not merged]
+        kept.append(best)
+        kept_boxes.append(box)
+    kept = np.array(kept, dtype=np.int64)
+    merged = np.array(kept_boxes, dtype=np.float32).reshape(-1, 4)
+    return merged, scores[kept], classes[kept]
+
+
+def detect_tiled(predict, image, tile_size=640, overlap=0.2, iou_threshold=0.5, full_pass=True,
+                 ios_threshold=0.7):
+    """
+    Detect on overlapping tiles of a large image so small lesions keep their
+    pixels. ``predict(images)`` returns one ultralytics Results per image;
+    all tiles (plus, with ``full_pass``, the whole image for objects larger
+    than a tile) go to it in one call. Tile boxes are shifted to global
+    coordinates and duplicates across seams are merged with
+    :func:`merge_tiled`.
+
+    Returns ``(boxes xyxy, scores, classes, tile_count)``.
+    """
+    height, width = image.shape[:2]
+    windows = tile_grid(width, height, tile_size, overlap)
+    if full_pass and len(windows) > 1:
+        windows.append((0, 0, width, height))
+    crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+
+    all_boxes, all_scores, all_classes, all_cuts = [], [], [], []
+    for window, result in zip(windows, predict(crops)):
+        boxes, scores, classes = result_arrays(result)
+        x1, y1 = window[:2]
+        boxes = boxes + np.array([x1, y1, x1, y1], dtype=np.float32)
+        all_boxes.append(boxes)
+        all_scores.append(scores)
+        all_classes.append(classes)
+        all_cuts.append(seam_cuts(boxes, window, width, height))
+    boxes = np.concatenate(all_boxes)
+    scores = np.concatenate(all_scores)
+    classes = np.concatenate(all_classes)
+    cuts = np.concatenate(all_cuts)
+
+    boxes, scores, classes = merge_tiled(boxes, scores, classes, cuts, iou_threshold, ios_threshold)
+    return boxes, scores, classes, len(crops)
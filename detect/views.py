@@ -2,120 +2,246 @@ import base64
 import tempfile
 import os
 import cv2
-import numpy as np
 import json
 import logging
-from django.http import JsonResponse, HttpResponse
-from django.shortcuts import render
+import time
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-from ultralytics import YOLO
 from io import BytesIO
 from PIL import Image
 
-DISEASE_INFO = {
-    "Black Fungus Pod": {"color": "black", "medicine": "Mancozeb or Carbendazim"},
-    "Early and Late leaf spot": {"color": "blue", "medicine": "Chlorothalonil or Propiconazole"},
-    "Fungus leaf": {"color": "green", "medicine": "Copper Oxychloride"},
-    "Rust-Leaf": {"color": "orange", "medicine": "Hexaconazole or Sulphur"},
-    "black fungus-groundnut": {"color": "gray", "medicine": "Carbendazim or Thiophanate-methyl"},
-    "brown Fungus Pod": {"color": "brown", "medicine": "Mancozeb or Chlorothalonil"},
-    "bakteri_daun_bergaris": {"color": "yellow", "medicine": "Streptomycin or Copper Hydroxide"},
-    "bercak_coklat": {"color": "red", "medicine": "Propiconazole or Mancozeb"},
-    "bercak_coklat_sempit": {"color": "purple", "medicine": "Carbendazim or Propiconazole"},
-    "hawar_daun_bakteri": {"color": "cyan", "medicine": "Copper Oxychloride or Streptomycin"},
-    "tungro": {"color": "pink", "medicine": "Buprofezin or Imidacloprid"}
-}
+from detect.cache import DetectionCache, image_key
+from detect.engine import draw_boxes, postprocess, result_arrays, to_detections
+from detect.ingest import ImageDecodeError, read_request_image
+from detect.registry import ModelRegistry, ModelUnavailable, UnknownCrop
+from detect.jobs import create_video_job
+from detect.models import VideoJob
+from detect.pipeline import VideoPipeline
+from detect.sampling import FrameSampler
+from detect.sharding import process_video_sharded
+from detect.streaming import (OUTPUT_FORMAT, is_streamed_upload, ranged_file_response, save_streamed_upload,
+                              upload_format)
+from detect.tiling import detect_tiled
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load the YOLO model (do this at module level for efficiency)
-try:
-    model = YOLO("GroundNutDet.pt")
-    logger.info("YOLO model loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load YOLO model: {str(e)}")
-    model = None
+# Every configured crop model is loaded and warmed once per process; requests pick one with `crop`.
+# Each model gets its own batcher, the one thread that calls it, so concurrent process_image calls and video
+# frames share batched model invocations.
+registry = ModelRegistry(
+    getattr(settings, "DETECT_MODELS", {"groundnut": "GroundNutDet.pt"}),
+    default_crop=getattr(settings, "DETECT_DEFAULT_CROP", None),
+    batch_options={
+        "max_batch_size": getattr(settings, "DETECT_BATCH_MAX_SIZE", 8),
+        "max_wait_ms": getattr(settings, "DETECT_BATCH_MAX_WAIT_MS", 10),
+        "timeout_s": getattr(settings, "DETECT_BATCH_TIMEOUT_S", 60),
+    },
+    warmup_size=getattr(settings, "DETECT_WARMUP_SIZE", 640),
+    backend=getattr(settings, "DETECT_BACKEND", "pytorch"),
+    precision=getattr(settings, "DETECT_PRECISION", "fp32"),
+    calibration_dir=getattr(settings, "DETECT_INT8_CALIBRATION_DIR", None),
+).load_all()
+
+# Detections and annotated JPEGs of recently seen images
+detection_cache = DetectionCache(
+    max_entries=getattr(settings, "DETECT_CACHE_SIZE", 256),
+    max_bytes=getattr(settings, "DETECT_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    directory=getattr(settings, "DETECT_CACHE_DIR", None),
+)
+
+
+RESPONSE_MODES = ("annotated", "detections")
+
+
+def detection_params(model):
+    """Prediction settings that change the detections, for the cache key."""
+    overrides = getattr(model, "overrides", {}) or {}
+    return {name: overrides.get(name) for name in ("conf", "iou", "imgsz", "classes")}
 
 
 @csrf_exempt
 def process_image(request):
+    """
+    Detect diseases in one image.
+
+    Options (JSON fields, or query/form fields for binary uploads):
+    ``response=annotated`` (default) returns the detections and the annotated
+    JPEG; ``response=detections`` returns only the detections, for clients that
+    draw boxes themselves, skipping drawing and re-encoding.
+    ``thumbnail=<px>`` adds a small unannotated preview. ``crop`` picks the
+    model (see DETECT_MODELS); the default crop is used otherwise.
+    ``tiled=1`` detects on overlapping tiles for large drone images, with
+    ``tile_size`` and ``overlap`` overriding the configured defaults.
+    """
     logger.info("Received image processing request", request)
     if request.method != "POST":
         logger.warning("Invalid request method: %s", request.method)
         return JsonResponse({"error": "Only POST requests are allowed"}, status=400)
 
-    # Parse JSON payload
+    # Decode the upload (raw image body, multipart file or base64 JSON)
     try:
-        data = json.loads(request.body)
-        logger.info("JSON payload parsed successfully")
-    except json.JSONDecodeError as e:
-        logger.error("JSON decode error: %s", str(e))
-        return JsonResponse({"error": "Invalid JSON"}, status=400)
+        image_cv, options = read_request_image(request)
+        logger.info("Image decoded to OpenCV format: %dx%d", image_cv.shape[1], image_cv.shape[0])
+    except ImageDecodeError as e:
+        logger.error("Image decode error: %s", str(e))
+        return JsonResponse({"error": str(e)}, status=400)
+
+    detector, error = _get_detector(options.get("crop"))
+    if error:
+        return error
+
+    # "annotated" returns the image with boxes drawn; "detections" only the list (plus an optional thumbnail)
+    response_mode = options.get("response") or "annotated"
+    if response_mode not in RESPONSE_MODES:
+        return JsonResponse({"error": f"response must be one of {', '.join(RESPONSE_MODES)}"}, status=400)
+    try:
+        thumbnail_size = int(options.get("thumbnail") or 0)
+    except ValueError:
+        return JsonResponse({"error": "thumbnail must be a size in pixels"}, status=400)
+    try:
+        tiling = tiling_options(options)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    thumbnail = _thumbnail_data_uri(image_cv, thumbnail_size) if thumbnail_size > 0 else None
+
+    # Re-uploads of the same image are answered from the cache without inference
+    cache_key = image_key(image_cv, detector.identity, dict(detection_params(detector.model), tiling=tiling))
+    cached = detection_cache.get(cache_key)
+    detections_info, img_bytes = cached if cached is not None else (None, None)
+    if cached is not None:
+        logger.info("Detection cache hit: %s", cache_key)
+    else:
+        detections_info, error = _run_detection(detector, image_cv, tiling)
+        if error:
+            return error
+
+    # Drawing and JPEG encoding are only paid for when the annotated image is wanted
+    if response_mode == "annotated" and img_bytes is None:
+        img_bytes, error = _annotate_jpeg(image_cv, detections_info)
+        if error:
+            return error
+        detection_cache.put(cache_key, detections_info, img_bytes)
+    elif cached is None:
+        detection_cache.put(cache_key, detections_info, None)
 
-    if "image" not in data:
-        logger.error("No image provided in JSON payload")
-        return JsonResponse({"error": "No image provided in JSON"}, status=400)
+    # If no detections were found, add a message
+    if not detections_info:
+        message = "Healthy crop - no diseases detected"
+    else:
+        message = f"{len(detections_info)} detections found"
 
-    base64_image = data["image"]
-    # Remove data URI prefix if present (e.g., "data:image/png;base64,")
-    if base64_image.startswith("data:"):
-        base64_image = base64_image.split(",")[1]
+    # Return a JSON response containing the textual detection info and, when asked for, the processed image
+    response_payload = {
+        "detections": detections_info,
+        "message": message
+    }
+    if response_mode == "annotated":
+        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+        response_payload["image"] = "data:image/jpeg;base64," + img_base64
+    if thumbnail:
+        response_payload["thumbnail"] = thumbnail
+    logger.info("Returning processed image and detection info", response_payload)
+    return JsonResponse(response_payload)
 
-    try:
-        image_bytes = base64.b64decode(base64_image)
-        logger.info("Base64 image decoded successfully")
-    except Exception as e:
-        logger.error("Base64 decode error: %s", str(e))
-        return JsonResponse({"error": "Invalid base64 encoding"}, status=400)
 
+def inference_metrics(request):
+    """
+    Per-batch size, queue wait and inference time of one crop's batcher
+    (``?crop=``, default crop otherwise), the load report of every model, plus
+    cache counters.
+    """
+    detector, error = _get_detector(request.GET.get("crop"))
+    if error:
+        return error
+    payload = detector.batcher.metrics()
+    payload["crop"] = detector.crop
+    payload["models"] = registry.stats()
+    payload["cache"] = detection_cache.stats()
+    return JsonResponse(payload)
+
+
+def _get_detector(crop):
+    """Return ``(loaded_model, None)`` for a crop name, or ``(None, error_response)``."""
     try:
-        image = Image.open(BytesIO(image_bytes))
-        logger.info("Image opened successfully with PIL")
-    except Exception as e:
-        logger.error("Error opening image: %s", str(e))
-        return JsonResponse({"error": "Error processing image"}, status=400)
+        return registry.get(crop), None
+    except UnknownCrop as e:
+        return None, JsonResponse({"error": str(e)}, status=400)
+    except ModelUnavailable as e:
+        logger.error("Detection model unavailable: %s", str(e))
+        return None, JsonResponse({"error": str(e)}, status=503)
 
-    # Convert image to OpenCV format
+
+def tiling_options(options):
+    """
+    Tiled-detection settings from request options, or None when ``tiled`` is
+    not set. Raises ValueError on bad input.
+    """
+    if str(options.get("tiled", "")).lower() not in ("1", "true", "yes"):
+        return None
     try:
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        logger.info("Image converted to OpenCV format")
-    except Exception as e:
-        logger.error("Error converting image to OpenCV format: %s", str(e))
-        return JsonResponse({"error": "Error converting image"}, status=400)
+        tile_size = int(options.get("tile_size") or getattr(settings, "DETECT_TILE_SIZE", 640))
+        overlap = float(options.get("overlap") or getattr(settings, "DETECT_TILE_OVERLAP", 0.2))
+    except (TypeError, ValueError):
+        raise ValueError("tile_size must be an integer and overlap a fraction")
+    if tile_size < 32 or not 0 <= overlap < 1:
+        raise ValueError("tile_size must be at least 32 and overlap between 0 and 1")
+    return {"tile_size": tile_size, "overlap": overlap}
 
-    # Run YOLO detection
+
+def _run_detection(detector, image_cv, tiling=None):
+    """
+    Run one crop's YOLO model on one image, whole or in tiles. Returns
+    ``(detections_info, None)``, or ``(None, error_response)``.
+    """
+    # Run YOLO detection (batched with other concurrent requests; the tiles of one image go in together)
     try:
-        results = model(image_cv)
-        logger.info("YOLO detection complete. Number of results: %d", len(results))
+        if tiling:
+            boxes, scores, classes, tile_count = detect_tiled(
+                detector.batcher.submit_many, image_cv,
+                iou_threshold=getattr(settings, "DETECT_TILE_NMS_IOU", 0.5),
+                ios_threshold=getattr(settings, "DETECT_TILE_SEAM_IOS", 0.7),
+                full_pass=getattr(settings, "DETECT_TILE_FULL_PASS", True), **tiling)
+            logger.info("Tiled YOLO detection complete: %d tiles, %d boxes after merging", tile_count, len(boxes))
+        else:
+            boxes, scores, classes = result_arrays(detector.batcher.submit(image_cv))
+            logger.info("YOLO detection complete. Number of boxes: %d", len(boxes))
+        detections = to_detections(boxes, scores, classes, detector.names)
     except Exception as e:
         logger.error("Error running YOLO detection: %s", str(e))
-        return JsonResponse({"error": "Error during detection"}, status=500)
+        return None, JsonResponse({"error": "Error during detection"}, status=500)
 
-    # Collect detections info and draw detections on image
-    detections_info = []
-    for result in results:
-        for box in result.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            conf = box.conf[0].item()
-            cls = int(box.cls[0].item())
-            name = model.names[cls] if hasattr(model, 'names') and cls in model.names else str(cls)
-            label = f"{name} {conf:.2f}"
-            logger.info("Detection: %s at (%d, %d, %d, %d)", label, x1, y1, x2, y2)
-
-            # Append textual detection information
-            detections_info.append({
-                "label": name,
-                'disease': DISEASE_INFO[name]["medicine"],
-                "confidence": conf,
-                "coordinates": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
-            })
-            print("We are hanging...", detections_info)
-
-            # Draw rectangle and label on image
-            cv2.rectangle(image_cv, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(image_cv, label, (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return detections_payload(detections), None
+
+
+def detections_payload(detections):
+    """JSON-ready detection list of the API responses, one dict per box."""
+    # Labels and medicines were already mapped for all boxes at once
+    return [
+        {
+            "label": label,
+            'disease': medicine,
+            "confidence": conf,
+            "coordinates": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
+        }
+        for (x1, y1, x2, y2), conf, _, label, medicine in detections.rows()
+    ]
+
+
+def _annotate_jpeg(image_cv, detections_info):
+    """
+    Draw the detections on the image and JPEG-encode it. Returns
+    ``(jpeg_bytes, None)``, or ``(None, error_response)``.
+    """
+    # Draw rectangles and labels on image
+    draw_boxes(image_cv,
+               [(d["coordinates"]["x1"], d["coordinates"]["y1"], d["coordinates"]["x2"], d["coordinates"]["y2"])
+                for d in detections_info],
+               [f"{d['label']} {d['confidence']:.2f}" for d in detections_info])
 
     # Convert image back to PIL format
     try:
@@ -124,45 +250,45 @@ def process_image(request):
         logger.info("Processed image created successfully")
     except Exception as e:
         logger.error("Error converting processed image to PIL format: %s", str(e))
-        return JsonResponse({"error": "Error processing image"}, status=500)
+        return None, JsonResponse({"error": "Error processing image"}, status=500)
 
-    # Save processed image to a buffer and encode as base64
+    # Save processed image to a buffer
     buffer = BytesIO()
     try:
         processed_image.save(buffer, format="JPEG")
         logger.info("Processed image saved to buffer")
     except Exception as e:
         logger.error("Error saving processed image to buffer: %s", str(e))
-        return JsonResponse({"error": "Error saving image"}, status=500)
+        return None, JsonResponse({"error": "Error saving image"}, status=500)
     buffer.seek(0)
-    img_bytes = buffer.read()
-    img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-    image_data = "data:image/jpeg;base64," + img_base64
+    return buffer.read(), None
 
-    # If no detections were found, add a message
-    if not detections_info:
-        message = "Healthy crop - no diseases detected"
-    else:
-        message = f"{len(detections_info)} detections found"
 
-    # Return a JSON response containing both the processed image and textual detection info
-    response_payload = {
-        "image": image_data,
-        "detections": detections_info,
-        "message": message
-    }
-    logger.info("Returning processed image and detection info", response_payload)
-    return JsonResponse(response_payload)
+def _thumbnail_data_uri(image_cv, max_side):
+    """Small unannotated JPEG preview, longest side ``max_side`` pixels."""
+    height, width = image_cv.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    thumbnail = cv2.resize(image_cv, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", thumbnail, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return "data:image/jpeg;base64," + base64.b64encode(encoded.tobytes()).decode('utf-8')
 
 
 @csrf_exempt
 def process_video(request):
     """
     Endpoint to receive video, process it with YOLO model, and return the processed video
+
+    A base64 JSON body gets a JSON response with the base64 video. A raw video
+    body or multipart ``video`` field is streamed to disk instead, and the
+    processed video is streamed back (with Range support) rather than inlined.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Only POST requests are accepted'}, status=405)
 
+    if is_streamed_upload(request):
+        return _process_streamed_video(request)
+
     try:
         # Parse request body
         data = json.loads(request.body)
@@ -172,6 +298,11 @@ def process_video(request):
         if not base64_video:
             return JsonResponse({'error': 'No video data provided'}, status=400)
 
+        try:
+            video_settings = video_options(data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
         # Create temporary files for input and output videos
         with tempfile.NamedTemporaryFile(suffix=f'.{video_format}', delete=False) as input_video_file:
             input_video_path = input_video_file.name
@@ -179,10 +310,10 @@ def process_video(request):
             video_data = base64.b64decode(base64_video)
             input_video_file.write(video_data)
 
-        output_video_path = input_video_path + f'_processed.{video_format}'
+        output_video_path = input_video_path + f'_processed.{OUTPUT_FORMAT}'
 
         # Process the video with YOLO
-        detections_info = process_with_yolo(input_video_path, output_video_path)
+        detections_info = run_video_detection(input_video_path, output_video_path, video_settings)
 
         # Read the processed video and encode to base64
         with open(output_video_path, 'rb') as f:
@@ -199,85 +330,335 @@ def process_video(request):
         print('We reached here')
         return JsonResponse({
             'video': processed_video_base64,
+            'format': OUTPUT_FORMAT,
             'message': 'Video processed successfully',
             'detections': detections_info
         })
 
+    except ModelUnavailable as e:
+        logger.error("Detection model unavailable: %s", str(e))
+        return JsonResponse({'error': str(e)}, status=503)
+    except ValueError as e:
+        # Malformed JSON or base64, or a file that is not a readable video
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error processing video: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def _process_streamed_video(request):
+    try:
+        video_format = upload_format(request)
+        video_settings = video_options(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    with tempfile.NamedTemporaryFile(suffix=f'.{video_format}', delete=False) as input_video_file:
+        input_video_path = input_video_file.name
+    output_video_path = input_video_path + f'_processed.{OUTPUT_FORMAT}'
+
+    try:
+        save_streamed_upload(request, input_video_path)
+        detections_info = run_video_detection(input_video_path, output_video_path, video_settings)
+    except ModelUnavailable as e:
+        logger.error("Detection model unavailable: %s", str(e))
+        return JsonResponse({'error': str(e)}, status=503)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
+        if os.path.exists(output_video_path):
+            os.unlink(output_video_path)
+        return JsonResponse({'error': str(e)}, status=500)
+    finally:
+        os.unlink(input_video_path)
+
+    # The processed file is deleted once the response has been streamed
+    try:
+        response = ranged_file_response(request, output_video_path, f'video/{OUTPUT_FORMAT}', delete=True)
+    except OSError as e:
+        logger.error(f"Processed video missing: {str(e)}")
+        return JsonResponse({'error': 'Processed video could not be read'}, status=500)
+    response['X-Detection-Count'] = str(len(detections_info))
+    return response
+
+
+@csrf_exempt
+def submit_video_job(request):
+    """
+    Queue a video for background processing and return its job ID right away.
+    Accepts the same bodies as process_video: base64 JSON, a raw video body or
+    a multipart ``video`` file field.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST requests are accepted'}, status=405)
+
+    if is_streamed_upload(request):
+        try:
+            video_format = upload_format(request)
+            video_settings = video_options(request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        def write_input(path):
+            save_streamed_upload(request, path)
+    else:
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+        base64_video = data.get('video')
+        video_format = data.get('format', 'mp4')
+        if not base64_video:
+            return JsonResponse({'error': 'No video data provided'}, status=400)
+        if not video_format.isalnum():
+            return JsonResponse({'error': 'Invalid video format'}, status=400)
+        try:
+            video_settings = video_options(data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        def write_input(path):
+            with open(path, 'wb') as f:
+                f.write(base64.b64decode(base64_video))
+
+    # Refuse now rather than queue a job that can only fail
+    _, error = _get_detector(video_settings['crop'])
+    if error:
+        return error
+
+    try:
+        job = create_video_job(write_input, video_format, options=video_settings)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error creating video job: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
+    return JsonResponse({
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_url': reverse('video_job_status', args=[job.id]),
+        'result_url': reverse('video_job_result', args=[job.id]),
+        'video_url': reverse('video_job_video', args=[job.id]),
+    }, status=202)
+
+
+def video_job_status(request, job_id):
+    job = get_object_or_404(VideoJob, pk=job_id)
+    return JsonResponse({
+        'job_id': str(job.id),
+        'status': job.status,
+        'frame_count': job.frame_count,
+        'total_frames': job.total_frames,
+        'progress': job.progress,
+        'pipeline': job.stats,
+        'error': job.error,
+    })
+
+
+def _finished_job(job_id):
+    """Return ``(job, None)`` for a finished job, or ``(None, error_response)``."""
+    job = get_object_or_404(VideoJob, pk=job_id)
+    if job.status == VideoJob.STATUS_FAILED:
+        return None, JsonResponse({'error': job.error, 'status': job.status}, status=500)
+    if job.status != VideoJob.STATUS_DONE:
+        return None, JsonResponse({'error': 'Job not finished', 'status': job.status, 'progress': job.progress},
+                                  status=409)
+    return job, None
+
+
+def video_job_result(request, job_id):
+    """
+    Detections of a finished job plus the URL of the processed video.
+    ``?inline=1`` also embeds the video as base64, as process_video does.
+    """
+    job, error = _finished_job(job_id)
+    if error:
+        return error
+
+    response_payload = {
+        'message': 'Video processed successfully',
+        'detections': job.detections,
+        'video_url': reverse('video_job_video', args=[job.id]),
+    }
+    if request.GET.get('inline') == '1':
+        try:
+            with open(job.output_path, 'rb') as f:
+                response_payload['video'] = base64.b64encode(f.read()).decode('utf-8')
+        except OSError as e:
+            logger.error(f"Processed video of job {job.id} missing: {str(e)}")
+            return JsonResponse({'error': 'Processed video could not be read'}, status=500)
+    return JsonResponse(response_payload)
+
 
-def process_with_yolo(input_path, output_path):
+def video_job_video(request, job_id):
+    """Processed video of a finished job, streamed with Range support."""
+    job, error = _finished_job(job_id)
+    if error:
+        return error
+    extension = os.path.splitext(job.output_path)[1].lstrip('.') or OUTPUT_FORMAT
+    try:
+        return ranged_file_response(request, job.output_path, f'video/{extension}',
+                                    filename=f'{job.id}.{extension}')
+    except OSError as e:
+        logger.error(f"Processed video of job {job.id} missing: {str(e)}")
+        return JsonResponse({'error': 'Processed video could not be read'}, status=500)
+
+
+def process_with_yolo(input_path, output_path, progress_callback=None, sampling=None,
+                      start_frame=0, end_frame=None, crop=None):
     """
     Process video file with YOLO detection and save the results
+
+    ``progress_callback(frame_count, total_frames, stats)`` is called every 10
+    frames and once more when the video is finished; ``stats`` holds the
+    pipeline's queue depths and per-stage timings (see VideoPipeline.stats).
+    ``sampling`` is a dict of FrameSampler options (mode, stride, target_fps,
+    threshold, metric, max_gap); frames the sampler skips are drawn with the
+    last boxes found. ``start_frame``/``end_frame`` (0-based, end exclusive)
+    restrict processing to one segment of the video; detection frame numbers
+    stay relative to the whole video. ``crop`` picks the model.
+
+    Frames go through the crop's batcher, the only thread that calls the
+    model, so several videos and image requests can share one model safely.
     """
-    if model is None:
-        raise Exception("YOLO model not loaded")
+    detector = registry.get(crop)
 
     # Open the video file
     cap = cv2.VideoCapture(input_path)
     if not cap.isOpened():
-        raise Exception(f"Could not open video file {input_path}")
+        raise ValueError("Could not read the uploaded video")
 
     # Get video properties
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    sampler = FrameSampler(source_fps=fps, **(sampling or {}))
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    if end_frame is not None:
+        total_frames = min(total_frames, end_frame) - start_frame
 
-    logger.info(f"Processing video: {width}x{height} at {fps} FPS, {total_frames} frames")
+    logger.info(f"Processing video: {width}x{height} at {fps} FPS, {total_frames} frames, sampling={sampler.mode}")
 
     # Prepare video writer
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # or 'avc1' for h264
     out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    if not out.isOpened():
+        cap.release()
+        raise RuntimeError(f"Could not create output video {output_path}")
 
     frame_count = 0
+    inferred_count = 0
     detections_info = []
-    while cap.isOpened():
-        success, frame = cap.read()
-        if not success:
-            break
-
-        frame_count += 1
-        if frame_count % 10 == 0:  # Log progress every 10 frames
-            logger.info(f"Processing frame {frame_count}/{total_frames}")
-
-        # Run YOLO detection
-        results = model(frame, stream=True)
-
-        # Draw detections on frame
-        for result in results:
-            for box in result.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-
-                if hasattr(model, 'names') and cls in model.names:
-                    label = f"{model.names[cls]} {conf:.2f}"
-                else:
-                    label = f"Class {cls} {conf:.2f}"
-
-                detections_info.append({
-                    "label": label,
-                    "confidence": conf,
-                    "disease": DISEASE_INFO.get(label, {}).get("medicine", ""),
-                    "coordinates": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
-                })
-
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(frame, label, (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-        # Write the processed frame to output video
-        out.write(frame)
-
-    # Release resources
-    cap.release()
-    out.release()
-    logger.info(f"Video processing complete: {frame_count} frames processed")
+    # Boxes and labels of the last inferred frame, redrawn on skipped frames
+    last_boxes, last_labels = [], []
+    start_time = time.perf_counter()
+    # Decode and encode run on their own threads; this loop is the inference stage
+    try:
+        with VideoPipeline(cap, out, queue_size=getattr(settings, "VIDEO_PIPELINE_QUEUE_SIZE", 8),
+                           start_index=start_frame,
+                           max_frames=None if end_frame is None else end_frame - start_frame) as pipeline:
+            for index, frame in pipeline.frames():
+                frame_count += 1
+                if frame_count % 10 == 0:  # Log progress every 10 frames
+                    logger.info(f"Processing frame {frame_count}/{total_frames}")
+                    if progress_callback is not None:
+                        progress_callback(frame_count, total_frames, pipeline.stats())
+
+                if sampler.should_infer(index, frame):
+                    inferred_count += 1
+                    last_boxes, last_labels = [], []
+
+                    # Run YOLO detection
+                    result = detector.batcher.submit(frame)
+
+                    for (x1, y1, x2, y2), conf, _, name, medicine in postprocess(result, detector.names).rows():
+                        label = f"{name} {conf:.2f}"
+                        detections_info.append({
+                            "frame": index + 1,
+                            "label": label,
+                            "confidence": conf,
+                            "disease": medicine,
+                            "coordinates": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
+                        })
+                        last_boxes.append((x1, y1, x2, y2))
+                        last_labels.append(label)
+
+                # Draw detections on frame
+                draw_boxes(frame, last_boxes, last_labels)
+
+                # Hand the processed frame to the encode stage
+                pipeline.write(frame)
+    finally:
+        # Release resources
+        cap.release()
+        out.release()
+
+    elapsed = time.perf_counter() - start_time
+    stats = pipeline.stats()
+    logger.info(f"Video processing complete: {frame_count} frames processed, {inferred_count} inferred "
+                f"({sampler.mode}) in {elapsed:.1f}s, {frame_count / max(elapsed, 1e-9):.1f} frames/sec")
+    logger.info("Pipeline stages (ms/frame): %s, bottleneck: %s",
+                stats["stages_ms_per_frame"], stats["bottleneck"])
+    if progress_callback is not None:
+        progress_callback(frame_count, frame_count, stats)
     return detections_info
 
 
+def video_options(source):
+    """
+    Video processing options from request fields (JSON body, query string or
+    form). FrameSampler options come from ``sampling``, ``stride``,
+    ``target_fps``, ``scene_threshold``, ``scene_metric`` and ``max_gap``;
+    ``workers`` > 1 splits the video across that many processes; ``crop``
+    picks the model. Raises ValueError on bad input.
+    """
+    fields = {
+        'sampling': ('mode', str),
+        'stride': ('stride', int),
+        'target_fps': ('target_fps', float),
+        'scene_threshold': ('threshold', float),
+        'scene_metric': ('metric', str),
+        'max_gap': ('max_gap', int),
+    }
+    sampling = {}
+    for field, (name, cast) in fields.items():
+        value = source.get(field)
+        if value not in (None, ''):
+            try:
+                sampling[name] = cast(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid value for {field}: {value}")
+    # Validate now rather than inside a background job
+    FrameSampler(**sampling)
+
+    workers = source.get('workers') or getattr(settings, "VIDEO_SHARD_WORKERS", 1)
+    try:
+        workers = int(workers)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value for workers: {workers}")
+    max_workers = getattr(settings, "VIDEO_SHARD_MAX_WORKERS", os.cpu_count() or 1)
+    if not 1 <= workers <= max_workers:
+        raise ValueError(f"workers must be between 1 and {max_workers}")
+    # Resolved now, so a queued job keeps its crop even if the default changes
+    crop = registry.resolve(source.get('crop'))
+    return {'sampling': sampling, 'workers': workers, 'crop': crop}
+
+
+def run_video_detection(input_path, output_path, options=None, progress_callback=None):
+    """Run process_with_yolo in-process, or sharded across worker processes when ``workers`` > 1."""
+    options = options or {}
+    workers = options.get('workers', 1)
+    if workers > 1:
+        return process_video_sharded(input_path, output_path, workers=workers, sampling=options.get('sampling'),
+                                     progress_callback=progress_callback, crop=options.get('crop'))
+    return process_with_yolo(input_path, output_path, progress_callback=progress_callback,
+                             sampling=options.get('sampling'), crop=options.get('crop'))
+
+
 def index(request):
     return render(request, 'index.html')
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from drone.models import Detection
+
+
+@admin.register(Detection)
+class DetectionAdmin(admin.ModelAdmin):
+    list_display = ("disease", "confidence", "latitude", "longitude", "source", "detected_at")
+    list_filter = ("disease", "source")
+    readonly_fields = ("cell_y", "cell_x")
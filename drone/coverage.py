@@ -0,0 +1,118 @@
+from typing import NamedTuple
+
+import numpy as np
+from scipy.spatial import ConvexHull, QhullError
+
+from drone.planning import from_local_xy, haversine_m, local_xy
+
+
+class CoveragePlan(NamedTuple):
+    """A boustrophedon (lawnmower) spray/survey path over a field."""
+    waypoints: np.ndarray     # (2 * segments, 2) lat/lon: entry and exit of every spray segment, in flight order
+    passes: int               # parallel sweep lines
+    segments: int             # spray segments (more than passes where a concave field splits a line)
+    sweep_bearing_deg: float  # compass bearing of the sweep lines, 0-180
+    spacing_m: float          # distance between neighbouring lines, at most the swath width
+    path_length_m: float
+    spray_length_m: float
+    turns: int
+    flight_time_s: float
+    area_m2: float
+
+
+def _ring(polygon):
+    ring = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    if len(ring) < 3:
+        raise ValueError("A field needs at least 3 corners")
+    return ring
+
+
+def sweep_angle(xy):
+    """
+    Direction (radians from east) of sweep lines needing the fewest passes:
+    along the convex hull edge across which the polygon is narrowest, as
+    the minimum width is always attained parallel to a hull edge. A concave
+    polygon's own edges need not include those (the hull may bridge a notch).
+    """
+    try:
+        hull = xy[ConvexHull(xy).vertices]
+    except QhullError:
+        # All corners on one line: any of its edges will do
+        hull = xy
+    edges = np.roll(hull, -1, axis=0) - hull
+    edges = edges[np.hypot(edges[:, 0], edges[:, 1]) > 0]
+    angles = np.arctan2(edges[:, 1], edges[:, 0])
+    normals = np.column_stack([-np.sin(angles), np.cos(angles)])
+    widths = np.ptp(xy @ normals.T, axis=0)
+    return float(angles[np.argmin(widths)])
+
+
+def plan_coverage(polygon, swath_m, speed_mps=5.0, turn_s=0.0, angle=None):
+    """
+    Lawnmower path covering ``polygon`` (``[[lat, lng], ...]``, open or
+    closed) with parallel passes ``swath_m`` apart or less, alternating
+    direction. The sweep direction minimises the number of passes, hence
+    turns, unless ``angle`` (radians from east) is given. Every sweep line
+    is cut against all polygon edges at once, so a field with thousands of
+    passes plans in milliseconds. Flight time is the path at ``speed_mps``
+    plus ``turn_s`` per turn.
+    """
+    if swath_m <= 0 or speed_mps <= 0:
+        raise ValueError("Swath width and speed must be positive")
+    ring = _ring(polygon)
+    origin = ring.mean(axis=0)
+    xy = local_xy(ring, origin)
+    area = 0.5 * abs(np.dot(xy[:, 0], np.roll(xy[:, 1], -1)) - np.dot(xy[:, 1], np.roll(xy[:, 0], -1)))
+
+    theta = sweep_angle(xy) if angle is None else float(angle)
+    cos, sin = np.cos(theta), np.sin(theta)
+    # Rotate so the sweep lines run along x
+    rotated = np.column_stack([xy[:, 0] * cos + xy[:, 1] * sin, -xy[:, 0] * sin + xy[:, 1] * cos])
+    y_min, y_max = rotated[:, 1].min(), rotated[:, 1].max()
+    passes = max(1, int(np.ceil((y_max - y_min) / swath_m - 1e-9)))
+    spacing = (y_max - y_min) / passes
+    lines = y_min + spacing * (np.arange(passes) + 0.5)
+
+    # Crossings of every line with every edge, (passes, edges)
+    x1, y1 = rotated[:, 0], rotated[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    c = lines[:, None]
+    crosses = ((y1 <= c) & (c < y2)) | ((y2 <= c) & (c < y1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.where(crosses, x1 + (c - y1) * (x2 - x1) / (y2 - y1), np.nan)
+    x.sort(axis=1)
+    # Inside intervals are consecutive pairs of crossings
+    pairs = int(crosses.sum(axis=1).max()) // 2
+    starts, ends = x[:, 0:2 * pairs:2], x[:, 1:2 * pairs:2]
+    valid = np.isfinite(starts) & np.isfinite(ends)
+    rows = np.broadcast_to(np.arange(passes)[:, None], starts.shape)
+    # Boustrophedon: odd lines are flown backwards, their intervals in reverse order
+    odd = rows % 2 == 1
+    entry = np.where(odd, ends, starts)[valid]
+    exit_ = np.where(odd, starts, ends)[valid]
+    order = np.lexsort((np.where(odd, -starts, starts)[valid], rows[valid]))
+    entry, exit_, line_y = entry[order], exit_[order], lines[rows[valid][order]]
+
+    flown = np.empty((2 * len(entry), 2))
+    flown[0::2, 0], flown[1::2, 0] = entry, exit_
+    flown[0::2, 1] = flown[1::2, 1] = line_y
+    back = np.column_stack([flown[:, 0] * cos - flown[:, 1] * sin, flown[:, 0] * sin + flown[:, 1] * cos])
+    waypoints = from_local_xy(back, origin)
+
+    legs = haversine_m(waypoints[:-1, 0], waypoints[:-1, 1], waypoints[1:, 0], waypoints[1:, 1])
+    path_length = float(legs.sum())
+    turns = max(len(entry) - 1, 0)
+    return CoveragePlan(
+        waypoints=waypoints,
+        passes=passes,
+        segments=len(entry),
+        sweep_bearing_deg=float((90.0 - np.degrees(theta)) % 180.0),
+        spacing_m=float(spacing),
+        path_length_m=path_length,
+        spray_length_m=float(legs[0::2].sum()),
+        turns=turns,
+        flight_time_s=path_length / speed_mps + turns * turn_s,
+        area_m2=float(area),
+    )
@@ -1,22 +1,25 @@
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
 import cv2
-import folium
+import requests
 from pymavlink import mavutil
 from ultralytics import YOLO
 
-# Dictionary to store disease classes, corresponding colors, and medicines
-DISEASE_INFO = {
-    "Black Fungus Pod": {"color": "black", "medicine": "Mancozeb or Carbendazim"},
-    "Early and Late leaf spot": {"color": "blue", "medicine": "Chlorothalonil or Propiconazole"},
-    "Fungus leaf": {"color": "green", "medicine": "Copper Oxychloride"},
-    "Rust-Leaf": {"color": "orange", "medicine": "Hexaconazole or Sulphur"},
-    "black fungus-groundnut": {"color": "gray", "medicine": "Carbendazim or Thiophanate-methyl"},
-    "brown Fungus Pod": {"color": "brown", "medicine": "Mancozeb or Chlorothalonil"},
-    "bakteri_daun_bergaris": {"color": "yellow", "medicine": "Streptomycin or Copper Hydroxide"},
-    "bercak_coklat": {"color": "red", "medicine": "Propiconazole or Mancozeb"},
-    "bercak_coklat_sempit": {"color": "purple", "medicine": "Carbendazim or Propiconazole"},
-    "hawar_daun_bakteri": {"color": "cyan", "medicine": "Copper Oxychloride or Streptomycin"},
-    "tungro": {"color": "pink", "medicine": "Buprofezin or Imidacloprid"}
-}
+if __package__ in (None, ""):
+    # Run as a plain script: make the repository root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from detect.engine import DISEASE_INFO, LIVE_THRESHOLD, annotate_frame, postprocess  # noqa: E402
+from drone.feeds import FeatureWriter, feed_path  # noqa: E402
+
+# Detection store the map pages query (drone.views.detections); set DETECTIONS_URL="" to only write the feed
+DETECTIONS_URL = os.environ.get("DETECTIONS_URL", "http://127.0.0.1:8000/detections")
+UPLOAD_BATCH_SIZE = 20
 
 
 def get_gps_coordinates(connection):
@@ -29,56 +32,77 @@ def get_gps_coordinates(connection):
     return None, None
 
 
-def add_marker_to_map(map_obj, lat, lon, disease, color):
-    """Add a marker to the map"""
-    medicine = DISEASE_INFO[disease]["medicine"]
-    popup_text = f"Disease: {disease}<br>Medicine: {medicine}"
-    folium.Marker(
-        location=[lat, lon],
-        popup=popup_text,
-        icon=folium.Icon(color=color)
-    ).add_to(map_obj)
+def write_feature(feed, lat, lon, disease, confidence):
+    """Append a detection to the feed"""
+    feed.write(lat, lon, disease=disease, confidence=confidence,
+               medicine=DISEASE_INFO[disease]["medicine"], color=DISEASE_INFO[disease]["color"])
+
+
+def upload_detections(detections, source):
+    """POST detections to the detection store; returns False (keep them for the next try) on failure"""
+    if not DETECTIONS_URL or not detections:
+        return True
+    try:
+        response = requests.post(DETECTIONS_URL, json={"detections": detections, "source": source}, timeout=5)
+        response.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        print(f"Could not upload {len(detections)} detections: {e}")
+        return False
+
+
+class DetectionUploader:
+    """
+    Sends batches of detections to the detection store from a background
+    thread, so a slow or unreachable server never holds up the video. A
+    batch that fails is kept and sent again with the next one.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.batches = queue.Queue()
+        self.unsent = []
+        self.thread = threading.Thread(target=self._run, name="detection-upload", daemon=True)
+        self.thread.start()
+
+    def add(self, detections):
+        if DETECTIONS_URL and detections:
+            self.batches.put(list(detections))
+
+    def _run(self):
+        while True:
+            batch = self.batches.get()
+            if batch is not None:
+                self.unsent.extend(batch)
+            if upload_detections(self.unsent, self.source):
+                self.unsent = []
+            if batch is None:
+                return
+
+    def close(self, timeout=30):
+        """Send what is left; returns True if every detection reached the store."""
+        self.batches.put(None)
+        self.thread.join(timeout)
+        return not self.thread.is_alive() and not self.unsent
 
 
 def process_detection(results, frame):
     """Process YOLO detection results"""
-    detected = []
     try:
-        # Create a copy of the frame for annotations
-        annotated_frame = frame.copy()
-
-        # Get all detections
-        for result in results[0].boxes:
-            # Extract class ID and confidence
-            class_id = int(result.cls.item())
-            confidence = float(result.conf.item())
-
-            # Get disease name from model's names dictionary
-            disease = results[0].names[class_id]
-
-            # Only process detections with confidence > 0.7 (70%)
-            if disease in DISEASE_INFO and confidence > 0.7:
-                detected.append({
-                    "disease": disease,
-                    "confidence": confidence
-                })
-
-                # Draw only high-confidence detections
-                box = result.xyxy[0].cpu().numpy()  # Get box coordinates
-                x1, y1, x2, y2 = map(int, box[:4])
-                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(annotated_frame, f"{disease} {confidence:.2f}",
-                            (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-        return detected, annotated_frame
+        # Draw only detections of known diseases above the live threshold
+        detections = postprocess(results[0], min_confidence=LIVE_THRESHOLD, known_only=True)
+        detected = [{"disease": disease, "confidence": confidence}
+                    for disease, confidence in zip(detections.labels.tolist(), detections.scores.tolist())]
+        return detected, annotate_frame(frame, detections)
     except Exception as e:
         print(f"Error processing detection: {e}")
         return [], frame
 
 
 def main():
-    # Create a map object
-    map_obj = folium.Map(location=[0, 0], zoom_start=2)  # Initial map at (0, 0)
+    source = datetime.now().strftime("flight-%Y%m%d-%H%M%S")
+    # Detections are appended to a GeoJSON feed as they happen; the /mapped page follows it during the flight
+    feed = FeatureWriter(feed_path(source))
 
     try:
         # Connect to Mission Planner
@@ -102,7 +126,11 @@ def main():
             raise Exception("Could not open webcam")
 
         print("Starting live detection. Press 'q' to exit.")
-        detected_diseases = []
+        # Per disease: detections and best confidence, for the summary (the feed has every detection)
+        summary = {}
+        # Not yet handed to the uploader; sent in batches
+        pending_upload = []
+        uploader = DetectionUploader(source)
 
         while True:
             ret, frame = cap.read()
@@ -128,39 +156,43 @@ def main():
                 if lat is not None and lon is not None:
                     print(f"Detected {disease} at GPS: ({lat}, {lon}) with confidence: {detection['confidence']:.2f}")
 
-                    # Add marker to map
-                    color = DISEASE_INFO[disease]["color"]
-                    add_marker_to_map(map_obj, lat, lon, disease, color)
+                    # Add to the feed
+                    write_feature(feed, lat, lon, disease, detection["confidence"])
 
-                    # Add to detected diseases list
-                    detected_diseases.append({
+                    count, best = summary.get(disease, (0, 0.0))
+                    summary[disease] = (count + 1, max(best, detection["confidence"]))
+                    pending_upload.append({
                         "disease": disease,
                         "lat": lat,
                         "lon": lon,
-                        "confidence": detection["confidence"]
+                        "confidence": detection["confidence"],
+                        "detected_at": datetime.now(timezone.utc).isoformat(),
                     })
 
+            if len(pending_upload) >= UPLOAD_BATCH_SIZE:
+                uploader.add(pending_upload)
+                pending_upload = []
+
             # Exit on pressing 'q'
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
-        # Save the map to an HTML file
-        map_path = "detection_map.html"
-        map_obj.save(map_path)
-        print(f"\nMap saved as {map_path}. Open this file to view detections.")
+        uploader.add(pending_upload)
+        if uploader.close() and DETECTIONS_URL:
+            print(f"Detections stored at {DETECTIONS_URL} as {source}")
+        elif uploader.unsent:
+            print(f"{len(uploader.unsent)} detections could not be stored; they are still in the feed")
+
+        print(f"\n{feed.written} detections written to {feed.path}")
 
         # Print medicines for detected diseases
-        if detected_diseases:
+        if summary:
             print("\nDetected Diseases and Recommended Medicines (>70% confidence):")
-            for detection in detected_diseases:
-                disease = detection["disease"]
-                lat = detection["lat"]
-                lon = detection["lon"]
-                confidence = detection["confidence"]
+            for disease, (count, best) in summary.items():
                 medicine = DISEASE_INFO[disease]["medicine"]
                 print(f"\nDisease: {disease}")
-                print(f"Location: ({lat}, {lon})")
-                print(f"Confidence: {confidence:.2f}")
+                print(f"Detections: {count}")
+                print(f"Best confidence: {best:.2f}")
                 print(f"Recommended Medicine: {medicine}")
         else:
             print("\nNo detections with confidence > 70% were found.")
@@ -170,6 +202,7 @@ def main():
 
     finally:
         # Release resources
+        feed.close()
         if 'cap' in locals():
             cap.release()
         cv2.destroyAllWindows()
@@ -0,0 +1,114 @@
+import json
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Where feeds live unless DRONE_FEED_DIR (the setting, or the environment variable it is read from) says otherwise
+DEFAULT_FEED_DIR = Path(__file__).resolve().parents[1] / "detection_feeds"
+FEED_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+FEED_SUFFIX = ".ndjson"
+
+
+def feed_directory():
+    """
+    The ``DRONE_FEED_DIR`` setting in the web app; the detection scripts run
+    without Django settings and read the environment variable of the same
+    name, which the setting defaults to, so both sides agree.
+    """
+    from django.conf import settings
+    if settings.configured:
+        return Path(getattr(settings, "DRONE_FEED_DIR", DEFAULT_FEED_DIR))
+    return Path(os.environ.get("DRONE_FEED_DIR") or DEFAULT_FEED_DIR)
+
+
+def feed_path(name, directory=None):
+    """Path of the feed ``name`` (letters, digits, ``-`` and ``_``); raises ValueError for other names."""
+    if not FEED_NAME.match(name or ""):
+        raise ValueError("Feed names are 1-64 letters, digits, - and _")
+    return Path(directory or feed_directory()) / f"{name}{FEED_SUFFIX}"
+
+
+def detection_feature(latitude, longitude, **properties):
+    """GeoJSON Point feature (GeoJSON orders coordinates longitude first)."""
+    properties.setdefault("time", datetime.now(timezone.utc).isoformat())
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+        "properties": properties,
+    }
+
+
+class FeatureWriter:
+    """
+    Appends GeoJSON features to an NDJSON file, one per line, each flushed
+    as it is written: nothing is held in memory, a crash loses at most the
+    feature being written, and the file can be read (:func:`read_features`)
+    while the run is still going.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.written = 0
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, latitude, longitude, **properties):
+        line = json.dumps(detection_feature(latitude, longitude, **properties), separators=(",", ":"))
+        # One write call per line, so a reader never sees two features interleaved
+        self._file.write(line + "\n")
+        self._file.flush()
+        self.written += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_features(path, cursor=0, limit=1000):
+    """
+    ``(features, next_cursor)``: up to ``limit`` features from the byte
+    offset ``cursor`` of an NDJSON feed (0 for the start). Pass the returned
+    cursor to get only what was appended since; a line still being written
+    is left for the next call. A cursor past the end of the file (it was
+    replaced) starts again from 0. Raises ValueError for a cursor that is
+    not at the start of a line.
+    """
+    features = []
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if cursor > size:
+            cursor = 0
+        if cursor:
+            f.seek(cursor - 1)
+            if f.read(1) != b"\n":
+                raise ValueError("since must be a cursor returned by an earlier request")
+        f.seek(cursor)
+        while len(features) < limit:
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                break
+            cursor += len(line)
+            if line.strip():
+                features.append(json.loads(line))
+    return features, cursor
+
+
+def export_feature_collection(path, destination):
+    """Write an NDJSON feed out as one GeoJSON FeatureCollection file, a line at a time; returns the feature count."""
+    count = 0
+    with open(path, "r", encoding="utf-8") as source, open(destination, "w", encoding="utf-8") as out:
+        out.write('{"type":"FeatureCollection","features":[')
+        for line in source:
+            # Skips blank lines and a last line still being written
+            if not line.strip() or not line.endswith("\n"):
+                continue
+            out.write(("," if count else "") + "\n" + line.rstrip("\n"))
+            count += 1
+        out.write("\n]}\n")
+    return count
@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from scipy.spatial import ConvexHull
+
+from drone.coverage import plan_coverage
+from drone.planning import from_local_xy
+
+CENTRE = (16.4913, 80.4963)
+
+
+def random_field(size_m, rng, corners=40):
+    """Convex field about ``size_m`` across at a random orientation, as lat/lon."""
+    xy = rng.uniform(-size_m / 2, size_m / 2, (corners * 4, 2)) * (1.0, 0.6)
+    angle = rng.uniform(0, np.pi)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    xy = xy @ rotation.T
+    return from_local_xy(xy[ConvexHull(xy).vertices], CENTRE)
+
+
+def l_shaped_field(size_m):
+    """Concave L-shaped field, so some sweep lines are split in two."""
+    xy = np.array([[0, 0], [size_m, 0], [size_m, size_m / 3], [size_m / 3, size_m / 3], [size_m / 3, size_m],
+                   [0, size_m]], dtype=np.float64)
+    return from_local_xy(xy - size_m / 2, CENTRE)
+
+
+class Command(BaseCommand):
+    help = "Lawnmower coverage planning time against the number of passes"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=float, nargs="+", default=[100, 1000, 5000, 20000, 50000],
+                            help="Field sizes in metres")
+        parser.add_argument("--swath", type=float, default=5.0)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        self.stdout.write(f"swath {options['swath']} m")
+        self.stdout.write(f"{'field':>7} {'size m':>7} {'passes':>7} {'segments':>8} {'ms':>8} {'path km':>9} "
+                          f"{'bearing':>7}")
+        for size in options["sizes"]:
+            for name, field in (("convex", random_field(size, rng)), ("L-shape", l_shaped_field(size))):
+                timings = []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    plan = plan_coverage(field, options["swath"])
+                    timings.append(time.perf_counter() - start)
+                self.stdout.write(f"{name:>7} {size:>7.0f} {plan.passes:>7} {plan.segments:>8} "
+                                  f"{min(timings) * 1000:>8.2f} {plan.path_length_m / 1000:>9.1f} "
+                                  f"{plan.sweep_bearing_deg:>7.1f}")
@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+
+from detect.engine import DISEASE_INFO
+from drone.models import Detection
+from drone.views import detection_grid, detections, detections_near
+
+CENTRE = (16.4913, 80.4963)
+
+
+def use_database(path):
+    """Point the default connection at the SQLite file ``path`` and create the drone tables in it."""
+    connection = connections["default"]
+    connection.close()
+    connection.settings_dict["NAME"] = path
+    call_command("migrate", "drone", verbosity=0)
+    return connection
+
+
+def fill_detections(rows, spread_km, seed=0):
+    """Top the table up to ``rows`` random detections in a ``spread_km`` square around CENTRE; returns the count added."""
+    missing = rows - Detection.objects.count()
+    if missing <= 0:
+        return 0
+    rng = np.random.default_rng(seed)
+    half = spread_km * 1000 / 2 / 111320
+    diseases = list(DISEASE_INFO)
+    for offset in range(0, missing, 100000):
+        count = min(100000, missing - offset)
+        lat = CENTRE[0] + rng.uniform(-half, half, count)
+        lon = CENTRE[1] + rng.uniform(-half, half, count)
+        kinds = rng.integers(0, len(diseases), count)
+        Detection.objects.bulk_create(
+            [Detection(disease=diseases[k], confidence=0.8, latitude=a, longitude=b, source="bench").set_cell()
+             for a, b, k in zip(lat.tolist(), lon.tolist(), kinds.tolist())], batch_size=5000)
+    return missing
+
+
+class Command(BaseCommand):
+    help = ("Viewport, radius and grid-count queries over a large detection table, indexed by grid cell vs. "
+            "a plain lat/lon filter, on a throwaway SQLite database")
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000)
+        parser.add_argument("--spread-km", type=float, default=50.0, help="Side of the square the rows cover")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--database", help="SQLite file to use (default: a temporary one, removed afterwards)")
+
+    def handle(self, *args, **options):
+        path = options["database"] or os.path.join(tempfile.mkdtemp(), "bench_detections.sqlite3")
+        connection = use_database(path)
+        try:
+            start = time.perf_counter()
+            inserted = fill_detections(options["rows"], options["spread_km"])
+            if inserted:
+                self.stdout.write(f"Inserted {inserted} rows in {time.perf_counter() - start:.1f} s")
+            self.stdout.write(f"{Detection.objects.count()} detections over {options['spread_km']:.0f} km")
+            self._queries(options["repeat"])
+        finally:
+            connection.close()
+            if not options["database"]:
+                os.remove(path)
+
+    def _time(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return result, float(np.median(timings))
+
+    def _queries(self, repeat):
+        factory = RequestFactory()
+        lat, lon = CENTRE
+        # A field-scale map viewport (about 1 km) and a wider one (about 5 km)
+        boxes = [("viewport 1 km", 0.0045), ("viewport 5 km", 0.0225)]
+        self.stdout.write(f"{'query':>16} {'rows':>7} {'indexed ms':>10} {'endpoint ms':>11} {'unindexed ms':>12}")
+        for name, half in boxes:
+            south, west, north, east = lat - half, lon - half, lat + half, lon + half
+            count, indexed = self._time(lambda: Detection.objects.in_bbox(south, west, north, east).count(), repeat)
+            _, unindexed = self._time(lambda: Detection.objects.filter(
+                latitude__range=(south, north), longitude__range=(west, east)).count(), repeat)
+            request = factory.get("/detections", {"bbox": f"{west},{south},{east},{north}"})
+            _, endpoint = self._time(lambda: detections(request), repeat)
+            self.stdout.write(f"{name:>16} {count:>7} {indexed:>10.1f} {endpoint:>11.1f} {unindexed:>12.1f}")
+
+        request = factory.get("/detections/near", {"lat": lat, "lon": lon, "radius_m": 200})
+        response, endpoint = self._time(lambda: detections_near(request), repeat)
+        found = len(json.loads(response.content)["detections"])
+        self.stdout.write(f"{'within 200 m':>16} {found:>7} {'':>10} {endpoint:>11.1f}")
+
+        half = 0.0225
+        request = factory.get("/detections/grid", {"bbox": f"{lon - half},{lat - half},{lon + half},{lat + half}",
+                                                   "cell_deg": 0.005})
+        response, endpoint = self._time(lambda: detection_grid(request), repeat)
+        cells = len(json.loads(response.content)["cells"])
+        self.stdout.write(f"{'grid counts 5km':>16} {cells:>7} {'':>10} {endpoint:>11.1f}   ({cells} cells of 0.005 deg)")
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from detect.engine import DISEASE_INFO
+from drone.feeds import FeatureWriter, read_features
+
+
+def detections(count, rng):
+    diseases = list(DISEASE_INFO)
+    lat = 16.4913 + rng.uniform(-0.005, 0.005, count)
+    lon = 80.4963 + rng.uniform(-0.005, 0.005, count)
+    return [(a, b, diseases[k]) for a, b, k in zip(lat.tolist(), lon.tolist(), rng.integers(0, len(diseases), count))]
+
+
+class Command(BaseCommand):
+    help = ("Writing a run's detections as a folium HTML map (the previous output) vs. appending to a GeoJSON "
+            "feed: time, peak memory, and the cost for a map to catch up with the latest features")
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--detections", type=int, nargs="+", default=[1000, 5000, 20000])
+        parser.add_argument("--tail", type=int, default=100, help="Features a polling map fetches per request")
+
+    def _measure(self, function):
+        """Seconds for ``function``, then its peak traced memory in MB from a second run (tracing slows it down)."""
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak / 2 ** 20
+
+    def _best_ms(self, function, repeat=5):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        try:
+            import folium
+        except ImportError:
+            folium = None
+            self.stdout.write("folium is not installed; only the feed is measured")
+        rng = np.random.default_rng(0)
+        directory = tempfile.mkdtemp()
+        tail_header = f"last {options['tail']} ms"
+        self.stdout.write(f"{'detections':>10} {'output':>7} {'write s':>8} {'peak MB':>8} {'file MB':>8} "
+                          f"{'first visible':>13} {tail_header:>12} {'full read ms':>12}")
+        for count in options["detections"]:
+            rows = detections(count, rng)
+            if folium is not None:
+                path = os.path.join(directory, f"map-{count}.html")
+
+                def write_folium():
+                    map_obj = folium.Map(location=[16.4913, 80.4963], zoom_start=15)
+                    for lat, lon, disease in rows:
+                        folium.Marker(location=[lat, lon], popup=f"Disease: {disease}",
+                                      icon=folium.Icon(color=DISEASE_INFO[disease]["color"])).add_to(map_obj)
+                    map_obj.save(path)
+
+                elapsed, peak = self._measure(write_folium)
+                self.stdout.write(f"{count:>10} {'folium':>7} {elapsed:>8.2f} {peak:>8.1f} "
+                                  f"{os.path.getsize(path) / 2 ** 20:>8.1f} {'at exit':>13} {'-':>12} {'-':>12}")
+
+            path = os.path.join(directory, f"feed-{count}.ndjson")
+
+            def write_feed():
+                if os.path.exists(path):
+                    os.remove(path)
+                with FeatureWriter(path) as feed:
+                    for lat, lon, disease in rows:
+                        feed.write(lat, lon, disease=disease, confidence=0.9,
+                                   medicine=DISEASE_INFO[disease]["medicine"], color=DISEASE_INFO[disease]["color"])
+
+            elapsed, peak = self._measure(write_feed)
+            size = os.path.getsize(path)
+            # A map that is one poll behind reads from the cursor of the features it already has
+            _, cursor = read_features(path, 0, count - options["tail"])
+            tail_ms = self._best_ms(lambda: read_features(path, cursor, options["tail"]))
+            full_ms = self._best_ms(lambda: read_features(path, 0, count))
+            self.stdout.write(f"{count:>10} {'feed':>7} {elapsed:>8.2f} {peak:>8.2f} {size / 2 ** 20:>8.1f} "
+                              f"{'per feature':>13} {tail_ms:>12.2f} {full_ms:>12.1f}")
+            os.remove(path)
@@ -0,0 +1,87 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from scipy.spatial import ConvexHull
+
+from drone.planning import from_local_xy, local_xy
+from drone.utils import enclosed_region
+
+CENTRE = (16.4913, 80.4963)
+# U-shaped field (metres): a convex hull sprays the 120 m x 200 m inlet as well
+FIELD = np.array([[0, 0], [400, 0], [400, 300], [280, 300], [280, 100], [120, 100], [120, 300], [0, 300]],
+                 dtype=np.float64)
+FIELD_AREA_M2 = 400 * 300 - 160 * 200
+
+
+def legacy_enclosed_region(coordinates):
+    """The previous implementation: ConvexHull straight on the lat/lon list."""
+    hull = ConvexHull(coordinates)
+    enclosed_region = [coordinates[i] for i in hull.vertices]
+    enclosed_region.append(enclosed_region[0])
+    return enclosed_region
+
+
+def gps_trace(count, rng):
+    """``count`` fixes inside the field, each logged three times as a hovering GPS would."""
+    fixes = []
+    while sum(len(f) for f in fixes) < count // 3 + 1:
+        xy = rng.uniform((0, 0), (400, 300), (count, 2))
+        outside_inlet = ~((xy[:, 0] > 120) & (xy[:, 0] < 280) & (xy[:, 1] > 100))
+        fixes.append(xy[outside_inlet])
+    xy = np.concatenate(fixes)[:count // 3 + 1]
+    return np.repeat(from_local_xy(xy, CENTRE), 3, axis=0)[:count].tolist()
+
+
+def area_m2(polygon):
+    xy = local_xy(np.asarray(polygon)[:-1], CENTRE)
+    return 0.5 * abs(np.dot(xy[:, 0], np.roll(xy[:, 1], -1)) - np.dot(xy[:, 1], np.roll(xy[:, 0], -1)))
+
+
+class Command(BaseCommand):
+    help = "Enclosed-region time and sprayed area against GPS trace size: previous convex hull vs. new hulls"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, nargs="+", default=[1000, 10000, 100000, 500000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def _time(self, function, body):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = function(json.loads(body))
+            timings.append(time.perf_counter() - start)
+        return result, min(timings) * 1000
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        rng = np.random.default_rng(0)
+        self.stdout.write(f"U-shaped field of {FIELD_AREA_M2 / 10000:.1f} ha; times include parsing the JSON body")
+        self.stdout.write(f"{'points':>7} {'method':>8} {'ms':>8} {'corners':>7} {'area ha':>8} {'over-spray':>10}")
+        for count in options["points"]:
+            body = json.dumps(gps_trace(count, rng))
+            methods = (
+                ("previous", legacy_enclosed_region),
+                ("convex", lambda c: enclosed_region(c).polygon),
+                ("concave", lambda c: enclosed_region(c, mode="concave").polygon),
+            )
+            for name, function in methods:
+                polygon, ms = self._time(function, body)
+                area = area_m2(polygon)
+                self.stdout.write(f"{count:>7} {name:>8} {ms:>8.1f} {len(polygon) - 1:>7} {area / 10000:>8.2f} "
+                                  f"{(area - FIELD_AREA_M2) / FIELD_AREA_M2:>10.1%}")
+
+        collinear = [[16.49, 80.49 + i * 1e-4] for i in range(5)]
+        try:
+            legacy_enclosed_region(collinear)
+            legacy = "ok"
+        except Exception as e:
+            legacy = type(e).__name__
+        try:
+            enclosed_region(collinear)
+            current = "ok"
+        except ValueError as e:
+            current = f"ValueError: {e}"
+        self.stdout.write(f"collinear points: previous -> {legacy}; now -> {current}")
@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from scipy.sparse.csgraph import minimum_spanning_tree
+
+from drone.planning import haversine_m, plan_survey
+
+# VIT-AP campus, where the survey scripts place their detections
+CENTRE = (16.4819, 80.5083)
+
+
+def random_points(count, rng, spread_deg=0.01):
+    return np.column_stack([CENTRE[0] + rng.uniform(-spread_deg, spread_deg, count),
+                            CENTRE[1] + rng.uniform(-spread_deg, spread_deg, count)])
+
+
+def dense_mst_length(points):
+    """MST over the full pairwise distance matrix, the O(n^2) baseline."""
+    distances = haversine_m(points[:, None, 0], points[:, None, 1], points[None, :, 0], points[None, :, 1])
+    return float(minimum_spanning_tree(distances).sum())
+
+
+class Command(BaseCommand):
+    help = "Survey planning time (Delaunay MST + visiting path) against point count, vs. a dense O(n^2) MST"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, nargs="+", default=[100, 1000, 5000, 20000, 100000])
+        parser.add_argument("--dense-max", type=int, default=5000,
+                            help="Largest point count to also run the dense baseline on")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        self.stdout.write(f"{'points':>7} {'plan ms':>9} {'dense ms':>9} {'MST km':>8} {'same MST':>8} "
+                          f"{'path km':>8} {'path/MST':>8}")
+        for count in options["points"]:
+            points = random_points(count, rng)
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                plan = plan_survey(points, start=CENTRE)
+                timings.append(time.perf_counter() - start)
+
+            dense_ms, same = "-", "-"
+            if count <= options["dense_max"]:
+                start = time.perf_counter()
+                dense_length = dense_mst_length(plan.points)
+                dense_ms = f"{(time.perf_counter() - start) * 1000:.0f}"
+                same = "yes" if np.isclose(dense_length, plan.mst_length_m, rtol=1e-6) else "no"
+            self.stdout.write(f"{count:>7} {min(timings) * 1000:>9.1f} {dense_ms:>9} {plan.mst_length_m / 1000:>8.2f} "
+                              f"{same:>8} {plan.path_length_m / 1000:>8.2f} "
+                              f"{plan.path_length_m / plan.mst_length_m:>8.2f}")
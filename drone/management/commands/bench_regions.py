@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from drone.planning import from_local_xy
+from drone.regions import RegionBuilder
+from drone.utils import enclosed_region
+
+CENTRE = (16.4913, 80.4963)
+
+
+def walked_trace(count, rng):
+    """``count`` fixes of a walk around a 300 m x 200 m field boundary, lap after lap, with 2 m GPS noise."""
+    perimeter = 2 * (300 + 200)
+    s = np.arange(count) * 0.7 % perimeter
+    x = np.select([s < 300, s < 500, s < 800], [s, 300, 800 - s], 0)
+    y = np.select([s < 300, s < 500, s < 800], [0, s - 300, 200], 1000 - s)
+    xy = np.column_stack([x, y]) + rng.normal(0, 2.0, (count, 2))
+    return from_local_xy(xy, CENTRE)
+
+
+class Command(BaseCommand):
+    help = "Per-point cost of incremental region updates for a streamed GPS trace vs. recomputing the hull"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=200000)
+        parser.add_argument("--batch", type=int, default=50, help="Points per batch (a few seconds of GPS)")
+        parser.add_argument("--checkpoints", type=int, default=5)
+        parser.add_argument("--recompute-batches", type=int, default=3,
+                            help="Batches timed for full recomputation at each checkpoint")
+
+    def handle(self, *args, **options):
+        trace = walked_trace(options["points"], np.random.default_rng(0)).tolist()
+        batch = options["batch"]
+        checkpoints = set(np.linspace(0, len(trace), options["checkpoints"] + 1, dtype=int)[1:] // batch * batch)
+        self.stdout.write(f"{len(trace)} points walked around a field, {batch} per batch")
+        self.stdout.write(f"{'points':>8} {'corners':>7} {'incr us/pt':>10} {'incr p99 ms':>11} "
+                          f"{'recompute ms':>12} {'recompute us/pt':>15}")
+
+        builder = RegionBuilder()
+        window = []
+        for end in range(batch, len(trace) + 1, batch):
+            region = builder.add(trace[end - batch:end])
+            window.append(region["batch"]["update_ms"])
+            if end not in checkpoints:
+                continue
+            # What /enclosed costs per batch: the hull of the whole trace so far
+            timings = []
+            for _ in range(options["recompute_batches"]):
+                start = time.perf_counter()
+                enclosed_region(trace[:end])
+                timings.append((time.perf_counter() - start) * 1000)
+            recompute = min(timings)
+            window = np.array(window)
+            self.stdout.write(f"{end:>8} {region['corners']:>7} {window.sum() * 1000 / (len(window) * batch):>10.2f} "
+                              f"{np.percentile(window, 99):>11.3f} {recompute:>12.1f} {recompute * 1000 / batch:>15.0f}")
+            window = []
+        self.stdout.write(f"mean incremental cost over the trace: {builder.snapshot()['mean_per_point_us']:.2f} us "
+                          f"per point, hull version {builder.version}")
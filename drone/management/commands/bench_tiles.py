@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from drone import views
+from drone.management.commands.bench_detections import CENTRE, fill_detections, use_database
+from drone.tiles import TileCache, world_pixels
+
+
+class Command(BaseCommand):
+    help = ("Heatmap tile render latency and cache hit rate for a map session over a large detection table, "
+            "with detections landing between passes; on a throwaway database and tile cache")
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=300000)
+        parser.add_argument("--spread-km", type=float, default=50.0)
+        parser.add_argument("--zooms", type=int, nargs="+", default=[8, 10, 12, 14, 16, 18])
+        parser.add_argument("--view", type=int, default=4, help="Tiles across (and down) the viewport at each zoom")
+        parser.add_argument("--passes", type=int, default=3, help="Times the session is replayed")
+        parser.add_argument("--ingest", type=int, default=20, help="Detections stored between passes")
+
+    def handle(self, *args, **options):
+        root = tempfile.mkdtemp()
+        connection = use_database(os.path.join(root, "bench_tiles.sqlite3"))
+        views.tile_cache = TileCache(os.path.join(root, "tiles"))
+        try:
+            fill_detections(options["rows"], options["spread_km"])
+            self._run(options)
+        finally:
+            connection.close()
+            shutil.rmtree(root, ignore_errors=True)
+
+    def _session(self, options):
+        """Tiles of a viewport centred on the field at every zoom, for all diseases and one of them."""
+        for zoom in options["zooms"]:
+            px, py = world_pixels([CENTRE[0]], [CENTRE[1]], zoom)
+            x0, y0 = int(px[0] // 256) - options["view"] // 2, int(py[0] // 256) - options["view"] // 2
+            for x in range(x0, x0 + options["view"]):
+                for y in range(y0, y0 + options["view"]):
+                    for disease in ("all", "Rust"):
+                        yield zoom, x, y, disease
+
+    def _run(self, options):
+        factory = RequestFactory()
+        rng = np.random.default_rng(1)
+        half = options["spread_km"] * 1000 / 2 / 111320 / 4
+        self.stdout.write(f"{options['rows']} detections; {options['view']}x{options['view']} tiles per zoom, "
+                          f"all diseases and Rust, {options['ingest']} new detections near the centre between passes")
+        self.stdout.write(f"{'pass':>4} {'tiles':>5} {'hits':>5} {'invalidated':>11} {'miss p50 ms':>11} "
+                          f"{'miss p95 ms':>11} {'hit p50 ms':>10} {'total s':>7}")
+        for number in range(options["passes"]):
+            invalidated = 0
+            if number:
+                detections = [{"disease": "Rust", "lat": CENTRE[0] + a, "lon": CENTRE[1] + b}
+                              for a, b in rng.uniform(-half, half, (options["ingest"], 2)).tolist()]
+                before = views.tile_cache.stats()["invalidated_tiles"]
+                views.store_detections(detections, "bench")
+                invalidated = views.tile_cache.stats()["invalidated_tiles"] - before
+            timings = {"hit": [], "miss": []}
+            start = time.perf_counter()
+            for zoom, x, y, disease in self._session(options):
+                request = factory.get(f"/tiles/heatmap/{disease}/{zoom}/{x}/{y}.png")
+                tile_start = time.perf_counter()
+                response = views.heatmap_tile(request, disease, zoom, x, y)
+                timings[response["X-Tile-Cache"]].append((time.perf_counter() - tile_start) * 1000)
+            total = time.perf_counter() - start
+            p = {kind: np.percentile(values, [50, 95]) if values else (0.0, 0.0) for kind, values in timings.items()}
+            self.stdout.write(f"{number + 1:>4} {len(timings['hit']) + len(timings['miss']):>5} "
+                              f"{len(timings['hit']):>5} {invalidated:>11} {p['miss'][0]:>11.1f} {p['miss'][1]:>11.1f} "
+                              f"{p['hit'][0]:>10.2f} {total:>7.2f}")
+        stats = views.tile_cache.stats()
+        self.stdout.write(f"cache: hit rate {stats['hit_rate']:.0%}, render p50 {stats['render_ms']['p50']:.1f} ms, "
+                          f"p95 {stats['render_ms']['p95']:.1f} ms, max {stats['render_ms']['max']:.1f} ms")
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Detection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('disease', models.CharField(max_length=64)),
+                ('confidence', models.FloatField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('cell_y', models.IntegerField(editable=False)),
+                ('cell_x', models.IntegerField(editable=False)),
+                ('detected_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source', models.CharField(blank=True, max_length=64)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cell_y', 'cell_x', 'disease'], name='detection_cell_idx'), models.Index(fields=['detected_at'], name='detection_time_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,79 @@
+import math
+
 from django.db import models
+from django.db.models import Count, F
+from django.utils import timezone
+
+# Side of the base grid cell in degrees (about 55 m of latitude). Stored cells depend on it.
+CELL_DEGREES = 0.0005
+# Viewports spanning more cell rows than this are looked up by one cell_y range instead
+MAX_LISTED_ROWS = 500
+
+
+def cell_of(latitude, longitude):
+    """``(cell_y, cell_x)`` base grid cell of a point, counted from (-90, -180) so both are non-negative."""
+    return math.floor((latitude + 90) / CELL_DEGREES), math.floor((longitude + 180) / CELL_DEGREES)
+
+
+class DetectionQuerySet(models.QuerySet):
+    def in_bbox(self, south, west, north, east, exact=True):
+        """
+        Detections inside a lat/lon box. The grid cell rows covering it are
+        listed explicitly, so SQLite answers from the (cell_y, cell_x) index
+        with one range scan per row instead of scanning the table. With
+        ``exact=False`` the box is widened to whole cells and the coordinates
+        are not checked, so queries that only need cells never leave the
+        index.
+        """
+        y0, x0 = cell_of(south, west)
+        y1, x1 = cell_of(north, east)
+        rows = {"cell_y__in": range(y0, y1 + 1)} if y1 - y0 < MAX_LISTED_ROWS else {"cell_y__range": (y0, y1)}
+        queryset = self.filter(**rows, cell_x__gte=x0, cell_x__lte=x1)
+        if exact:
+            queryset = queryset.filter(latitude__gte=south, latitude__lte=north,
+                                       longitude__gte=west, longitude__lte=east)
+        return queryset
+
+    def cell_counts(self, cells, by_disease=True):
+        """
+        Detection counts per square of ``cells`` x ``cells`` stored grid
+        cells, as ``{"gy", "gx", ["disease"], "count"}`` rows; grouped on the
+        cell index without reading the table.
+        """
+        fields = ("gy", "gx", "disease") if by_disease else ("gy", "gx")
+        return (self.annotate(gy=F("cell_y") / cells, gx=F("cell_x") / cells)
+                .values(*fields).annotate(count=Count("id")).order_by())
+
+
+class Detection(models.Model):
+    """A disease detected from the drone, at the GPS fix it was seen at."""
+    disease = models.CharField(max_length=64)
+    confidence = models.FloatField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    cell_y = models.IntegerField(editable=False)
+    cell_x = models.IntegerField(editable=False)
+    detected_at = models.DateTimeField(default=timezone.now)
+    # Flight or upload the detection came from
+    source = models.CharField(max_length=64, blank=True)
+
+    objects = DetectionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Covers viewport lookups and per-cell disease counts
+            models.Index(fields=["cell_y", "cell_x", "disease"], name="detection_cell_idx"),
+            models.Index(fields=["detected_at"], name="detection_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.disease} at ({self.latitude:.6f}, {self.longitude:.6f})"
+
+    def save(self, *args, **kwargs):
+        self.set_cell()
+        super().save(*args, **kwargs)
 
-# Create your models here.
+    def set_cell(self):
+        """Fill the grid cell columns; bulk_create skips save(), so call it for bulk inserts."""
+        self.cell_y, self.cell_x = cell_of(self.latitude, self.longitude)
+        return self
@@ -0,0 +1,99 @@
+from typing import NamedTuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import depth_first_order, minimum_spanning_tree
+from scipy.spatial import Delaunay, QhullError
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres between arrays of points given in degrees (broadcasts)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def local_xy(points, origin=None):
+    """``(N, 2)`` metres east/north of ``origin`` (default: the centroid) for ``(N, 2)`` lat/lon degrees."""
+    points = np.asarray(points, dtype=np.float64)
+    lat0, lon0 = points.mean(axis=0) if origin is None else origin
+    x = np.radians(points[:, 1] - lon0) * EARTH_RADIUS_M * np.cos(np.radians(lat0))
+    y = np.radians(points[:, 0] - lat0) * EARTH_RADIUS_M
+    return np.column_stack([x, y])
+
+
+def from_local_xy(xy, origin):
+    """Inverse of :func:`local_xy`: ``(N, 2)`` lat/lon degrees for metres east/north of ``origin``."""
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    lat0, lon0 = origin
+    lat = lat0 + np.degrees(xy[:, 1] / EARTH_RADIUS_M)
+    lon = lon0 + np.degrees(xy[:, 0] / (EARTH_RADIUS_M * np.cos(np.radians(lat0))))
+    return np.column_stack([lat, lon])
+
+
+def candidate_edges(points):
+    """
+    ``(E, 2)`` index pairs containing the minimum spanning tree of ``points``:
+    the Delaunay triangulation edges, O(n) of them. Collinear input (no
+    triangulation) is chained along its line.
+    """
+    n = len(points)
+    if n < 2:
+        return np.zeros((0, 2), dtype=np.int64)
+    xy = local_xy(points)
+    if n >= 3:
+        try:
+            simplices = Delaunay(xy).simplices
+            edges = np.concatenate([simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [0, 2]]])
+            return np.unique(np.sort(edges, axis=1), axis=0)
+        except QhullError:
+            pass
+    # All on one line: neighbours along it are the only MST candidates
+    centred = xy - xy.mean(axis=0)
+    direction = np.linalg.svd(centred, full_matrices=False)[2][0]
+    order = np.argsort(centred @ direction)
+    return np.column_stack([order[:-1], order[1:]])
+
+
+class Plan(NamedTuple):
+    """A survey plan over unique infected points (lat, lon degrees)."""
+    points: np.ndarray      # (N, 2)
+    mst_edges: np.ndarray   # (N - 1, 2) indices into points
+    order: np.ndarray       # (N,) visiting order, starting at the point nearest the start
+    mst_length_m: float
+    path_length_m: float
+
+    def path_segments(self):
+        """Consecutive legs of the visiting path as ``[[lat, lon], [lat, lon]]`` pairs."""
+        ordered = self.points[self.order]
+        return np.stack([ordered[:-1], ordered[1:]], axis=1)
+
+
+def plan_survey(points, start=None):
+    """
+    Minimum spanning tree over ``points`` (lat/lon degrees, duplicates
+    merged) and a drone visiting path: the depth-first preorder of the tree
+    from the point nearest ``start``, which is at most twice the optimal
+    tour. Edge weights are haversine metres over the Delaunay candidate
+    edges, so planning is O(n log n) rather than O(n^2).
+    """
+    points = np.unique(np.asarray(points, dtype=np.float64).reshape(-1, 2), axis=0)
+    n = len(points)
+    if n < 2:
+        return Plan(points, np.zeros((0, 2), dtype=np.int64), np.arange(n), 0.0, 0.0)
+
+    edges = candidate_edges(points)
+    weights = haversine_m(points[edges[:, 0], 0], points[edges[:, 0], 1], points[edges[:, 1], 0],
+                          points[edges[:, 1], 1])
+    tree = minimum_spanning_tree(coo_matrix((weights, (edges[:, 0], edges[:, 1])), shape=(n, n))).tocoo()
+    mst_edges = np.column_stack([tree.row, tree.col]).astype(np.int64)
+
+    root = 0
+    if start is not None:
+        root = int(np.argmin(haversine_m(start[0], start[1], points[:, 0], points[:, 1])))
+    order = depth_first_order(tree + tree.T, root, directed=False, return_predecessors=False)
+    path = points[order]
+    path_length = haversine_m(path[:-1, 0], path[:-1, 1], path[1:, 0], path[1:, 1]).sum()
+    return Plan(points, mst_edges, order, float(tree.data.sum()), float(path_length))
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from scipy.spatial import ConvexHull, QhullError
+
+from drone.planning import from_local_xy, local_xy
+from drone.utils import dedupe_points, parse_coordinates
+
+# Points within this distance (metres) of the hull count as inside it
+HULL_TOLERANCE_M = 1e-6
+
+
+def _outside(xy, hull):
+    """
+    Mask of ``xy`` rows strictly outside the counter-clockwise convex ring
+    ``hull``. Each point is located in its wedge around the hull centroid by
+    binary search on the corner angles and tested against that one edge, so
+    a batch of n points costs O(n log h).
+    """
+    centre = hull.mean(axis=0)
+    angles = np.arctan2(hull[:, 1] - centre[1], hull[:, 0] - centre[0])
+    first = int(np.argmin(angles))
+    hull, angles = np.roll(hull, -first, axis=0), np.roll(angles, -first)
+    wedge = np.searchsorted(angles, np.arctan2(xy[:, 1] - centre[1], xy[:, 0] - centre[0]), side="right") - 1
+    a, b = hull[wedge % len(hull)], hull[(wedge + 1) % len(hull)]
+    edge = b - a
+    # Signed distance to the left of the edge; negative means outside
+    distance = (edge[:, 0] * (xy[:, 1] - a[:, 1]) - edge[:, 1] * (xy[:, 0] - a[:, 0])) / np.hypot(*edge.T)
+    return distance < -HULL_TOLERANCE_M
+
+
+def _degenerate_corners(xy):
+    """The two ends of points that lie on one line (or the single point), standing in for a hull."""
+    if len(xy) < 2:
+        return xy
+    centred = xy - xy.mean(axis=0)
+    direction = np.linalg.svd(centred, full_matrices=False)[2][0]
+    along = centred @ direction
+    ends = xy[[np.argmin(along), np.argmax(along)]]
+    return ends[:1] if np.array_equal(ends[0], ends[1]) else ends
+
+
+class RegionBuilder:
+    """
+    Convex region of a GPS trace that arrives in batches, e.g. from a drone
+    or a person walking a field boundary.
+
+    Only the current hull corners are kept. A batch is deduplicated on a
+    ``dedupe_m`` grid, points inside the hull are dropped (see
+    :func:`_outside`), and the hull is rebuilt from its corners plus the few
+    points outside it. Each point therefore costs O(log h) for a hull of h
+    corners instead of the O(n log n) of recomputing from the whole trace,
+    and a batch that lands inside the region needs no hull computation.
+    """
+
+    def __init__(self, dedupe_m=0.5):
+        self.dedupe_m = dedupe_m
+        self.origin = None
+        self.corners = np.zeros((0, 2))  # local metres, counter-clockwise
+        self.version = 0                  # bumped whenever the hull changes
+        self.points = 0
+        self.batches = 0
+        self.update_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, coordinates):
+        """
+        Add ``[[lat, lng], ...]`` points; returns the :meth:`snapshot` with
+        ``changed`` and the cost of this batch. Raises ValueError on
+        malformed coordinates.
+        """
+        points = parse_coordinates(coordinates)
+        with self._lock:
+            started = time.perf_counter()
+            changed = self._add(points) if len(points) else False
+            elapsed = time.perf_counter() - started
+            self.points += len(points)
+            self.batches += 1
+            self.update_seconds += elapsed
+            if changed:
+                self.version += 1
+            snapshot = self._snapshot()
+        snapshot["changed"] = changed
+        snapshot["batch"] = {
+            "points": len(points),
+            "update_ms": elapsed * 1000,
+            "per_point_us": elapsed * 1e6 / len(points) if len(points) else 0.0,
+        }
+        return snapshot
+
+    def _add(self, points):
+        if self.origin is None:
+            # A fixed origin keeps earlier corners valid as the trace grows; local_xy is accurate for field sizes
+            self.origin = points[0].copy()
+        xy = local_xy(points, self.origin)
+        xy = xy[dedupe_points(xy, self.dedupe_m)]
+        if len(self.corners) >= 3:
+            xy = xy[_outside(xy, self.corners)]
+            if not len(xy):
+                return False
+        candidates = np.concatenate([self.corners, xy])
+        try:
+            corners = candidates[ConvexHull(candidates).vertices] if len(candidates) >= 3 else None
+        except QhullError:
+            corners = None
+        if corners is None:
+            # Fewer than 3 points, or all on one line so far
+            corners = _degenerate_corners(candidates)
+        changed = len(corners) != len(self.corners) or not np.array_equal(corners, self.corners)
+        self.corners = corners
+        return changed
+
+    def polygon(self):
+        """Closed ``(N + 1, 2)`` lat/lon ring of the current region (empty before any points)."""
+        if self.origin is None:
+            return np.zeros((0, 2))
+        ring = from_local_xy(self.corners, self.origin)
+        return np.concatenate([ring, ring[:1]]) if len(ring) >= 3 else ring
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        corners = self.corners
+        area = 0.0
+        if len(corners) >= 3:
+            area = 0.5 * abs(np.dot(corners[:, 0], np.roll(corners[:, 1], -1))
+                             - np.dot(corners[:, 1], np.roll(corners[:, 0], -1)))
+        return {
+            "version": self.version,
+            "enclosed_region": self.polygon().tolist(),
+            "closed": len(corners) >= 3,
+            "corners": len(corners),
+            "area_m2": float(area),
+            "points": self.points,
+            "batches": self.batches,
+            "mean_per_point_us": self.update_seconds * 1e6 / self.points if self.points else 0.0,
+        }
+
+
+class TraceRegistry:
+    """
+    Region builders by trace id, shared by the HTTP and WebSocket ingest of
+    this process. The least recently used trace is dropped beyond
+    ``max_traces``. Traces are per process: run a single worker, or route a
+    trace's producers to the same one.
+    """
+
+    def __init__(self, max_traces=64, dedupe_m=0.5):
+        self.max_traces = max_traces
+        self.dedupe_m = dedupe_m
+        self._builders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, trace):
+        """The builder of ``trace``, created on first use."""
+        with self._lock:
+            builder = self._builders.get(trace)
+            if builder is None:
+                builder = self._builders[trace] = RegionBuilder(dedupe_m=self.dedupe_m)
+            self._builders.move_to_end(trace)
+            while len(self._builders) > self.max_traces:
+                self._builders.popitem(last=False)
+            return builder
+
+    def discard(self, trace):
+        with self._lock:
+            return self._builders.pop(trace, None) is not None
+
+
+def trace_group(trace):
+    """Channel layer group of the map clients following ``trace``."""
+    return f"region_{trace}"
@@ -1,3 +1,244 @@
-from django.test import TestCase
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from drone.coverage import plan_coverage
+from drone.feeds import FeatureWriter, feed_path, read_features
+from drone.models import Detection
+from drone.planning import from_local_xy, local_xy
+from drone.regions import RegionBuilder, _outside
+from drone.tiles import TileCache, tile_points, world_pixels
+
+ORIGIN = (16.5, 80.5)
+
+
+def field(corners_m):
+    """Lat/lon ring of a field given by corners in metres east/north of ORIGIN."""
+    return from_local_xy(np.array(corners_m, dtype=np.float64), ORIGIN).tolist()
+
+
+class FeedCursorTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "flight.ndjson")
+        self.writer = FeatureWriter(self.path)
+        self.addCleanup(self.writer.close)
+
+    def write(self, count):
+        for i in range(count):
+            self.writer.write(16.5 + i * 1e-4, 80.5, disease="Rust", confidence=0.9)
+
+    def test_cursor_returns_only_new_features(self):
+        self.write(5)
+        features, cursor = read_features(self.path, 0, limit=3)
+        self.assertEqual(len(features), 3)
+        self.assertEqual(features[0]["geometry"]["coordinates"], [80.5, 16.5])
+        features, cursor = read_features(self.path, cursor)
+        self.assertEqual(len(features), 2)
+        self.assertEqual(read_features(self.path, cursor), ([], cursor))
+        self.write(1)
+        features, end = read_features(self.path, cursor)
+        self.assertEqual(len(features), 1)
+        self.assertEqual(end, os.path.getsize(self.path))
+
+    def test_line_being_written_is_left_for_the_next_call(self):
+        self.write(1)
+        _, cursor = read_features(self.path)
+        with open(self.path, "a") as f:
+            f.write('{"type":"Feature"')
+        self.assertEqual(read_features(self.path, cursor), ([], cursor))
+        with open(self.path, "a") as f:
+            f.write(',"geometry":{"type":"Point","coordinates":[80.5,16.6]},"properties":{}}\n')
+        features, _ = read_features(self.path, cursor)
+        self.assertEqual(features[0]["geometry"]["coordinates"], [80.5, 16.6])
+
+    def test_cursor_past_the_end_starts_again(self):
+        self.write(2)
+        features, cursor = read_features(self.path, 10 ** 9)
+        self.assertEqual((len(features), cursor), (2, os.path.getsize(self.path)))
+
+    def test_cursor_inside_a_line_is_rejected(self):
+        self.write(2)
+        with self.assertRaises(ValueError):
+            read_features(self.path, 3)
+
+
+class CoverageTests(SimpleTestCase):
+    def test_rectangle_is_swept_along_its_long_side(self):
+        plan = plan_coverage(field([(0, 0), (100, 0), (100, 40), (0, 40)]), swath_m=5)
+        self.assertEqual(plan.passes, 8)
+        self.assertEqual(plan.segments, 8)
+        self.assertEqual(plan.turns, 7)
+        self.assertAlmostEqual(plan.sweep_bearing_deg % 180, 90.0, places=3)
+        self.assertAlmostEqual(plan.spacing_m, 5.0, places=3)
+        self.assertAlmostEqual(plan.area_m2, 4000.0, delta=1.0)
+        self.assertAlmostEqual(plan.spray_length_m, 800.0, delta=1.0)
+
+    def test_waypoints_alternate_direction_inside_the_field(self):
+        plan = plan_coverage(field([(0, 0), (100, 0), (100, 40), (0, 40)]), swath_m=10)
+        xy = local_xy(plan.waypoints, ORIGIN)
+        self.assertTrue(((xy > -1e-6) & (xy < [100 + 1e-6, 40 + 1e-6])).all())
+        eastward = xy[1::2, 0] > xy[0::2, 0]
+        self.assertTrue((eastward[1:] != eastward[:-1]).all())
+
+    def test_concave_field_splits_passes(self):
+        # U-shape: passes across the notch fly two segments
+        plan = plan_coverage(field([(0, 0), (60, 0), (60, 60), (40, 60), (40, 20), (20, 20), (20, 60), (0, 60)]),
+                             swath_m=5, angle=0.0)
+        self.assertEqual(plan.passes, 12)
+        self.assertEqual(plan.segments, 4 + 8 * 2)
+
+    def test_sweep_follows_a_hull_edge_that_is_not_a_field_edge(self):
+        # The notch at (50, 20) leaves the hull edge (0, 0)-(100, 30) off the field's own edges; across it the
+        # field is 29.7 m wide, against 33.3 m across the best field edge
+        plan = plan_coverage(field([(0, 0), (50, 20), (100, 30), (60, 45), (30, 40)]), swath_m=1)
+        self.assertAlmostEqual(plan.sweep_bearing_deg % 180, 90 - np.degrees(np.arctan2(30, 100)), places=1)
+        self.assertEqual(plan.passes, 30)
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            plan_coverage(field([(0, 0), (10, 0)]), swath_m=5)
+        with self.assertRaises(ValueError):
+            plan_coverage(field([(0, 0), (10, 0), (0, 10)]), swath_m=0)
+
+
+class RegionTests(SimpleTestCase):
+    square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
+
+    def test_outside(self):
+        points = np.array([[5, 5], [0, 0], [10, 5], [9.99, 0.01], [11, 5], [5, -0.1], [-3, 12], [20, 20]])
+        self.assertEqual(_outside(points, self.square).tolist(),
+                         [False, False, False, False, True, True, True, True])
+
+    def test_outside_of_a_many_sided_hull(self):
+        angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+        hull = np.column_stack([np.cos(angles), np.sin(angles)]) * 100
+        rng = np.random.default_rng(0)
+        points = rng.uniform(-120, 120, (2000, 2))
+        radius = np.hypot(points[:, 0], points[:, 1])
+        decided = (radius < 99) | (radius > 101)
+        # The polygon lies between the inscribed (r cos(pi / 64)) and circumscribed circles
+        self.assertEqual(_outside(points, hull)[decided].tolist(), (radius > 101)[decided].tolist())
+
+    def test_builder_grows_the_hull_and_skips_points_inside(self):
+        builder = RegionBuilder()
+        first = builder.add(field([(0, 0), (10, 0), (10, 10), (0, 10)]))
+        self.assertTrue(first["changed"])
+        self.assertAlmostEqual(first["area_m2"], 100.0, delta=0.1)
+        self.assertFalse(builder.add(field([(5, 5), (2, 8)]))["changed"])
+        grown = builder.add(field([(20, 5)]))
+        self.assertTrue(grown["changed"])
+        self.assertEqual(grown["corners"], 5)
+        self.assertAlmostEqual(grown["area_m2"], 150.0, delta=0.1)
+
+
+class TileCacheTests(TestCase):
+    zoom = 16
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = TileCache(directory.name, max_zoom=18)
+        x, y = world_pixels([ORIGIN[0]], [ORIGIN[1]], self.zoom)
+        self.tile = (self.zoom, int(x[0] // 256), int(y[0] // 256))
+
+    def add_detection(self):
+        Detection.objects.create(disease="Rust", confidence=0.9, latitude=ORIGIN[0], longitude=ORIGIN[1])
+        return self.cache.invalidate(np.array([ORIGIN[0]]), np.array([ORIGIN[1]]))
+
+    def test_tiles_are_cached_until_detections_land_on_them(self):
+        first, cached = self.cache.get(*self.tile)
+        self.assertFalse(cached)
+        self.assertEqual(self.cache.get(*self.tile), (first, True))
+        self.assertEqual(self.add_detection(), 1)
+        second, cached = self.cache.get(*self.tile)
+        self.assertFalse(cached)
+        self.assertNotEqual(first, second)
+
+    def test_render_racing_with_new_detections_is_not_stored(self):
+        def render_then_store(*args):
+            points = tile_points(*args)
+            # Detections land after this render read the table and before it is stored
+            self.add_detection()
+            return points
+
+        with mock.patch("drone.tiles.tile_points", side_effect=render_then_store):
+            stale, cached = self.cache.get(*self.tile)
+        self.assertFalse(cached)
+        self.assertEqual(self.cache.stats()["discarded_renders"], 1)
+        fresh, cached = self.cache.get(*self.tile)
+        self.assertFalse(cached)
+        self.assertNotEqual(stale, fresh)
+        self.assertEqual(self.cache.get(*self.tile), (fresh, True))
+
+
+class StoreDetectionsTests(TestCase):
+    def post(self, disease):
+        detection = {"disease": disease, "confidence": 0.9, "lat": ORIGIN[0], "lon": ORIGIN[1]}
+        return self.client.post(reverse("detections"), {"detections": [detection]}, content_type="application/json")
+
+    def test_only_known_diseases_are_stored(self):
+        self.assertEqual(self.post("Rust-Leaf").status_code, 200)
+        self.assertEqual(self.post("<img src=x onerror=alert(1)>").status_code, 400)
+        self.assertEqual(list(Detection.objects.values_list("disease", flat=True)), ["Rust-Leaf"])
+
+
+class DetectionsQueryTests(TestCase):
+    def test_limit_must_be_a_positive_whole_number(self):
+        Detection.objects.create(disease="Rust-Leaf", confidence=0.9, latitude=ORIGIN[0], longitude=ORIGIN[1])
+        url = reverse("detections")
+        bbox = "80,16,81,17"
+        self.assertEqual(len(self.client.get(url, {"bbox": bbox, "limit": 1}).json()["detections"]), 1)
+        for limit in ("-3", "0", "1.5", "many"):
+            self.assertEqual(self.client.get(url, {"bbox": bbox, "limit": limit}).status_code, 400, limit)
+
+    def test_near_limit_is_validated_the_same_way(self):
+        response = self.client.get(reverse("detections_near"),
+                                   {"lat": ORIGIN[0], "lon": ORIGIN[1], "radius_m": 10, "limit": -3})
+        self.assertEqual(response.status_code, 400)
+
+
+class DetectionsNearTests(TestCase):
+    def near(self, **params):
+        return self.client.get(reverse("detections_near"), {"lat": ORIGIN[0], "lon": ORIGIN[1], **params})
+
+    def test_nearest_first_within_the_radius(self):
+        for lat, lon in field([(30, 0), (0, 10), (0, 80), (50, 50)]):
+            Detection.objects.create(disease="Rust", confidence=0.9, latitude=lat, longitude=lon)
+        data = self.near(radius_m=75, limit=2).json()
+        self.assertEqual([round(d["distance_m"]) for d in data["detections"]], [10, 30])
+        self.assertTrue(data["truncated"])
+        data = self.near(radius_m=75).json()
+        self.assertEqual([round(d["distance_m"]) for d in data["detections"]], [10, 30, 71])
+        self.assertFalse(data["truncated"])
+
+    @override_settings(DRONE_NEAR_MAX_RADIUS_M=100)
+    def test_radius_is_capped(self):
+        self.assertEqual(self.near(radius_m=100).status_code, 200)
+        self.assertEqual(self.near(radius_m=101).status_code, 400)
+        self.assertEqual(self.near(radius_m=0).status_code, 400)
+
+
+class FeedDirectoryTests(SimpleTestCase):
+    def test_web_app_and_scripts_use_the_same_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(DRONE_FEED_DIR=directory):
+                self.assertEqual(feed_path("flight"), Path(directory) / "flight.ndjson")
+                with FeatureWriter(feed_path("flight")) as writer:
+                    writer.write(16.5, 80.5, disease="Rust")
+                feeds = self.client.get(reverse("detection_feeds")).json()["feeds"]
+            self.assertEqual([feed["name"] for feed in feeds], ["flight"])
+
+    def test_scripts_read_the_environment_variable(self):
+        # The detection scripts run without Django settings
+        unconfigured = mock.patch.object(type(settings), "configured", new_callable=mock.PropertyMock,
+                                         return_value=False)
+        with unconfigured, mock.patch.dict(os.environ, {"DRONE_FEED_DIR": "/srv/feeds"}):
+            self.assertEqual(feed_path("flight"), Path("/srv/feeds/flight.ndjson"))
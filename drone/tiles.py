@@ -0,0 +1,252 @@
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+
+import cv2
+import numpy as np
+
+from drone.models import CELL_DEGREES, Detection
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+# Gaussian blur of every detection, in pixels; tiles render this far past their edges so neighbours join up
+BLUR_SIGMA_PX = 6.0
+MARGIN_PX = int(math.ceil(3 * BLUR_SIGMA_PX))
+# Detections within about one blur radius of a pixel that saturate the colour scale
+SATURATION_POINTS = 50.0
+# Zoomed-out tiles count detections per square up to this many pixels wide; well inside the blur
+GROUP_PX = 2
+# Deepest zoom level tiles are served (and invalidated) at
+MAX_ZOOM = 20
+ALL_DISEASES = "all"
+# Token of a tile directory's generation; a directory replaced by invalidation has a new one
+GENERATION_FILE = ".generation"
+
+
+def world_pixels(latitude, longitude, zoom):
+    """Web Mercator pixel coordinates ``(x, y)`` at ``zoom`` for arrays of degrees."""
+    scale = TILE_SIZE * 2 ** zoom
+    lat = np.radians(np.clip(np.asarray(latitude, dtype=np.float64), -85.05112878, 85.05112878))
+    x = (np.asarray(longitude, dtype=np.float64) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * scale
+    return x, y
+
+
+def pixel_latitude(y, zoom):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / (TILE_SIZE * 2 ** zoom)))))
+
+
+def tile_bounds(zoom, x, y, margin_px=0):
+    """``(south, west, north, east)`` of tile ``x``/``y`` grown by ``margin_px`` pixels on every side."""
+    scale = TILE_SIZE * 2 ** zoom
+    left, top = x * TILE_SIZE - margin_px, y * TILE_SIZE - margin_px
+    right, bottom = (x + 1) * TILE_SIZE + margin_px, (y + 1) * TILE_SIZE + margin_px
+    west, east = max(left / scale * 360 - 180, -180.0), min(right / scale * 360 - 180, 180.0)
+    return (max(pixel_latitude(min(bottom, scale), zoom), -90.0), west,
+            min(pixel_latitude(max(top, 0), zoom), 90.0), east)
+
+
+def tile_points(zoom, x, y, disease=ALL_DISEASES):
+    """
+    ``(latitude, longitude, weight)`` arrays of the detections drawn on a
+    tile. Where ``GROUP_PX`` pixels span several stored grid cells they come
+    as counts per group of cells, straight from the cell index, so a
+    zoomed-out tile reads a few rows per pixel square rather than every
+    detection under it.
+    """
+    pixel_degrees = 360.0 / (TILE_SIZE * 2 ** zoom)
+    cells = int(GROUP_PX * pixel_degrees // CELL_DEGREES)
+    # Whole cells are at most GROUP_PX pixels wide there, and the margin absorbs the overlap at the edges
+    queryset = Detection.objects.in_bbox(*tile_bounds(zoom, x, y, MARGIN_PX), exact=cells <= 1)
+    if disease != ALL_DISEASES:
+        queryset = queryset.filter(disease=disease)
+    if cells <= 1:
+        rows = np.array(queryset.values_list("latitude", "longitude"), dtype=np.float64).reshape(-1, 2)
+        return rows[:, 0], rows[:, 1], np.ones(len(rows))
+    rows = np.array([(row["gy"], row["gx"], row["count"]) for row in queryset.cell_counts(cells, by_disease=False)],
+                    dtype=np.float64).reshape(-1, 3)
+    size = cells * CELL_DEGREES
+    return (rows[:, 0] + 0.5) * size - 90, (rows[:, 1] + 0.5) * size - 180, rows[:, 2]
+
+
+def render_heatmap(latitude, longitude, weight, zoom, x, y):
+    """
+    RGBA PNG of the detection density on a tile: the points are binned into
+    pixels with one ``histogram2d`` over the tile plus its margin, blurred,
+    and coloured on a log scale that is the same for every tile of a zoom.
+    """
+    px, py = world_pixels(latitude, longitude, zoom)
+    span = TILE_SIZE + 2 * MARGIN_PX
+    edges = np.arange(span + 1, dtype=np.float64) - MARGIN_PX
+    counts, _, _ = np.histogram2d(py - y * TILE_SIZE, px - x * TILE_SIZE, bins=(edges, edges), weights=weight)
+    density = cv2.GaussianBlur(counts.astype(np.float32), (0, 0), BLUR_SIGMA_PX)
+    density = density[MARGIN_PX:MARGIN_PX + TILE_SIZE, MARGIN_PX:MARGIN_PX + TILE_SIZE]
+    # A lone detection peaks at 1 / (2 pi sigma^2); scale so that reads as one point
+    points = density * (2 * math.pi * BLUR_SIGMA_PX ** 2)
+    intensity = np.clip(np.log1p(points) / math.log1p(SATURATION_POINTS), 0.0, 1.0)
+    colours = cv2.applyColorMap((intensity * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    alpha = np.where(points > 0.05, np.clip(0.3 + intensity, 0.0, 0.8) * 255, 0).astype(np.uint8)
+    ok, png = cv2.imencode(".png", np.dstack([colours, alpha]))
+    if not ok:
+        raise ValueError("Could not encode the tile")
+    return png.tobytes()
+
+
+class TileCache:
+    """
+    Rendered heatmap tiles on disk, ``<directory>/<z>/<x>/<y>/<disease>.png``,
+    shared by worker processes and kept across restarts. New detections
+    invalidate every cached tile they are drawn on (:meth:`invalidate`).
+    Keeps hit/miss counts and recent render times for :meth:`stats`.
+
+    Each tile directory is one generation of the tile: invalidation renames
+    it away in one step, and a render only stores its PNG if the directory
+    still has the generation token it saw before querying the detections.
+    A render that raced with new detections is served but not cached.
+    """
+
+    def __init__(self, directory, max_zoom=MAX_ZOOM):
+        self.directory = str(directory)
+        self.max_zoom = max_zoom
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidated_tiles": 0, "discarded_renders": 0}
+        self._render_ms = deque(maxlen=1000)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _tile_dir(self, zoom, x, y):
+        return os.path.join(self.directory, str(zoom), str(x), str(y))
+
+    def get(self, zoom, x, y, disease=ALL_DISEASES):
+        """PNG bytes of a tile and whether it came from the cache, rendering and storing it on a miss."""
+        tile_dir = self._tile_dir(zoom, x, y)
+        path = os.path.join(tile_dir, f"{disease}.png")
+        try:
+            with open(path, "rb") as f:
+                png = f.read()
+            with self._lock:
+                self._counters["hits"] += 1
+            return png, True
+        except OSError:
+            pass
+
+        try:
+            generation = self._generation(tile_dir)
+        except OSError as e:
+            logger.warning("Failed to prepare heatmap tile %s: %s", tile_dir, str(e))
+            generation = None
+        started = time.perf_counter()
+        png = render_heatmap(*tile_points(zoom, x, y, disease), zoom, x, y)
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._counters["misses"] += 1
+            self._render_ms.append(elapsed)
+        if generation is not None:
+            self._store(tile_dir, path, png, generation)
+        return png, False
+
+    def _generation(self, tile_dir):
+        """The generation token of a tile directory, creating both if needed."""
+        os.makedirs(tile_dir, exist_ok=True)
+        token_path = os.path.join(tile_dir, GENERATION_FILE)
+        try:
+            with open(token_path) as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        token = uuid.uuid4().hex
+        fd, tmp_path = tempfile.mkstemp(dir=tile_dir)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(token)
+            # Linking fails if another render created the token first; use theirs
+            os.link(tmp_path, token_path)
+        except FileExistsError:
+            with open(token_path) as f:
+                token = f.read()
+        finally:
+            os.unlink(tmp_path)
+        return token
+
+    def _store(self, tile_dir, path, png, generation):
+        """Write a rendered tile unless its directory was invalidated since ``generation`` was read."""
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=tile_dir)
+            with os.fdopen(fd, "wb") as f:
+                f.write(png)
+            with open(os.path.join(tile_dir, GENERATION_FILE)) as f:
+                current = f.read()
+            if current == generation:
+                # Once invalidate() has renamed the directory away this path no longer resolves, so this fails
+                os.replace(tmp_path, path)
+                tmp_path = None
+                return True
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Failed to write heatmap tile %s: %s", path, str(e))
+            return False
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+        with self._lock:
+            self._counters["discarded_renders"] += 1
+        return False
+
+    def invalidate(self, latitude, longitude):
+        """
+        Drop the cached tiles, of every disease, that points at these
+        coordinates are drawn on: at each zoom, the tiles within the blur
+        margin of each point. Zoom levels with nothing cached are skipped.
+        Returns the number of tiles removed.
+        """
+        if not len(latitude):
+            return 0
+        removed = 0
+        for zoom in range(self.max_zoom + 1):
+            if not os.path.isdir(os.path.join(self.directory, str(zoom))):
+                continue
+            px, py = world_pixels(latitude, longitude, zoom)
+            tiles = set()
+            # A point reaches at most the 2 x 2 tiles its margin square overlaps
+            for dx in (-MARGIN_PX, MARGIN_PX):
+                for dy in (-MARGIN_PX, MARGIN_PX):
+                    keys = np.column_stack([(px + dx) // TILE_SIZE, (py + dy) // TILE_SIZE]).astype(np.int64)
+                    tiles.update(map(tuple, np.unique(keys, axis=0).tolist()))
+            for x, y in tiles:
+                tile_dir = self._tile_dir(zoom, x, y)
+                # Renamed first, so renders in flight can no longer store into it (see _store)
+                stale_dir = f"{tile_dir}.{uuid.uuid4().hex}.stale"
+                try:
+                    os.rename(tile_dir, stale_dir)
+                except OSError:
+                    continue
+                shutil.rmtree(stale_dir, ignore_errors=True)
+                removed += 1
+        with self._lock:
+            self._counters["invalidated_tiles"] += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            render_ms = np.array(self._render_ms)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        counters["render_ms"] = {
+            "count": int(render_ms.size),
+            "p50": float(np.percentile(render_ms, 50)) if render_ms.size else 0.0,
+            "p95": float(np.percentile(render_ms, 95)) if render_ms.size else 0.0,
+            "max": float(render_ms.max()) if render_ms.size else 0.0,
+        }
+        return counters
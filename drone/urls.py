@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 
 from . import views
 
@@ -6,5 +6,14 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('mapped', views.disease, name='disease'),
     path('enclosed', views.enclosed, name='enclosed'),
+    re_path(r'^regions/(?P<trace>[A-Za-z0-9_-]{1,64})$', views.region_trace, name='region_trace'),
+    path('detections', views.detections, name='detections'),
+    path('detections/near', views.detections_near, name='detections_near'),
+    path('detections/grid', views.detection_grid, name='detection_grid'),
+    path('detections/feeds', views.detection_feeds, name='detection_feeds'),
+    re_path(r'^detections/feeds/(?P<name>[A-Za-z0-9_-]{1,64})$', views.detection_feed, name='detection_feed'),
+    re_path(r'^tiles/heatmap/(?P<disease>[A-Za-z0-9 _-]{1,64})/(?P<z>\d{1,2})/(?P<x>\d{1,7})/(?P<y>\d{1,7})\.png$',
+            views.heatmap_tile, name='heatmap_tile'),
+    path('tiles/stats', views.tile_stats, name='tile_stats'),
 
 ]
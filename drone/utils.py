@@ -1,15 +1,149 @@
-from scipy.spatial import ConvexHull
+from typing import NamedTuple
 
+import numpy as np
+from scipy.spatial import ConvexHull, Delaunay, QhullError
 
-def calculate_enclosed_region(coordinates):
-    # Ensure we have at least 3 points to form a polygon
-    if len(coordinates) < 3:
-        return []
+from drone.planning import local_xy
+
+HULL_MODES = ("convex", "concave")
+TOO_FEW_POINTS = "At least 3 distinct points are required to form a region"
+COLLINEAR_POINTS = "The points are collinear and do not enclose an area"
+
+
+class Region(NamedTuple):
+    """An enclosed region and how it was built."""
+    polygon: np.ndarray   # (N + 1, 2) lat/lon, closed
+    mode: str
+    input_points: int
+    unique_points: int
+    alpha_m: float        # 0 for convex hulls
+
+
+def parse_coordinates(coordinates):
+    """``(N, 2)`` float array of lat/lon from ``[[lat, lng], ...]``; raises ValueError on malformed input."""
+    try:
+        points = np.asarray(coordinates, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError("Coordinates must be a list of [lat, lng] pairs")
+    if points.ndim != 2 or points.shape[1] < 2 or not np.isfinite(points[:, :2]).all():
+        raise ValueError("Coordinates must be a list of [lat, lng] pairs")
+    return points[:, :2]
+
+
+def dedupe_points(xy, tolerance_m=0.5):
+    """
+    Indices of ``xy`` (metres) with one point per ``tolerance_m`` grid cell:
+    a spatial hash of the cell coordinates, so repeated GPS fixes of the
+    same spot collapse in O(n).
+    """
+    if not len(xy):
+        return np.zeros(0, dtype=np.int64)
+    cells = np.floor(xy / tolerance_m).astype(np.int64)
+    cells -= cells.min(axis=0)
+    keys = cells[:, 0] * (int(cells[:, 1].max()) + 1) + cells[:, 1]
+    return np.sort(np.unique(keys, return_index=True)[1])
+
+
+def convex_hull(xy):
+    """Hull vertex indices, counter-clockwise; ValueError when the points enclose no area."""
+    if len(xy) < 3:
+        raise ValueError(TOO_FEW_POINTS)
+    try:
+        return ConvexHull(xy).vertices
+    except QhullError:
+        raise ValueError(COLLINEAR_POINTS)
 
-    # Use ConvexHull to find the enclosing boundary
-    hull = ConvexHull(coordinates)
-    enclosed_region = [coordinates[i] for i in hull.vertices]
 
-    # Close the polygon by adding the first point at the end
-    enclosed_region.append(enclosed_region[0])
-    return enclosed_region
+def _circumradii(a, b, c):
+    ab = np.hypot(*(b - a).T)
+    bc = np.hypot(*(c - b).T)
+    ca = np.hypot(*(a - c).T)
+    cross = np.abs((b - a)[:, 0] * (c - a)[:, 1] - (b - a)[:, 1] * (c - a)[:, 0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(cross > 0, ab * bc * ca / (2 * cross), np.inf)
+
+
+def _largest_ring(edges, xy):
+    """
+    Chain boundary edges into closed rings and return the one enclosing the
+    largest area. Every vertex of a triangle set's boundary has an even
+    number of boundary edges, so a walk always returns to where it started.
+    """
+    adjacency = {}
+    for a, b in edges.tolist():
+        adjacency.setdefault(a, set()).add(b)
+        adjacency.setdefault(b, set()).add(a)
+    best, best_area = None, -1.0
+    for start in list(adjacency):
+        while adjacency[start]:
+            ring, current = [start], adjacency[start].pop()
+            adjacency[current].discard(start)
+            while current != start:
+                ring.append(current)
+                following = adjacency[current].pop()
+                adjacency[following].discard(current)
+                current = following
+            x, y = xy[ring, 0], xy[ring, 1]
+            area = 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+            if area > best_area:
+                best, best_area = np.array(ring), area
+    return best
+
+
+def concave_hull(xy, alpha_m=None):
+    """
+    Alpha shape: the outline of the Delaunay triangles whose circumradius is
+    below ``alpha_m`` metres, so the region follows inlets a convex hull
+    would bridge. ``alpha_m`` defaults to three times the median Delaunay
+    edge length, which keeps the shape in one piece for even GPS coverage.
+    Returns ``(ring vertex indices, alpha_m)``; with several separate pieces
+    the largest is returned.
+    """
+    if len(xy) < 3:
+        raise ValueError(TOO_FEW_POINTS)
+    try:
+        triangles = Delaunay(xy).simplices
+    except QhullError:
+        raise ValueError(COLLINEAR_POINTS)
+    a, b, c = xy[triangles[:, 0]], xy[triangles[:, 1]], xy[triangles[:, 2]]
+    edges = np.sort(np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]]), axis=1)
+    if alpha_m is None:
+        lengths = np.hypot(*(xy[edges[:, 0]] - xy[edges[:, 1]]).T)
+        alpha_m = 3.0 * float(np.median(lengths))
+    keep = _circumradii(a, b, c) < alpha_m
+    if not keep.any():
+        raise ValueError(f"alpha of {alpha_m:.1f} m is smaller than the point spacing; increase it")
+
+    # Boundary edges belong to exactly one kept triangle
+    kept = edges.reshape(3, -1, 2)[:, keep].reshape(-1, 2)
+    unique, counts = np.unique(kept, axis=0, return_counts=True)
+    return _largest_ring(unique[counts == 1], xy), alpha_m
+
+
+def enclosed_region(coordinates, mode="convex", alpha_m=None, dedupe_m=0.5):
+    """
+    Region enclosing ``coordinates`` (``[[lat, lng], ...]``). Points are
+    projected to metres around their centroid and deduplicated on a
+    ``dedupe_m`` grid before the hull is built; ``mode`` is ``convex`` or
+    ``concave`` (alpha shape, see :func:`concave_hull`). Raises ValueError
+    for input that encloses no area.
+    """
+    if mode not in HULL_MODES:
+        raise ValueError(f"mode must be one of {', '.join(HULL_MODES)}")
+    points = parse_coordinates(coordinates)
+    origin = points.mean(axis=0)
+    xy = local_xy(points, origin)
+    unique = dedupe_points(xy, dedupe_m)
+    xy = xy[unique]
+    if mode == "concave":
+        ring, alpha_m = concave_hull(xy, alpha_m)
+    else:
+        ring, alpha_m = convex_hull(xy), 0.0
+    # The input coordinates of the hull corners, closed by repeating the first one at the end
+    polygon = points[unique][np.append(ring, ring[0])]
+    return Region(polygon, mode, len(points), len(unique), float(alpha_m))
+
+
+def calculate_enclosed_region(coordinates):
+    """Closed convex hull of ``coordinates`` as a ``[[lat, lng], ...]`` list."""
+    return enclosed_region(coordinates).polygon.tolist()
@@ -1,10 +1,41 @@
 import json
+import logging
+import os
+import time
 
-from django.http import JsonResponse
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 
-from drone.utils import  calculate_enclosed_region
+from detect.engine import DISEASE_INFO
+from drone.coverage import plan_coverage
+from drone.feeds import FEED_SUFFIX, feed_directory, feed_path, read_features
+from drone.models import CELL_DEGREES, Detection
+from drone.planning import EARTH_RADIUS_M, haversine_m, plan_survey
+from drone.regions import TraceRegistry, trace_group
+from drone.tiles import MAX_ZOOM, TileCache
+from drone.utils import enclosed_region
+
+logger = logging.getLogger(__name__)
+
+# Regions of GPS traces being streamed in, by trace id (see drone.regions)
+traces = TraceRegistry(
+    max_traces=getattr(settings, 'DRONE_TRACE_LIMIT', 64),
+    dedupe_m=getattr(settings, 'DRONE_HULL_DEDUPE_M', 0.5),
+)
+
+# Rendered detection heatmap tiles, invalidated as detections are stored
+tile_cache = TileCache(
+    getattr(settings, 'DRONE_TILE_CACHE_DIR', settings.BASE_DIR / 'tile_cache'),
+    max_zoom=getattr(settings, 'DRONE_TILE_MAX_ZOOM', MAX_ZOOM),
+)
 
 
 # Create your views here.
@@ -12,23 +43,65 @@ def index(request):
     return render(request, 'drone/index.html')
 
 
-DATA = {}
+def parse_points(raw):
+    """
+    ``(latlon (N, 2) array, labels)`` from ``[[lat, lng], [lat, lng, label], ...]``.
+    Raises ValueError on malformed or out-of-range coordinates.
+    """
+    if not isinstance(raw, list):
+        raise ValueError("points must be a list of [lat, lng] or [lat, lng, label]")
+    try:
+        latlon = np.array([point[:2] for point in raw], dtype=np.float64).reshape(-1, 2)
+    except (TypeError, ValueError):
+        raise ValueError("points must be a list of [lat, lng] or [lat, lng, label]")
+    if not np.isfinite(latlon).all() or (np.abs(latlon[:, 0]) > 90).any() or (np.abs(latlon[:, 1]) > 180).any():
+        raise ValueError("Coordinates must be latitude in [-90, 90] and longitude in [-180, 180]")
+    labels = [str(point[2]) if len(point) > 2 else "" for point in raw]
+    return latlon, labels
 
 
+def request_payload(request):
+    """JSON body, or form fields with JSON-encoded values."""
+    if request.content_type == "application/json":
+        return json.loads(request.body or b"{}")
+    return {name: json.loads(value) for name, value in request.POST.items()}
 
 
 @csrf_exempt
 def disease(request):
+    """
+    Survey plan over infected points: POST ``points`` (``[[lat, lng, label], ...]``)
+    and optionally ``start`` (``[lat, lng]``, where the drone takes off). Returns
+    the minimum spanning tree edges, the drone's visiting path as consecutive
+    legs, one marker per point and the lengths in metres.
+    """
     if request.method == 'POST':
-        DATA = {'mst': [([16.481738364275817, 80.50837576389314], [16.481172523975527, 80.50843477249147]),
-                        ([16.481738364275817, 80.50837576389314], [16.482813456291403, 80.50785541534425])],
-                'drone_path': [[(16.481842086691287, 80.50937037017732), (16.481276246390998, 80.50942937877565)],
-                               [(16.481302706517994, 80.50747565150124), (16.48237779853358, 80.50695530295235)]]}
+        try:
+            payload = request_payload(request)
+            if not isinstance(payload, dict):
+                raise ValueError("Send an object with points")
+            if not payload.get("points"):
+                raise ValueError("Send the infected points to plan over as points: [[lat, lng, label], ...]")
+            latlon, labels = parse_points(payload["points"])
+            start = payload.get("start")
+            if start is not None:
+                start = parse_points([start])[0][0]
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
-        # Log the data to the console
-        print(DATA)
+        started = time.perf_counter()
+        plan = plan_survey(latlon, start=start)
+        planning_ms = (time.perf_counter() - started) * 1000
+        logger.info("Planned %d points (%d unique) in %.1f ms", len(latlon), len(plan.points), planning_ms)
 
-        # Return the data as a JSON response
+        DATA = {
+            'mst': plan.points[plan.mst_edges].tolist(),
+            'drone_path': plan.path_segments().tolist(),
+            'markers': [[lat, lng, label] for (lat, lng), label in zip(latlon.tolist(), labels)],
+            'mst_length_m': plan.mst_length_m,
+            'path_length_m': plan.path_length_m,
+            'planning_ms': planning_ms,
+        }
         return JsonResponse(DATA)
 
     # Render the HTML page for non-POST requests
@@ -36,20 +109,352 @@ def disease(request):
 
 
 def enclosed(request):
+    """
+    Enclosed region of the clicked points (or a GPS trace) and a lawnmower
+    coverage path over it. Optional form fields: ``mode`` (``convex``, the
+    default, or ``concave`` for an alpha shape that follows irregular field
+    edges) with ``alpha_m``; ``swath_m`` (spray width), ``speed_mps`` and
+    ``turn_s`` (seconds lost per turn) for the flight time estimate.
+    """
     if request.method == 'POST':
         # Parse the coordinates sent from the frontend
-        coordinates = json.loads(request.POST.get('coordinates', '[]'))
+        try:
+            coordinates = json.loads(request.POST.get('coordinates', '[]'))
+        except ValueError:
+            return JsonResponse({'error': 'coordinates must be a JSON list of [lat, lng] pairs'}, status=400)
 
         # Ensure coordinates are valid
         if not coordinates or len(coordinates) < 3:
             return JsonResponse({'error': 'At least 3 points are required to form a region'}, status=400)
+        try:
+            swath = float(request.POST.get('swath_m') or getattr(settings, 'DRONE_SWATH_M', 5.0))
+            speed = float(request.POST.get('speed_mps') or getattr(settings, 'DRONE_SPEED_MPS', 5.0))
+            turn_time = float(request.POST.get('turn_s') or getattr(settings, 'DRONE_TURN_S', 0.0))
+            alpha = float(request.POST['alpha_m']) if request.POST.get('alpha_m') else None
+        except ValueError:
+            return JsonResponse({'error': 'swath_m, speed_mps, turn_s and alpha_m must be numbers'}, status=400)
+        if swath <= 0 or speed <= 0 or turn_time < 0:
+            return JsonResponse({'error': 'swath_m and speed_mps must be positive, turn_s not negative'}, status=400)
 
-        # Calculate the enclosed region (convex hull)
-        enclosed_region = calculate_enclosed_region(coordinates)
+        # Calculate the enclosed region (hull of the deduplicated points)
+        try:
+            region = enclosed_region(coordinates, mode=request.POST.get('mode') or 'convex', alpha_m=alpha,
+                                     dedupe_m=getattr(settings, 'DRONE_HULL_DEDUPE_M', 0.5))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        logger.info("%s region of %d points (%d unique): %d corners", region.mode, region.input_points,
+                    region.unique_points, len(region.polygon) - 1)
+
+        # Lawnmower spray path over the region
+        started = time.perf_counter()
+        coverage = plan_coverage(region.polygon, swath, speed_mps=speed, turn_s=turn_time)
+        planning_ms = (time.perf_counter() - started) * 1000
+        logger.info("Coverage path: %d passes, %.0f m, planned in %.1f ms",
+                    coverage.passes, coverage.path_length_m, planning_ms)
 
         # Prepare the response data
-        DATA = {'enclosed_region': enclosed_region}
-        print(DATA)  # Debugging
+        DATA = {
+            'enclosed_region': region.polygon.tolist(),
+            'region': {
+                'mode': region.mode,
+                'input_points': region.input_points,
+                'unique_points': region.unique_points,
+                'alpha_m': region.alpha_m,
+            },
+            'coverage_path': coverage.waypoints.tolist(),
+            'coverage': {
+                'passes': coverage.passes,
+                'segments': coverage.segments,
+                'turns': coverage.turns,
+                'swath_m': swath,
+                'spacing_m': coverage.spacing_m,
+                'sweep_bearing_deg': coverage.sweep_bearing_deg,
+                'path_length_m': coverage.path_length_m,
+                'spray_length_m': coverage.spray_length_m,
+                'flight_time_s': coverage.flight_time_s,
+                'area_m2': coverage.area_m2,
+                'planning_ms': planning_ms,
+            },
+        }
         return JsonResponse(DATA)
 
     return render(request, 'drone/enclosed.html')
+
+
+def push_region(trace, region):
+    """Send an updated region to the map clients following ``trace`` (ws/regions/<trace>/)."""
+    async_to_sync(get_channel_layer().group_send)(trace_group(trace), {'type': 'region_update', 'region': region})
+
+
+@csrf_exempt
+def region_trace(request, trace):
+    """
+    Region of a GPS trace streamed in batches. POST ``points``
+    (``[[lat, lng], ...]``) to add a batch: the convex hull is updated
+    incrementally, pushed to WebSocket clients when it changed, and returned
+    with the batch's per-point update cost. GET returns the current region;
+    DELETE forgets the trace.
+    """
+    if request.method == 'GET':
+        return JsonResponse(traces.get(trace).snapshot())
+    if request.method == 'DELETE':
+        return JsonResponse({'deleted': traces.discard(trace)})
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Use GET, POST or DELETE'}, status=405)
+
+    try:
+        payload = request_payload(request)
+        if not isinstance(payload, dict):
+            raise ValueError("Send an object with points")
+        region = traces.get(trace).add(payload.get('points') or [])
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    logger.debug("Trace %s: %d points in %.2f ms, %d corners", trace, region['batch']['points'],
+                 region['batch']['update_ms'], region['corners'])
+    if region['changed']:
+        push_region(trace, region)
+    return JsonResponse(region)
+
+
+def parse_bbox(value):
+    """
+    ``(south, west, north, east)`` from ``west,south,east,north`` (the order
+    of Leaflet's ``LatLngBounds.toBBoxString()``). Raises ValueError.
+    """
+    try:
+        west, south, east, north = (float(part) for part in (value or "").split(","))
+    except ValueError:
+        raise ValueError("bbox must be west,south,east,north in degrees")
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValueError("bbox must be west,south,east,north with south <= north and west <= east")
+    return south, west, north, east
+
+
+def query_float(request, name, default=None):
+    value = request.GET.get(name)
+    if value in (None, ""):
+        if default is None:
+            raise ValueError(f"{name} is required")
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+
+def query_limit(request):
+    """``limit`` from the query string, DRONE_DETECTION_LIMIT if absent; raises ValueError unless a positive integer."""
+    value = request.GET.get('limit')
+    if value in (None, ""):
+        return getattr(settings, 'DRONE_DETECTION_LIMIT', 5000)
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be a whole number")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return limit
+
+
+def detection_rows(queryset, limit):
+    """``(rows, truncated)``: at most ``limit`` detections as lists, read straight from the index and table."""
+    rows = list(queryset.values_list("id", "disease", "confidence", "latitude", "longitude", "detected_at")[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def detection_payload(row, **extra):
+    pk, disease, confidence, latitude, longitude, detected_at = row
+    return {"id": pk, "disease": disease, "confidence": confidence, "lat": latitude, "lon": longitude,
+            "detected_at": detected_at.isoformat(), **extra}
+
+
+def store_detections(raw, source=""):
+    """
+    Save ``[{"disease", "confidence", "lat", "lon", "detected_at"?}, ...]``
+    in bulk; returns the number stored. Raises ValueError on malformed rows
+    and on diseases not in DISEASE_INFO.
+    """
+    if not isinstance(raw, list):
+        raise ValueError("detections must be a list of objects")
+    rows = []
+    for item in raw:
+        try:
+            detected_at = parse_datetime(item["detected_at"]) if item.get("detected_at") else timezone.now()
+            rows.append(Detection(disease=str(item["disease"]), confidence=float(item.get("confidence", 0.0)),
+                                  latitude=float(item["lat"]), longitude=float(item["lon"]),
+                                  detected_at=detected_at or timezone.now(), source=str(source)[:64]))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError("Each detection needs disease, lat and lon (and optionally confidence, detected_at)")
+        if rows[-1].disease not in DISEASE_INFO:
+            raise ValueError(f"Unknown disease; expected one of {', '.join(DISEASE_INFO)}")
+    if rows:
+        parse_points([[row.latitude, row.longitude] for row in rows])
+    Detection.objects.bulk_create([row.set_cell() for row in rows], batch_size=1000)
+    removed = tile_cache.invalidate([row.latitude for row in rows], [row.longitude for row in rows])
+    logger.debug("Stored %d detections, %d cached tiles invalidated", len(rows), removed)
+    return len(rows)
+
+
+@csrf_exempt
+def detections(request):
+    """
+    Geo-tagged disease detections. GET ``bbox`` (``west,south,east,north``,
+    the map viewport) and optionally ``disease`` and ``limit`` for the
+    detections inside it; POST ``{"detections": [...], "source": ...}`` to
+    store a batch from a flight.
+    """
+    if request.method == 'POST':
+        try:
+            payload = request_payload(request)
+            if not isinstance(payload, dict):
+                raise ValueError("Send an object with detections")
+            stored = store_detections(payload.get('detections'), payload.get('source') or "")
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        logger.info("Stored %d detections", stored)
+        return JsonResponse({'stored': stored})
+
+    try:
+        bbox = parse_bbox(request.GET.get('bbox'))
+        limit = query_limit(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    queryset = Detection.objects.in_bbox(*bbox)
+    if request.GET.get('disease'):
+        queryset = queryset.filter(disease=request.GET['disease'])
+    started = time.perf_counter()
+    rows, truncated = detection_rows(queryset, limit)
+    return JsonResponse({
+        'detections': [detection_payload(row) for row in rows],
+        'truncated': truncated,
+        'query_ms': (time.perf_counter() - started) * 1000,
+    })
+
+
+def detections_near(request):
+    """
+    Detections within ``radius_m`` metres of ``lat``/``lon``, nearest first
+    (GET, optional ``disease``, ``limit``). ``radius_m`` is at most
+    ``DRONE_NEAR_MAX_RADIUS_M``.
+    """
+    max_radius = getattr(settings, 'DRONE_NEAR_MAX_RADIUS_M', 5000.0)
+    try:
+        lat, lon = query_float(request, 'lat'), query_float(request, 'lon')
+        radius = query_float(request, 'radius_m')
+        limit = query_limit(request)
+        parse_points([[lat, lon]])
+        if not 0 < radius <= max_radius:
+            raise ValueError(f"radius_m must be positive and at most {max_radius:g}")
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    started = time.perf_counter()
+    # The enclosing box goes through the grid index; SQL orders it by a flat-earth distance (well within 1% at
+    # these radii) and returns only the nearest `limit`, whose exact distance is checked here
+    d_lat = np.degrees(radius / EARTH_RADIUS_M)
+    d_lon = min(180.0, d_lat / max(np.cos(np.radians(lat)), 1e-6))
+    queryset = Detection.objects.in_bbox(max(lat - d_lat, -90), max(lon - d_lon, -180),
+                                         min(lat + d_lat, 90), min(lon + d_lon, 180))
+    if request.GET.get('disease'):
+        queryset = queryset.filter(disease=request.GET['disease'])
+    metres_per_degree = float(np.radians(1.0) * EARTH_RADIUS_M)
+    north = (F('latitude') - lat) * metres_per_degree
+    east = (F('longitude') - lon) * (metres_per_degree * float(np.cos(np.radians(lat))))
+    queryset = (queryset.annotate(distance2=ExpressionWrapper(north * north + east * east, output_field=FloatField()))
+                .filter(distance2__lte=(radius * 1.01) ** 2).order_by('distance2'))
+    # One row past the limit tells whether more than `limit` lie within the radius
+    rows = list(queryset.values_list("id", "disease", "confidence", "latitude", "longitude", "detected_at")[:limit + 1])
+    distances = haversine_m(lat, lon, [row[3] for row in rows], [row[4] for row in rows])
+    nearest = [i for i in np.argsort(distances, kind="stable") if distances[i] <= radius]
+    return JsonResponse({
+        'detections': [detection_payload(rows[i], distance_m=float(distances[i])) for i in nearest[:limit]],
+        'truncated': len(nearest) > limit,
+        'query_ms': (time.perf_counter() - started) * 1000,
+    })
+
+
+def detection_grid(request):
+    """
+    Per-disease detection counts per grid cell inside ``bbox``. ``cell_deg``
+    (rounded to a multiple of the stored cell size) sets the cell side; the
+    counts come from the index alone.
+    """
+    try:
+        south, west, north, east = parse_bbox(request.GET.get('bbox'))
+        cells = max(1, round(query_float(request, 'cell_deg', 10 * CELL_DEGREES) / CELL_DEGREES))
+        size = cells * CELL_DEGREES
+        max_cells = getattr(settings, 'DRONE_GRID_MAX_CELLS', 10000)
+        if ((north - south) / size + 1) * ((east - west) / size + 1) > max_cells:
+            raise ValueError(f"More than {max_cells} cells: zoom in or use a larger cell_deg")
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    started = time.perf_counter()
+    counts = Detection.objects.in_bbox(south, west, north, east).cell_counts(cells)
+    grid = {}
+    for row in counts:
+        cell = grid.setdefault((row['gy'], row['gx']), {
+            'south': row['gy'] * size - 90, 'west': row['gx'] * size - 180,
+            'north': (row['gy'] + 1) * size - 90, 'east': (row['gx'] + 1) * size - 180,
+            'counts': {}, 'total': 0,
+        })
+        cell['counts'][row['disease']] = row['count']
+        cell['total'] += row['count']
+    return JsonResponse({
+        'cell_deg': size,
+        'cells': list(grid.values()),
+        'query_ms': (time.perf_counter() - started) * 1000,
+    })
+
+
+def heatmap_tile(request, disease, z, x, y):
+    """
+    XYZ heatmap tile (256 px PNG) of the stored detections of ``disease``,
+    or of all of them for ``all``. Served from the tile cache when the
+    tile's detections have not changed since it was rendered.
+    """
+    z, x, y = int(z), int(x), int(y)
+    if z > tile_cache.max_zoom or x >= 2 ** z or y >= 2 ** z:
+        return JsonResponse({'error': f'No such tile (zoom 0-{tile_cache.max_zoom})'}, status=404)
+    png, cached = tile_cache.get(z, x, y, disease)
+    response = HttpResponse(png, content_type='image/png')
+    response['X-Tile-Cache'] = 'hit' if cached else 'miss'
+    return response
+
+
+def tile_stats(request):
+    """Heatmap tile cache hit rate and render latency of this process."""
+    return JsonResponse(tile_cache.stats())
+
+
+def detection_feeds(request):
+    """Detection feeds (GeoJSON NDJSON written by the detection scripts), most recently updated first."""
+    feeds = []
+    if os.path.isdir(feed_directory()):
+        for entry in os.scandir(feed_directory()):
+            if entry.is_file() and entry.name.endswith(FEED_SUFFIX):
+                stat = entry.stat()
+                feeds.append({'name': entry.name[:-len(FEED_SUFFIX)], 'size': stat.st_size,
+                              'modified': stat.st_mtime})
+    feeds.sort(key=lambda feed: feed['modified'], reverse=True)
+    return JsonResponse({'feeds': feeds})
+
+
+def detection_feed(request, name):
+    """
+    Features appended to a detection feed as a GeoJSON FeatureCollection:
+    from ``since`` (the ``cursor`` of the previous response, or 0) onwards,
+    at most ``limit`` of them, so a map can follow a run while it is going.
+    """
+    try:
+        path = feed_path(name)
+        since = int(request.GET.get('since') or 0)
+        limit = int(request.GET.get('limit') or getattr(settings, 'DRONE_FEED_PAGE_SIZE', 1000))
+        if since < 0 or limit <= 0:
+            raise ValueError("since must be a cursor from an earlier request, limit positive")
+        features, cursor = read_features(path, since, limit)
+    except FileNotFoundError:
+        return JsonResponse({'error': f'No feed named {name}'}, status=404)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'type': 'FeatureCollection', 'features': features, 'cursor': cursor})
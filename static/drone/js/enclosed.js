@@ -10,11 +10,14 @@ document.querySelectorAll('.form-range').forEach(slider => {
 const vitApLat = 16.4913, vitApLng = 80.4963;
 const map = L.map('map').setView([vitApLat, vitApLng], 16); // Zoom level 16 for campus view
 L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png').addTo(map);
+// Density of stored disease detections, rendered server-side, under the field being planned
+L.tileLayer('/tiles/heatmap/all/{z}/{x}/{y}.png', {maxZoom: 20, opacity: 0.7}).addTo(map);
 
 // Initialize layers and global variables
 let coordinates = [];
 const markers = [];
 let mstLayer = L.layerGroup().addTo(map);
+let liveLayer = L.layerGroup().addTo(map);
 
 // Function to calculate distances between points (Haversine formula)
 const calculateDistance = (p1, p2) => {
@@ -58,14 +61,46 @@ document.getElementById('clear-markers').addEventListener('click', () => {
 // Clear paths and layers
 document.getElementById('clear-paths').addEventListener('click', () => {
     mstLayer.clearLayers();
+    liveLayer.clearLayers();
+});
+
+// Live region of a GPS trace streamed to /regions/<trace> (or over the same socket), redrawn on every update
+let liveSocket = null;
+document.getElementById('follow-trace').addEventListener('click', () => {
+    const trace = prompt('Trace id to follow (letters, digits, - and _)');
+    if (!trace) return;
+    if (liveSocket) liveSocket.close();
+    const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    liveSocket = new WebSocket(`${scheme}://${window.location.host}/ws/regions/${encodeURIComponent(trace)}/`);
+    let fitted = false;
+    liveSocket.onmessage = event => {
+        const data = JSON.parse(event.data);
+        if (data.type !== 'region' || !data.enclosed_region.length) return;
+        liveLayer.clearLayers();
+        const shape = data.closed ? L.polygon(data.enclosed_region, {color: 'orange', weight: 2})
+            : L.polyline(data.enclosed_region, {color: 'orange', weight: 2});
+        shape.bindPopup(`Trace ${trace}: ${data.points} points, ${data.corners} corners, ` +
+            `${(data.area_m2 / 10000).toFixed(2)} ha, ${data.mean_per_point_us.toFixed(1)} µs per point`)
+            .addTo(liveLayer);
+        if (!fitted) {
+            map.fitBounds(shape.getBounds());
+            fitted = true;
+        }
+    };
 });
 document.getElementById('coordinates-form').onsubmit = function (event) {
     event.preventDefault();
 
+    // Spray swath (spacing slider, m) and cruise speed (slider in mph, sent in m/s) for the coverage path
+    const body = new FormData(this);
+    body.append('swath_m', document.getElementById('distance').value);
+    body.append('speed_mps', document.getElementById('speed').value * 0.44704);
+    body.append('mode', document.getElementById('hull-mode').value);
+
     fetch('', {
         method: 'POST',
         headers: {'X-CSRFToken': '{{ csrf_token }}'},
-        body: new FormData(this),
+        body: body,
     })
         .then(response => response.json())
         .then(data => {
@@ -105,6 +140,13 @@ document.getElementById('coordinates-form').onsubmit = function (event) {
                 fillOpacity: 1           // Ensure hatching pattern is fully visible
             }).addTo(mstLayer);
 
+            // Draw the lawnmower spray path with its length and flight time
+            const coverage = data.coverage;
+            L.polyline(data.coverage_path, {color: 'green', weight: 2})
+                .bindPopup(`${coverage.passes} passes, ${(coverage.path_length_m / 1000).toFixed(2)} km, ` +
+                    `~${Math.ceil(coverage.flight_time_s / 60)} min flight`)
+                .addTo(mstLayer);
+
             // Add distance labels between consecutive points
             for (let i = 0; i < enclosedRegion.length - 1; i++) {
                 const p1 = enclosedRegion[i];